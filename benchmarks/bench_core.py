@@ -0,0 +1,221 @@
+"""
+Benchmarks reproducibles de los caminos calientes de GutenCore.
+
+Genera (o reutiliza) un EPUB sintético y mide:
+    open_epub, build_full_index, collect_headings, rename_item con
+    actualización de referencias, spine_move, set_styles_for_documents y
+    export_epub.
+
+Uso:
+    python -m benchmarks.bench_core --chapters 200 --repeat 5 -o bench.json
+    python -m benchmarks.bench_core --compare bench_anterior.json
+
+El resultado es JSON para poder comparar corridas entre commits.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from core import instrumentation
+from core.guten_core import GutenCore, KIND_DOCUMENT
+from benchmarks.synthetic_epub import SyntheticBookSpec, generate_book
+
+
+def _git_revision() -> str | None:
+    """Commit actual (para etiquetar la corrida), si estamos en un repo git."""
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True, text=True, check=True,
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _measure(fn: Callable[[], object], repeat: int,
+             setup: Callable[[], object] | None = None) -> dict:
+    """Ejecuta fn `repeat` veces (con setup opcional fuera del cronómetro)."""
+    runs: list[float] = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - t0) * 1000.0)
+    return {
+        "runs_ms": [round(r, 3) for r in runs],
+        "min_ms": round(min(runs), 3),
+        "median_ms": round(statistics.median(runs), 3),
+        "mean_ms": round(statistics.fmean(runs), 3),
+    }
+
+
+def run_benchmarks(spec: SyntheticBookSpec, repeat: int = 3,
+                   workdir: Path | None = None) -> dict:
+    """Corre la suite completa y devuelve el dict de resultados."""
+    own_tmp = workdir is None
+    base = Path(workdir or tempfile.mkdtemp(prefix="gutenai-bench-"))
+    base.mkdir(parents=True, exist_ok=True)
+    results: dict[str, dict] = {}
+
+    try:
+        t0 = time.perf_counter()
+        core = generate_book(base / "fuente", spec)
+        generation_ms = (time.perf_counter() - t0) * 1000.0
+
+        source_epub = base / "fuente.epub"
+        core.export_epub(source_epub)
+
+        # --- open_epub (descomprime + parsea OPF + índice de hooks) ---
+        open_dir = base / "abiertos"
+        holder: dict[str, GutenCore] = {}
+
+        def _open():
+            holder["core"] = GutenCore.open_epub(source_epub, open_dir)
+
+        results["open_epub"] = _measure(_open, repeat)
+        core = holder["core"]
+
+        # --- build_full_index ---
+        results["build_full_index"] = _measure(core.hook_index.build_full_index, repeat)
+
+        # --- collect_headings (solo lectura: sin persistir ids) ---
+        results["collect_headings"] = _measure(
+            lambda: core.collect_headings(levels=(1, 2, 3), add_missing_ids=False), repeat)
+
+        # --- rename_item con actualización de referencias (ida y vuelta) ---
+        docs = [mi for mi in core.list_items(KIND_DOCUMENT)
+                if "nav" not in (mi.properties or "").split()]
+        target = docs[len(docs) // 2]
+        original_name = Path(target.href).name
+        renamed = f"renombrado_{original_name}"
+        state = {"name": original_name}
+
+        def _rename():
+            new_name = renamed if state["name"] == original_name else original_name
+            core.rename_item(target.id, new_name, update_references=True)
+            state["name"] = new_name
+
+        results["rename_with_references"] = _measure(_rename, repeat)
+
+        # --- spine_move (primero al final) ---
+        def _spine_move():
+            spine = core.get_spine()
+            core.spine_move(spine[0], len(spine) - 1)
+
+        results["spine_move"] = _measure(_spine_move, repeat)
+
+        # --- set_styles_for_documents sobre todo el libro ---
+        styles = ["style.css"] + [f"extra_{i + 1}.css" for i in range(spec.css_files)]
+        doc_ids = [mi.id for mi in docs]
+        results["set_styles_for_documents"] = _measure(
+            lambda: core.set_styles_for_documents(doc_ids, styles, clear_existing=True), repeat)
+
+        # --- export_epub ---
+        out_epub = base / "exportado.epub"
+        results["export_epub"] = _measure(lambda: core.export_epub(out_epub), repeat)
+
+        return {
+            "meta": {
+                "revision": _git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "repeat": repeat,
+                "generation_ms": round(generation_ms, 3),
+                "epub_bytes": source_epub.stat().st_size,
+            },
+            "spec": spec.to_dict(),
+            "results": results,
+            "spans": instrumentation.summary(),
+            "counters": instrumentation.counters(),
+        }
+    finally:
+        if own_tmp:
+            shutil.rmtree(base, ignore_errors=True)
+
+
+def compare(current: dict, baseline: dict) -> list[str]:
+    """Tabla legible de medianas actual vs. línea base."""
+    lines = [f"{'operación':<28}{'base ms':>12}{'actual ms':>12}{'ratio':>9}"]
+    for name, cur in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            lines.append(f"{name:<28}{'-':>12}{cur['median_ms']:>12.2f}{'-':>9}")
+            continue
+        ratio = cur["median_ms"] / old["median_ms"] if old["median_ms"] else float("inf")
+        lines.append(f"{name:<28}{old['median_ms']:>12.2f}{cur['median_ms']:>12.2f}{ratio:>8.2f}x")
+    return lines
+
+
+def main(argv: list[str] | None = None) -> int:
+    defaults = SyntheticBookSpec()
+    ap = argparse.ArgumentParser(description="Benchmarks de GutenCore sobre un EPUB sintético")
+    ap.add_argument("--chapters", type=int, default=defaults.chapters)
+    ap.add_argument("--paragraphs", type=int, default=defaults.paragraphs)
+    ap.add_argument("--words", type=int, default=defaults.words_per_paragraph,
+                    help="palabras por párrafo")
+    ap.add_argument("--ids", type=int, default=defaults.ids_per_chapter,
+                    help="ids (hooks) por capítulo")
+    ap.add_argument("--images", type=int, default=defaults.images)
+    ap.add_argument("--css", type=int, default=defaults.css_files,
+                    help="hojas de estilo extra")
+    ap.add_argument("--seed", type=int, default=defaults.seed)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--workdir", type=Path, default=None,
+                    help="carpeta de trabajo (por defecto, temporal y se borra)")
+    ap.add_argument("-o", "--output", type=Path, default=None,
+                    help="archivo JSON de salida (por defecto stdout)")
+    ap.add_argument("--compare", type=Path, default=None,
+                    help="JSON de una corrida anterior para comparar")
+    ap.add_argument("--trace", type=Path, default=None,
+                    help="activar la instrumentación y guardar la traza Chrome en este archivo")
+    ap.add_argument("--verbose", action="store_true",
+                    help="no silenciar los mensajes del core durante la corrida")
+    args = ap.parse_args(argv)
+
+    spec = SyntheticBookSpec(
+        chapters=args.chapters, paragraphs=args.paragraphs,
+        words_per_paragraph=args.words, ids_per_chapter=args.ids,
+        images=args.images, css_files=args.css, seed=args.seed,
+    )
+
+    if args.trace:
+        instrumentation.enable(trace_path=args.trace)
+
+    # El core imprime bastante; lo silenciamos para que stdout sea JSON limpio
+    sink = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with sink:
+        report = run_benchmarks(spec, repeat=max(1, args.repeat), workdir=args.workdir)
+
+    if args.trace:
+        instrumentation.write_chrome_trace(args.trace)
+
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(payload + "\n", encoding="utf-8")
+    else:
+        print(payload)
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        print("\n".join(compare(report, baseline)), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Generador de EPUBs sintéticos para benchmarks.
+
+Construye un proyecto con la misma API que usa la UI (GutenCore.new_project +
+create_document) y lo rellena con capítulos de tamaño configurable: párrafos,
+ids (hooks), imágenes referenciadas, hojas de estilo extra y enlaces cruzados
+entre capítulos (para que el renombrado con actualización de referencias tenga
+trabajo real).
+
+El contenido es determinista (semilla fija) para que dos corridas sobre commits
+distintos midan exactamente el mismo libro.
+"""
+from __future__ import annotations
+
+import random
+import struct
+import zlib
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+from core.guten_core import GutenCore, KIND_IMAGE
+
+_WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua enim ad minim veniam "
+    "quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo "
+    "consequat duis aute irure in reprehenderit voluptate velit esse cillum "
+    "fugiat nulla pariatur excepteur sint occaecat cupidatat non proident sunt "
+    "culpa qui officia deserunt mollit anim id est laborum"
+).split()
+
+
+@dataclass
+class SyntheticBookSpec:
+    """Parámetros del libro sintético."""
+    chapters: int = 50
+    paragraphs: int = 40           # párrafos por capítulo
+    words_per_paragraph: int = 60
+    ids_per_chapter: int = 20      # párrafos con id="..." (hooks)
+    sections_per_chapter: int = 4  # <h2> por capítulo
+    images: int = 10
+    css_files: int = 3             # hojas extra además de style.css
+    seed: int = 1234
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _png_bytes(width: int = 4, height: int = 4, shade: int = 0) -> bytes:
+    """PNG RGB mínimo y válido (sin dependencias externas)."""
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        body = tag + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+
+    row = b"\x00" + bytes((shade % 256, 128, 255 - shade % 256)) * width
+    raw = row * height
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr)
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+def _sentence(rng: random.Random, n_words: int) -> str:
+    words = [rng.choice(_WORDS) for _ in range(n_words)]
+    words[0] = words[0].capitalize()
+    return " ".join(words) + "."
+
+
+def _chapter_body(spec: SyntheticBookSpec, rng: random.Random, index: int,
+                  chapter_names: list[str], image_names: list[str]) -> str:
+    """Genera el <body> de un capítulo."""
+    parts = [f"<h1>Capítulo {index + 1}</h1>"]
+    # Distribuir ids y secciones a lo largo del capítulo
+    id_every = max(1, spec.paragraphs // spec.ids_per_chapter) if spec.ids_per_chapter else 0
+    section_every = max(1, spec.paragraphs // spec.sections_per_chapter) if spec.sections_per_chapter else 0
+    ids_left = spec.ids_per_chapter
+
+    for p in range(spec.paragraphs):
+        if section_every and p and p % section_every == 0:
+            parts.append(f"<h2>Sección {p // section_every}</h2>")
+
+        text = _sentence(rng, spec.words_per_paragraph)
+        # Un enlace al capítulo siguiente y una imagen cada tanto
+        if p == 1 and len(chapter_names) > 1:
+            target = chapter_names[(index + 1) % len(chapter_names)]
+            text += f' Ver <a href="{target}">el siguiente capítulo</a>.'
+        if image_names and p == spec.paragraphs // 2:
+            img = image_names[index % len(image_names)]
+            parts.append(f'<div class="figura"><img src="../Images/{img}" alt="{img}"/></div>')
+
+        if id_every and ids_left and p % id_every == 0:
+            parts.append(f'<p id="c{index + 1}-p{p}">{text}</p>')
+            ids_left -= 1
+        else:
+            parts.append(f"<p>{text}</p>")
+
+    return "\n".join(parts)
+
+
+def generate_book(root: Path, spec: SyntheticBookSpec | None = None) -> GutenCore:
+    """
+    Crea un proyecto EPUB sintético en `root` (debe no existir o estar vacío)
+    y devuelve el GutenCore abierto sobre él.
+    """
+    spec = spec or SyntheticBookSpec()
+    rng = random.Random(spec.seed)
+    root = Path(root)
+    core = GutenCore.new_project(root, title="Libro sintético", lang="es")
+
+    # Imágenes: se escriben en una carpeta temporal y se importan como asset
+    image_names: list[str] = []
+    if spec.images:
+        staging = root.parent / f"{root.name}_staging"
+        staging.mkdir(parents=True, exist_ok=True)
+        for i in range(spec.images):
+            name = f"img_{i + 1:04d}.png"
+            src = staging / name
+            src.write_bytes(_png_bytes(shade=i))
+            core.create_asset_from_disk(src, KIND_IMAGE, dest_name=name)
+            image_names.append(name)
+            src.unlink()
+        staging.rmdir()
+
+    # Hojas de estilo extra
+    styles_dir = Path(core.layout["STYLES"]).name
+    for i in range(spec.css_files):
+        href = f"{styles_dir}/extra_{i + 1}.css"
+        rules = "\n".join(f".regla-{i}-{j} {{ margin: {j}px; }}" for j in range(50))
+        core.write_text(href, rules)
+        core.add_to_manifest(core._unique_id(f"extra_{i + 1}"), href, media_type="text/css")
+
+    # Capítulos: chap1 lo crea new_project, el resto con create_document
+    chapter_names = ["chap1.xhtml"] + [f"cap_{i + 1:04d}.xhtml" for i in range(1, spec.chapters)]
+    for name in chapter_names[1:]:
+        core.create_document(name, title=Path(name).stem)
+
+    text_dir = Path(core.layout["TEXT"]).name
+    for index, name in enumerate(chapter_names):
+        body = _chapter_body(spec, rng, index, chapter_names, image_names)
+        xhtml = f"""<?xml version='1.0' encoding='UTF-8'?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" lang="es" xml:lang="es">
+<head>
+  <title>Capítulo {index + 1}</title>
+  <meta charset="utf-8"/>
+  <link rel="stylesheet" type="text/css" href="../{styles_dir}/style.css"/>
+</head>
+<body>
+{body}
+</body>
+</html>"""
+        core.write_text(f"{text_dir}/{name}", xhtml)
+
+    core.generate_nav_basic(overwrite=True)
+    core.hook_index.build_full_index()
+    return core
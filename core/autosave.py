@@ -0,0 +1,116 @@
+"""
+core/autosave.py
+Auto-guardado en segundo plano (sin dependencias GTK)
+
+Arquitectura:
+- El hilo de la UI toma un snapshot del texto y lo encola (submit)
+- Un único hilo escritor hace la escritura atómica (tmp + rename vía
+  GutenCore.write_text) y actualiza el índice de búsqueda (con lock propio).
+  Los hooks NO se re-indexan aquí: HookIndexManager no tiene lock y lo usa
+  el hilo de la UI; el callback on_done lo hace en la UI
+- Coalescencia: un snapshot nuevo reemplaza al que seguía en cola para el
+  mismo href (solo se escribe la versión más reciente)
+- Al terminar cada trabajo se notifica por `dispatch` (en la UI, GLib.idle_add)
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from .instrumentation import span, count
+
+
+@dataclass
+class SaveJob:
+    """Snapshot pendiente de escribir"""
+    href: str                       # relativo a opf_dir (el OPF usa su nombre de archivo)
+    text: str
+    reindex: bool = False           # documento: actualizar índices tras escribir
+    token: Any = None               # dato opaco para el callback (p. ej. generación)
+    on_done: Optional[Callable[["SaveJob", Optional[Exception]], Any]] = None
+
+
+class AutosaveWorker:
+    """Cola de guardado con un hilo escritor y coalescencia por href"""
+
+    def __init__(self, core, dispatch: Callable = None):
+        self.core = core
+        self._dispatch = dispatch or (lambda fn, *args: fn(*args))
+        self._pending: "OrderedDict[str, SaveJob]" = OrderedDict()
+        self._in_flight: Optional[str] = None
+        self._errors: Dict[str, Exception] = {}   # href → error de su última escritura
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def submit(self, href: str, text: str, *, reindex: bool = False, token: Any = None,
+               on_done: Optional[Callable] = None) -> None:
+        """Encola un snapshot; reemplaza al pendiente del mismo href"""
+        job = SaveJob(href, text, reindex, token, on_done)
+        with self._cond:
+            if href in self._pending:
+                count("autosave.superseded")
+            self._pending[href] = job
+            self._ensure_thread()
+            self._cond.notify_all()
+
+    def is_pending(self, href: str) -> bool:
+        with self._cond:
+            return href in self._pending or self._in_flight == href
+
+    def error_for(self, href: str) -> Optional[Exception]:
+        """Error de la última escritura de href (None si llegó a disco)"""
+        with self._cond:
+            return self._errors.get(href)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que la cola quede vacía; False si venció el timeout"""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._pending and self._in_flight is None, timeout)
+
+    def shutdown(self, timeout: Optional[float] = None) -> bool:
+        """Escribe lo pendiente y detiene el hilo"""
+        done = self.flush(timeout)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        return done
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._stopped)
+                if self._stopped and not self._pending:
+                    return
+                href, job = self._pending.popitem(last=False)
+                self._in_flight = href
+
+            error = None
+            try:
+                with span("autosave.write", href=href, chars=len(job.text)):
+                    self.core.write_text(href, job.text)
+                    if job.reindex and getattr(self.core, "search_index", None) is not None:
+                        self.core.search_index.apply_pending()
+            except Exception as e:
+                print(f"[Autosave] Error guardando {href}: {e}")
+                error = e
+
+            if job.on_done:
+                self._dispatch(job.on_done, job, error)
+            with self._cond:
+                if error is None:
+                    self._errors.pop(href, None)
+                else:
+                    self._errors[href] = error
+                self._in_flight = None
+                self._cond.notify_all()
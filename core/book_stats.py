@@ -0,0 +1,467 @@
+"""
+core/book_stats.py
+Estadísticas del libro por capítulo con caché incremental (sin dependencias GTK)
+
+Arquitectura:
+- chapter_statistics(): una sola pasada con el tokenizador de
+  preview_pipeline sobre el <body> (sin DOM): texto visible, palabras,
+  caracteres y párrafos (<p>/<div> con texto) a la vez; los mismos bloques
+  alimentan las métricas lingüísticas de core/linguistics.py (oraciones,
+  vocabulario, diálogo, sílabas para la legibilidad)
+- BookStatistics: caché href → (huella del contenido, ChapterStats). Solo se
+  recalculan los capítulos cuyo contenido cambió; los totales del libro se
+  agregan desde la caché
+- Persistencia opcional en cache_dir (un JSON), así reabrir el proyecto no
+  recalcula nada que no haya cambiado
+- Los capítulos sin caché se reparten en un pool de procesos con progreso
+  (hechos/total) y cancelación, solo si suman varios MB de texto: arrancar
+  procesos (spawn) cuesta más que analizar un libro normal en serie
+- Modo sin interfaz para catálogos:
+    python -m core.book_stats libro1.epub libro2.epub -o stats.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import html as html_lib
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, as_completed
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .edit_journal import content_hash
+from .instrumentation import span, count
+from .linguistics import (analyze_blocks, base_language, count_syllables, readability,
+                          readability_label, top_words)
+from .preview_pipeline import BLOCK_ELEMENTS, _RAW_TEXT_ELEMENTS, _body_bounds, _iter_tokens
+
+STATS_VERSION = 2
+WORDS_PER_MINUTE = 225  # promedio de lectura (200-250 palabras por minuto)
+_PARAGRAPH_ELEMENTS = ("p", "div")
+TOP_WORDS = 20
+MIN_PARALLEL_CHARS = 8 * 1024 * 1024  # texto pendiente; por debajo, arrancar procesos cuesta más que analizar
+
+
+@dataclass
+class ChapterStats:
+    """Estadísticas de un capítulo"""
+    href: str
+    name: str
+    words: int = 0
+    paragraphs: int = 0
+    characters: int = 0
+    characters_no_spaces: int = 0
+    language: str = ""              # idioma con el que se contaron las sílabas
+    sentences: int = 0
+    tokens: int = 0                 # palabras del vocabulario (solo letras)
+    dialogue_words: int = 0
+    syllables: int = 0
+    vocabulary: Dict[str, int] = field(default_factory=dict, repr=False)
+
+    def to_dict(self) -> dict:
+        """Resumen para mostrar/exportar (sin el vocabulario)"""
+        data = asdict(self)
+        del data['vocabulary']
+        data.update(_derived(self.language, self.words, self.tokens, self.sentences,
+                             self.dialogue_words, self.syllables, len(self.vocabulary)))
+        return data
+
+
+def _derived(language: str, words: int, tokens: int, sentences: int,
+             dialogue_words: int, syllables: int, types: int) -> dict:
+    """Métricas derivadas de los conteos (capítulo o libro)"""
+    score = readability(language, tokens, sentences, syllables)
+    return {
+        'average_sentence_length': round(words / sentences, 1) if sentences else 0.0,
+        'type_token_ratio': round(types / tokens, 3) if tokens else 0.0,
+        'dialogue_ratio': round(dialogue_words / tokens, 3) if tokens else 0.0,
+        'readability': {'formula': score[0], 'score': score[1],
+                        'label': readability_label(score[1])} if score else None,
+    }
+
+
+def chapter_statistics(href: str, html_content: str, language: str = "") -> ChapterStats:
+    """
+    Estadísticas de un documento en una sola pasada.
+    El texto visible se normaliza como en un lector: los espacios se
+    colapsan, las etiquetas en línea no cortan palabras (pala<em>bra</em>)
+    y los elementos de bloque sí las separan (y cierran oraciones).
+    """
+    pieces: List[str] = []
+    paragraphs = 0
+    depth = 0                   # <p>/<div> abiertos
+    marked = 0                  # los `marked` más externos ya contienen texto
+
+    def add_text(text: str):
+        nonlocal marked
+        if '&' in text:
+            text = html_lib.unescape(text)
+        pieces.append(text)
+        if not text.isspace():
+            marked = depth
+
+    _, body_m, body_end = _body_bounds(html_content)
+    pos = body_m.end() if body_m else 0
+    skip_raw = False
+    for m in _iter_tokens(html_content, pos, body_end):
+        if not skip_raw and m.start() > pos:
+            add_text(html_content[pos:m.start()])
+        pos = m.end()
+        name = m.group(2)
+        if not name:
+            continue
+        lowered = name.lower()
+        closing = m.group(1) == "/"
+        self_closing = m.group(3).rstrip().endswith("/")
+        skip_raw = not closing and lowered in _RAW_TEXT_ELEMENTS and not self_closing
+        if lowered in BLOCK_ELEMENTS or lowered == "br":
+            pieces.append("\n")
+        if lowered in _PARAGRAPH_ELEMENTS and not self_closing:
+            if not closing:
+                depth += 1
+            elif depth:
+                if depth <= marked:
+                    paragraphs += 1
+                depth -= 1
+                marked = min(marked, depth)
+    if body_end > pos and not skip_raw:
+        add_text(html_content[pos:body_end])
+    # Párrafos sin cerrar (HTML mal formado) también cuentan
+    paragraphs += marked
+
+    text = "".join(pieces)
+    words = text.split()
+    letters = sum(map(len, words))
+    language = base_language(language)
+    analysis = analyze_blocks(text.split("\n"))
+    return ChapterStats(
+        href=href,
+        name=Path(href).name,
+        words=len(words),
+        paragraphs=paragraphs,
+        characters=letters + max(0, len(words) - 1),
+        characters_no_spaces=letters,
+        language=language,
+        sentences=analysis.sentences,
+        tokens=analysis.tokens,
+        dialogue_words=analysis.dialogue_words,
+        syllables=count_syllables(analysis.vocabulary, language),
+        vocabulary=dict(analysis.vocabulary),
+    )
+
+
+def aggregate(chapters: List[ChapterStats], total_chapters: Optional[int] = None,
+              language: str = "") -> dict:
+    """Totales del libro a partir de las estadísticas por capítulo"""
+    total_words = sum(c.words for c in chapters)
+    reading_time_minutes = total_words / WORDS_PER_MINUTE
+    vocabulary: Counter = Counter()
+    for c in chapters:
+        vocabulary.update(c.vocabulary)
+    totals = {
+        'total_sentences': sum(c.sentences for c in chapters),
+        'total_tokens': sum(c.tokens for c in chapters),
+        'total_dialogue_words': sum(c.dialogue_words for c in chapters),
+        'total_syllables': sum(c.syllables for c in chapters),
+    }
+    return {
+        **totals,
+        **_derived(language, total_words, totals['total_tokens'], totals['total_sentences'],
+                   totals['total_dialogue_words'], totals['total_syllables'], len(vocabulary)),
+        'language': base_language(language),
+        'vocabulary_size': len(vocabulary),
+        'top_words': top_words(vocabulary, language, TOP_WORDS),
+        'total_words': total_words,
+        'total_paragraphs': sum(c.paragraphs for c in chapters),
+        'total_characters': sum(c.characters for c in chapters),
+        'total_characters_no_spaces': sum(c.characters_no_spaces for c in chapters),
+        'total_chapters': len(chapters) if total_chapters is None else total_chapters,
+        'reading_time_hours': int(reading_time_minutes / 60),
+        'reading_time_minutes': int(reading_time_minutes % 60),
+        'chapters': [c.to_dict() for c in chapters],
+    }
+
+
+class BookStatistics:
+    """Caché de estadísticas por capítulo, validada por huella del contenido"""
+
+    CACHE_FILE = "chapters.json"
+
+    def __init__(self, core, cache_dir: Optional[Path] = None):
+        self.core = core
+        self._cache_dir: Optional[Path] = Path(cache_dir) if cache_dir else None
+        self._entries: Dict[str, tuple] = {}  # href → (huella, ChapterStats)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # compute() puede correr en dos hilos (diálogo y editor)
+        self._loaded = False
+        self._dirty = False
+
+    @property
+    def cache_dir(self) -> Optional[Path]:
+        return self._cache_dir
+
+    @cache_dir.setter
+    def cache_dir(self, value: Optional[Path]):
+        with self._lock:
+            self._cache_dir = Path(value) if value else None
+            self._entries.clear()
+            self._loaded = False
+            self._dirty = False
+
+    # -------------------------
+    # Consultas
+    # -------------------------
+    def _read(self, href: str) -> Optional[str]:
+        try:
+            return self.core.read_text(href)
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"[Statistics] Error leyendo {href}: {e}")
+            return None
+
+    def _lookup(self, href: str, digest: bytes, language: str) -> Optional[ChapterStats]:
+        self._load()
+        with self._lock:
+            entry = self._entries.get(href)
+        if entry is not None and entry[0] == digest and entry[1].language == language:
+            count("statistics.cache_hits")
+            return entry[1]
+        return None
+
+    def _store(self, href: str, digest: bytes, stats: ChapterStats):
+        count("statistics.chapters_parsed")
+        with self._lock:
+            self._entries[href] = (digest, stats)
+            self._dirty = True
+
+    def book_language(self) -> str:
+        """Idioma del libro (dc:language) que elige la fórmula de legibilidad"""
+        try:
+            return base_language(self.core.get_metadata().get('language', ''))
+        except Exception:
+            return ""
+
+    def chapter(self, href: str, text: Optional[str] = None,
+                language: Optional[str] = None) -> Optional[ChapterStats]:
+        """Estadísticas de un capítulo (recalcula solo si cambió su contenido)"""
+        if text is None:
+            text = self._read(href)
+            if text is None:
+                return None
+        language = self.book_language() if language is None else base_language(language)
+        digest = content_hash(text)
+        stats = self._lookup(href, digest, language)
+        if stats is None:
+            stats = chapter_statistics(href, text, language)
+            self._store(href, digest, stats)
+        return stats
+
+    def compute(self, hrefs: Iterable[str], *,
+                on_progress: Optional[Callable[[int, int], None]] = None,
+                cancel: Optional[threading.Event] = None,
+                max_workers: Optional[int] = None,
+                language: Optional[str] = None) -> Optional[dict]:
+        """
+        Estadísticas de los capítulos en `hrefs` (en ese orden) y sus totales.
+
+        Los capítulos sin caché se analizan en un pool de procesos (si son
+        suficientes para amortizar el arranque). on_progress(hechos, total)
+        se llama desde el hilo que ejecuta compute. Retorna None si `cancel`
+        se activa antes de terminar. `language` por defecto es el del libro.
+        """
+        hrefs = list(hrefs)
+        language = self.book_language() if language is None else base_language(language)
+        total = len(hrefs)
+        results: Dict[str, ChapterStats] = {}
+        pending: Dict[str, tuple] = {}  # href → (texto, huella)
+
+        def progress():
+            if on_progress:
+                on_progress(len(results), total)
+
+        with span("statistics.compute", chapters=total) as sp:
+            for href in hrefs:
+                if href in results or href in pending:
+                    continue
+                text = self._read(href)
+                if text is None:
+                    continue
+                digest = content_hash(text)
+                stats = self._lookup(href, digest, language)
+                if stats is not None:
+                    results[href] = stats
+                else:
+                    pending[href] = (text, digest)
+            progress()
+            sp.set(parsed=len(pending))
+
+            if not self._parse_pending(pending, results, progress, cancel, max_workers, language):
+                sp.set(cancelled=True)
+                self.save()  # lo ya analizado queda para la próxima vez
+                return None
+
+            chapters = [results[href] for href in hrefs if href in results]
+            result = aggregate(chapters, total_chapters=total, language=language)
+            sp.set(words=result['total_words'])
+        self.save()
+        return result
+
+    def _parse_pending(self, pending: Dict[str, tuple], results: Dict[str, ChapterStats],
+                       progress: Callable[[], None], cancel: Optional[threading.Event],
+                       max_workers: Optional[int], language: str) -> bool:
+        """Analiza los capítulos pendientes; False si se canceló"""
+        def cancelled() -> bool:
+            return cancel is not None and cancel.is_set()
+
+        def finish(href: str, stats: ChapterStats):
+            self._store(href, pending[href][1], stats)
+            results[href] = stats
+            progress()
+
+        workers = max_workers or os.cpu_count() or 1
+        pending_chars = sum(len(text) for text, _ in pending.values())
+        if workers > 1 and len(pending) > 1 and pending_chars >= MIN_PARALLEL_CHARS:
+            try:
+                # spawn: el proceso de la UI tiene hilos (fork no es seguro)
+                pool = ProcessPoolExecutor(max_workers=min(workers, len(pending)),
+                                           mp_context=multiprocessing.get_context("spawn"))
+            except (OSError, ValueError) as e:
+                print(f"[Statistics] Pool de procesos no disponible, se calcula en serie: {e}")
+            else:
+                try:
+                    futures = {pool.submit(chapter_statistics, href, text, language): href
+                               for href, (text, _) in pending.items()}
+                    for future in as_completed(futures):
+                        if cancelled():
+                            return False
+                        finish(futures[future], future.result())
+                except BrokenExecutor as e:
+                    print(f"[Statistics] Pool de procesos caído, se sigue en serie: {e}")
+                finally:
+                    pool.shutdown(wait=False, cancel_futures=True)
+
+        for href, (text, _) in pending.items():
+            if href in results:
+                continue
+            if cancelled():
+                return False
+            finish(href, chapter_statistics(href, text, language))
+        return True
+
+    def cached(self, href: str) -> Optional[ChapterStats]:
+        """Última estadística conocida de un capítulo, sin validar el contenido"""
+        self._load()
+        with self._lock:
+            entry = self._entries.get(href)
+        return entry[1] if entry else None
+
+    # -------------------------
+    # Persistencia
+    # -------------------------
+    def _cache_path(self) -> Optional[Path]:
+        return self._cache_dir / self.CACHE_FILE if self._cache_dir else None
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            path = self._cache_path()
+        if path is None or not path.exists():
+            return
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+            if data.get("version") != STATS_VERSION:
+                return
+            entries = {href: (bytes.fromhex(e["digest"]), ChapterStats(**e["stats"]))
+                       for href, e in data.get("chapters", {}).items()}
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            print(f"[Statistics] Caché ilegible, se recalcula: {e}")
+            return
+        with self._lock:
+            for href, entry in entries.items():
+                self._entries.setdefault(href, entry)
+
+    def save(self):
+        """Escribe la caché si hubo cambios (escritura atómica)"""
+        with self._save_lock:
+            with self._lock:
+                path = self._cache_path()
+                if path is None or not self._dirty:
+                    return
+                data = {
+                    "version": STATS_VERSION,
+                    "chapters": {href: {"digest": digest.hex(), "stats": asdict(stats)}
+                                 for href, (digest, stats) in self._entries.items()},
+                }
+                self._dirty = False
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(".tmp")
+                tmp.write_text(json.dumps(data), encoding='utf-8')
+                tmp.replace(path)
+            except OSError as e:
+                print(f"[Statistics] No se pudo guardar la caché: {e}")
+
+
+# -------------------------
+# Modo sin interfaz
+# -------------------------
+def spine_documents(core) -> List[str]:
+    """Documentos del spine, en orden de lectura"""
+    return [core._get_item(idref).href for idref in core.get_spine()]
+
+
+def epub_statistics(epub_path: Path, max_workers: Optional[int] = None) -> dict:
+    """Estadísticas de un EPUB (o de una carpeta descomprimida)"""
+    from .guten_core import GutenCore
+
+    epub_path = Path(epub_path)
+    with tempfile.TemporaryDirectory(prefix="gutenai_stats_") as tmp:
+        if epub_path.is_dir():
+            core = GutenCore.open_folder(epub_path)
+        else:
+            core = GutenCore.open_epub(epub_path, Path(tmp))
+        metadata = core.get_metadata()
+        result = core.book_stats.compute(spine_documents(core), max_workers=max_workers)
+    result['path'] = str(epub_path)
+    result['title'] = metadata.get('title', '')
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m core.book_stats",
+        description="Estadísticas por capítulo de uno o más EPUB, en JSON")
+    parser.add_argument("books", nargs="+", type=Path, help="archivos .epub o carpetas")
+    parser.add_argument("-o", "--output", type=Path, help="archivo de salida (por defecto stdout)")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="procesos para el análisis (por defecto, uno por CPU)")
+    args = parser.parse_args(argv)
+
+    books = []
+    failed = 0
+    for path in args.books:
+        try:
+            books.append(epub_statistics(path, max_workers=args.workers))
+        except Exception as e:
+            print(f"[Statistics] Error procesando {path}: {e}", file=sys.stderr)
+            books.append({'path': str(path), 'error': str(e)})
+            failed += 1
+
+    output = json.dumps({'version': STATS_VERSION, 'books': books}, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n", encoding='utf-8')
+    else:
+        print(output)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
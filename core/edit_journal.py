@@ -0,0 +1,377 @@
+"""
+core/edit_journal.py
+Diario de ediciones a prueba de cierres inesperados (sin dependencias GTK)
+
+Arquitectura:
+- Un archivo por documento abierto (JSON por línea, solo-agregar):
+    cabecera  {"href": ..., "base": <hash del contenido en disco>, "path": ...}
+    registros [offset, largo_borrado, "texto insertado"]
+- Toda la E/S la hace un hilo escritor propio, en orden: en el hilo de la UI
+  cada tecla solo serializa una línea corta y la encola. El hilo agrupa las
+  líneas en una escritura y espacía el fsync (FSYNC_INTERVAL)
+- checkpoint(): tras un guardado exitoso el diario se compacta: nueva base
+  y solo los registros posteriores al snapshot que se escribió
+- close(): el documento quedó en disco, el diario se elimina; con
+  discard=False se conserva para recuperarlo (p. ej. si el guardado falló)
+- pending() / recover_journals(): al abrir el proyecto tras un cierre
+  inesperado, los registros se re-aplican sobre el archivo cuyo hash
+  coincide con la base y el resultado se escribe en el proyecto
+
+Los offsets son de caracteres (como los de GtkTextBuffer y los str de Python).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .instrumentation import span, count
+
+Edit = Tuple[int, int, str]  # (offset, largo borrado, texto insertado)
+
+
+def content_hash(text: str) -> bytes:
+    """Huella del contenido (misma que usa el editor para detectar cambios)"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+def journal_key(source: str) -> str:
+    """Nombre estable de carpeta para un proyecto (EPUB original o carpeta)"""
+    return hashlib.blake2b(source.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def replay(base_text: str, edits: List[Edit]) -> str:
+    """
+    Aplica las ediciones en orden sobre base_text.
+
+    Las ráfagas de escritura (inserciones contiguas y retrocesos sobre lo
+    recién insertado) se fusionan antes de reconstruir el texto, así el
+    costo depende de la cantidad de ráfagas y no de teclas.
+    """
+    text = base_text
+    pending: Optional[List] = None  # [offset, borrado, insertado]
+
+    for offset, deleted, inserted in edits:
+        if pending is not None:
+            tail = pending[0] + len(pending[2])
+            if deleted == 0 and offset == tail:
+                pending[2] += inserted
+                continue
+            if not inserted and offset + deleted == tail and deleted <= len(pending[2]):
+                pending[2] = pending[2][:len(pending[2]) - deleted]
+                continue
+            start, length, new = pending
+            text = text[:start] + new + text[start + length:]
+        pending = [offset, deleted, inserted]
+
+    if pending is not None:
+        start, length, new = pending
+        text = text[:start] + new + text[start + length:]
+    return text
+
+
+@dataclass
+class JournalEntry:
+    """Diario pendiente encontrado en disco"""
+    href: str
+    base: str                       # hash hex del contenido sobre el que aplican
+    path: Optional[str]             # ruta absoluta del archivo base al escribirse
+    edits: List[Edit] = field(default_factory=list)
+    file: Optional[Path] = None
+
+
+class EditJournal:
+    """Diario del documento abierto en el editor (uno a la vez)"""
+
+    FSYNC_INTERVAL = 1.0  # segundos máximos entre una escritura y su fsync
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.href: Optional[str] = None
+        self.seq = 0                    # registros escritos desde begin()
+        self.session = 0                # cambia en cada begin() (descarta checkpoints viejos)
+        self._path_hint: Optional[str] = None
+        self._lines: List[str] = []     # registros posteriores al último checkpoint
+        self._lines_seq = 0             # seq del primero de _lines
+        self._failed = False            # el hilo escritor no pudo escribir el diario
+
+        # Cola de operaciones para el hilo escritor (E/S fuera del hilo de la UI)
+        self._ops: deque = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._busy = False
+        self._sync_requested = False
+        # Estado del hilo escritor
+        self._file = None
+        self._file_href: Optional[str] = None
+        self._unsynced = False
+        self._last_sync = 0.0
+
+    def _journal_path(self, href: str) -> Path:
+        return self.directory / f"{journal_key(href)}.journal"
+
+    @staticmethod
+    def _header(href: str, base: bytes, path: Optional[str]) -> str:
+        return json.dumps({"href": href, "base": base.hex(), "path": path},
+                          ensure_ascii=False) + "\n"
+
+    @property
+    def active(self) -> bool:
+        return self.href is not None and not self._failed
+
+    def begin(self, href: str, base: bytes, path: Optional[str] = None):
+        """Empieza el diario de un documento cuyo contenido en disco tiene hash `base`"""
+        self.close()
+        self.href = href
+        self.seq = 0
+        self.session += 1
+        self._path_hint = path
+        self._lines = []
+        self._lines_seq = 0
+        self._failed = False
+        self._submit(("rewrite", href, self._header(href, base, path)))
+
+    def record(self, offset: int, deleted: int, inserted: str):
+        """Agrega una edición (coordenadas previas a aplicarla)"""
+        if not self.active:
+            return
+        line = json.dumps([offset, deleted, inserted], ensure_ascii=False) + "\n"
+        self._lines.append(line)
+        self.seq += 1
+        with self._cond:
+            last = self._ops[-1] if self._ops else None
+            if last is not None and last[0] == "append" and last[1] == self.href:
+                last[2].append(line)  # se agrupa con las teclas aún no escritas
+            else:
+                self._ops.append(("append", self.href, [line]))
+                self._start_writer()
+                self._cond.notify_all()
+        count("journal.record")
+
+    def checkpoint(self, session: int, seq: int, base: bytes):
+        """
+        Compacta tras guardar en disco el snapshot tomado con `seq` registros
+        de la sesión `session`: la nueva base es ese contenido y solo se
+        conservan los registros posteriores.
+        """
+        if not self.active or session != self.session or not self._lines_seq <= seq <= self.seq:
+            return
+        del self._lines[:seq - self._lines_seq]
+        self._lines_seq = seq
+        self._submit(("rewrite", self.href,
+                      self._header(self.href, base, self._path_hint) + "".join(self._lines)))
+
+    def close(self, discard: bool = True):
+        """
+        Cierra el diario actual. Con discard (su documento ya está en disco)
+        lo elimina; si no, lo conserva para recuperarlo al reabrir el proyecto.
+        """
+        if self.href is None:
+            return
+        self._submit(("delete" if discard else "release", self.href, None))
+        self.href = None
+        self._lines = []
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que todo lo encolado esté escrito y sincronizado en disco"""
+        with self._cond:
+            self._sync_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(
+                lambda: not self._ops and not self._busy and not self._unsynced, timeout)
+
+    def shutdown(self):
+        """Termina el hilo escritor tras lo pendiente (el diario abierto se conserva)"""
+        with self._cond:
+            if self._thread is not None:
+                self._ops.append(("stop", None, None))
+                self._cond.notify_all()
+
+    # === HILO ESCRITOR ===
+
+    def _submit(self, op: tuple):
+        with self._cond:
+            self._ops.append(op)
+            self._start_writer()
+            self._cond.notify_all()
+
+    def _start_writer(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="edit-journal", daemon=True)
+            self._thread.start()
+
+    def _next_op(self) -> tuple:
+        """Próxima operación; un fsync pendiente vence a FSYNC_INTERVAL (o con flush)"""
+        while True:
+            if self._ops:
+                return self._ops.popleft()
+            if self._unsynced:
+                wait = self._last_sync + self.FSYNC_INTERVAL - time.monotonic()
+                if self._sync_requested or wait <= 0:
+                    return ("sync", self._file_href, None)
+                self._cond.wait(wait)
+            else:
+                self._sync_requested = False
+                self._cond.wait()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                op = self._next_op()
+                self._busy = True
+            try:
+                if op[0] == "stop":
+                    self._close_file()
+                    return
+                self._execute(*op)
+            except OSError as e:
+                print(f"[Journal] Error escribiendo diario: {e}")
+                self._close_file()
+                self._failed = True
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _execute(self, kind: str, href: Optional[str], data):
+        if kind == "append":
+            if self._file is None or self._file_href != href:
+                return  # diario cerrado por un error previo
+            self._file.writelines(data)
+            self._file.flush()
+            self._unsynced = True
+        elif kind == "sync":
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+            self._unsynced = False
+            self._last_sync = time.monotonic()
+        elif kind == "rewrite":
+            with span("journal.compact", href=href, chars=len(data)):
+                self._rewrite(href, data)
+        elif kind == "release":
+            if self._file_href == href:
+                self._execute("sync", href, None)
+                self._close_file()
+        elif kind == "delete":
+            if self._file_href == href:
+                self._close_file()
+            self._journal_path(href).unlink(missing_ok=True)
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+        self._file = None
+        self._file_href = None
+        self._unsynced = False
+
+    def _rewrite(self, href: str, content: str):
+        """Reescribe el diario (cabecera + registros vigentes) de forma atómica"""
+        self._close_file()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        target = self._journal_path(href)
+        tmp = target.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, target)
+        self._file = open(target, "a", encoding="utf-8")
+        self._file_href = href
+        self._last_sync = time.monotonic()
+
+    # === RECUPERACIÓN ===
+
+    def pending(self) -> List[JournalEntry]:
+        """Diarios con ediciones que no llegaron a guardarse"""
+        self.flush()
+        entries = []
+        if not self.directory.is_dir():
+            return entries
+        for file in sorted(self.directory.glob("*.journal")):
+            if self.href is not None and file == self._journal_path(self.href):
+                continue
+            entry = self._read_entry(file)
+            if entry is None:
+                continue
+            if entry.edits:
+                entries.append(entry)
+            else:
+                self.discard(entry)
+        return entries
+
+    @staticmethod
+    def _read_entry(file: Path) -> Optional[JournalEntry]:
+        try:
+            with open(file, encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                entry = JournalEntry(header["href"], header["base"], header.get("path"), file=file)
+                for line in f:
+                    try:
+                        offset, deleted, inserted = json.loads(line)
+                    except ValueError:
+                        break  # última línea cortada por el cierre inesperado
+                    entry.edits.append((int(offset), int(deleted), inserted))
+            return entry
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[Journal] Diario ilegible {file.name}: {e}")
+            return None
+
+    @staticmethod
+    def discard(entry: JournalEntry):
+        if entry.file is not None:
+            try:
+                entry.file.unlink(missing_ok=True)
+            except OSError as e:
+                print(f"[Journal] Error eliminando diario: {e}")
+
+
+def recover_journals(core, journal: EditJournal) -> Tuple[List[str], List[str]]:
+    """
+    Re-aplica los diarios pendientes sobre los archivos del proyecto.
+
+    La base se busca en el archivo actual del proyecto y, si no coincide, en
+    la ruta registrada en la cabecera (p. ej. la carpeta temporal de un EPUB
+    que quedó tras el cierre inesperado). Retorna (recuperados, descartados).
+    """
+    recovered, stale = [], []
+    for entry in journal.pending():
+        candidates = [core.opf_dir / entry.href]
+        if entry.path:
+            candidates.append(Path(entry.path))
+        text = None
+        for candidate in candidates:
+            try:
+                base_text = candidate.read_text(encoding="utf-8")
+            except (OSError, UnicodeDecodeError):
+                continue
+            if content_hash(base_text).hex() == entry.base:
+                text = base_text
+                break
+
+        if text is None:
+            print(f"[Journal] Base distinta para {entry.href}: diario descartado")
+            stale.append(entry.href)
+        else:
+            try:
+                with span("journal.replay", href=entry.href, edits=len(entry.edits)):
+                    core.write_text(entry.href, replay(text, entry.edits))
+                if getattr(core, "hook_index", None) is not None and entry.href.endswith(
+                        ('.html', '.xhtml', '.htm')):
+                    core.hook_index.update_file_index(entry.href)
+                recovered.append(entry.href)
+            except Exception as e:
+                print(f"[Journal] Error recuperando {entry.href}: {e}")
+                stale.append(entry.href)
+                continue  # conservar el diario para otro intento
+        journal.discard(entry)
+    return recovered, stale
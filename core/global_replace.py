@@ -0,0 +1,204 @@
+"""
+core/global_replace.py
+Reemplazar-todo en el libro como una transacción con deshacer (sin dependencias GTK)
+
+Arquitectura:
+- compute_replacements(): el índice de búsqueda elige los documentos
+  candidatos y un pool de hilos calcula en memoria el contenido nuevo de
+  cada uno (una sola pasada de subn por documento)
+- replace_all(): escribe todo con GutenCore.write_texts (todos los .tmp y
+  luego los renombres); si el commit falla se restauran los originales.
+  Antes de escribir cada original se compara con el archivo en disco: si
+  el índice tenía un texto viejo, ese documento se recalcula desde disco
+- ReplaceSnapshot: pre-imagen comprimida (zlib) de los archivos tocados y
+  huella de lo escrito, para deshacer con un clic sin pisar ediciones
+  posteriores
+- Solo los documentos que cambiaron se re-indexan (hooks y búsqueda). Desde
+  un hilo de trabajo usar reindex_hooks=False y llamar reindex_hooks() en el
+  hilo de la UI: HookIndexManager no tiene lock (el índice de búsqueda sí)
+- Alcances como en la búsqueda: en texto visible el reemplazo se escapa y
+  respeta las etiquetas intermedias; en atributos se escapan las comillas
+"""
+
+from __future__ import annotations
+
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .edit_journal import content_hash
+from .instrumentation import span, traced, count
+from .text_map import SCOPE_RAW, replace_in_scope
+
+
+@dataclass
+class ReplaceSnapshot:
+    """Estado previo de los archivos modificados por un reemplazo"""
+    originals: Dict[str, bytes] = field(default_factory=dict)  # href → zlib(utf-8)
+    written: Dict[str, bytes] = field(default_factory=dict)    # href → hash de lo escrito
+
+    def original(self, href: str) -> str:
+        return zlib.decompress(self.originals[href]).decode('utf-8')
+
+    @property
+    def compressed_size(self) -> int:
+        return sum(len(data) for data in self.originals.values())
+
+
+@dataclass
+class ReplaceResult:
+    counts: Dict[str, int]             # href → reemplazos
+    snapshot: ReplaceSnapshot
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+
+def compute_replacements(index, query: str, replacement: str, *, regex: bool = False,
+                         case_sensitive: bool = False, whole_words: bool = False,
+                         scope: str = SCOPE_RAW, hrefs: Optional[Iterable[str]] = None,
+                         max_workers: int = 4) -> Tuple[Dict[str, str], Dict[str, str], Dict[str, int]]:
+    """
+    Calcula en paralelo el contenido nuevo de cada documento candidato.
+
+    En modo regex `replacement` es una plantilla (\\1, \\g<nombre>); si no, se
+    inserta literal. Retorna (originales, nuevos, cantidades) solo de los
+    documentos que cambian. Lanza re.error si el patrón es inválido.
+    """
+    plan = index.plan(query, regex=regex, case_sensitive=case_sensitive,
+                      whole_words=whole_words, scope=scope, hrefs=hrefs)
+    pattern = plan.pattern
+    repl = (lambda m: m.expand(replacement)) if regex else (lambda m: replacement)
+
+    def replace_document(href: str):
+        text = index.text_of(href)
+        if text is None:
+            return href, None, None, 0
+        tmap = index.text_map_of(href) if scope != SCOPE_RAW else None
+        new_text, n = replace_in_scope(text, pattern, repl, scope, tmap)
+        return href, text, new_text, n
+
+    originals: Dict[str, str] = {}
+    new_texts: Dict[str, str] = {}
+    counts: Dict[str, int] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(plan.documents)))) as pool:
+        for href, text, new_text, n in pool.map(replace_document, plan.documents):
+            if n and new_text != text:
+                originals[href] = text
+                new_texts[href] = new_text
+                counts[href] = n
+    return originals, new_texts, counts
+
+
+def _stale_originals(core, originals: Dict[str, str]) -> List[str]:
+    """Documentos cuyo archivo en disco ya no es el texto del que partió el reemplazo"""
+    stale = []
+    for href, text in originals.items():
+        try:
+            current = core.read_text(href)
+        except (OSError, UnicodeDecodeError):
+            current = None
+        if current != text:
+            stale.append(href)
+    return stale
+
+
+def reindex_hooks(core, hrefs: Iterable[str]):
+    """Re-indexa los hooks de los documentos escritos (llamar en el hilo de la UI)"""
+    hook_index = getattr(core, "hook_index", None)
+    if hook_index is not None:
+        for href in hrefs:
+            if href.endswith(('.html', '.xhtml', '.htm')):
+                hook_index.update_file_index(href)
+
+
+def _reindex(core, hrefs: Iterable[str], hooks: bool):
+    """Re-indexa solo los documentos escritos"""
+    if hooks:
+        reindex_hooks(core, hrefs)
+    search_index = getattr(core, "search_index", None)
+    if search_index is not None:
+        search_index.apply_pending()
+
+
+@traced("global_replace.replace_all")
+def replace_all(core, query: str, replacement: str, *, regex: bool = False,
+                case_sensitive: bool = False, whole_words: bool = False,
+                scope: str = SCOPE_RAW, hrefs: Optional[Iterable[str]] = None,
+                reindex_hooks: bool = True) -> ReplaceResult:
+    """
+    Reemplaza en todo el libro: todo o nada.
+    Si la escritura falla a mitad de los renombres se reescriben los originales.
+    Con reindex_hooks=False los hooks de result.counts quedan para el llamador.
+    """
+    options = dict(regex=regex, case_sensitive=case_sensitive, whole_words=whole_words, scope=scope)
+    originals, new_texts, counts = compute_replacements(
+        core.search_index, query, replacement, hrefs=hrefs, **options)
+
+    stale = _stale_originals(core, originals)
+    if stale:
+        # El índice tenía un texto viejo: recalcular esos documentos desde disco
+        count("global_replace.stale_documents", len(stale))
+        for href in stale:
+            core.search_index.forget(href)
+            del originals[href], new_texts[href], counts[href]
+        fresh = compute_replacements(core.search_index, query, replacement, hrefs=stale, **options)
+        for href in _stale_originals(core, fresh[0]):
+            print(f"[GlobalReplace] {href} cambió durante el reemplazo; se omite")
+            for texts in fresh:
+                del texts[href]
+        originals.update(fresh[0])
+        new_texts.update(fresh[1])
+        counts.update(fresh[2])
+
+    snapshot = ReplaceSnapshot()
+    if not new_texts:
+        return ReplaceResult(counts, snapshot)
+
+    with span("global_replace.snapshot", files=len(originals)) as sp:
+        for href, text in originals.items():
+            snapshot.originals[href] = zlib.compress(text.encode('utf-8'), 1)
+            snapshot.written[href] = content_hash(new_texts[href])
+        sp.set(bytes=snapshot.compressed_size)
+
+    try:
+        core.write_texts(new_texts)
+    except Exception:
+        try:
+            core.write_texts(originals)
+        except Exception as e:
+            print(f"[GlobalReplace] Error restaurando originales: {e}")
+        raise
+
+    _reindex(core, new_texts, reindex_hooks)
+    count("global_replace.files_changed", len(new_texts))
+    return ReplaceResult(counts, snapshot)
+
+
+@traced("global_replace.undo")
+def undo_replace(core, snapshot: ReplaceSnapshot, *,
+                 reindex_hooks: bool = True) -> Tuple[List[str], List[str]]:
+    """
+    Restaura los archivos del snapshot en una transacción.
+    Los que cambiaron después del reemplazo no se tocan.
+    Retorna (restaurados, omitidos).
+    """
+    restore: Dict[str, str] = {}
+    skipped: List[str] = []
+    for href, written_hash in snapshot.written.items():
+        try:
+            current = core.read_text(href)
+        except (OSError, UnicodeDecodeError):
+            skipped.append(href)
+            continue
+        if content_hash(current) != written_hash:
+            skipped.append(href)
+            continue
+        restore[href] = snapshot.original(href)
+
+    if restore:
+        core.write_texts(restore)
+        _reindex(core, restore, reindex_hooks)
+    return list(restore), skipped
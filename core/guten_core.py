@@ -22,11 +22,13 @@ from __future__ import annotations
 
 import os
 import io
+import mmap
 import time
 import zipfile
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, Iterable, Dict, List, Tuple
+from typing import Optional, Iterable, Iterator, Dict, List, Tuple, Union, BinaryIO
 import mimetypes
 import shutil
 import xml.etree.ElementTree as ET
@@ -34,7 +36,11 @@ import os
 import html
 import re
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from posixpath import relpath as posix_relpath
+
+from .instrumentation import span, traced, count
 
 try:
     from ebooklib import epub
@@ -42,6 +48,11 @@ try:
 except Exception:
     _HAS_EBOOKLIB = False
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 
 # -----------------------------
 # Constantes y namespaces
@@ -167,6 +178,168 @@ def _text(elem: Optional[ET.Element]) -> str:
     return (elem.text or "").strip()
 
 
+# Media types que ya vienen comprimidos (se guardan STORED al exportar)
+_PRECOMPRESSED_MEDIA = {
+    "image/jpeg", "image/png", "image/gif", "image/webp", "image/avif",
+    "audio/mpeg", "audio/mp4", "audio/ogg", "audio/opus", "audio/aac",
+    "video/mp4", "video/webm", "video/ogg",
+    "font/woff", "font/woff2", "application/font-woff", "application/font-woff2",
+}
+
+
+# Edición textual de <link rel="stylesheet"> dentro del <head>
+_HEAD_OPEN_RE = re.compile(r"<head\b[^>]*?(/?)>", re.IGNORECASE)
+_HEAD_CLOSE_RE = re.compile(r"</head\s*>", re.IGNORECASE)
+_HTML_OPEN_RE = re.compile(r"<html\b[^>]*>", re.IGNORECASE)
+_LINK_TAG_RE = re.compile(r"[ \t]*<link\b[^>]*>[ \t]*(?:\r?\n)?", re.IGNORECASE)
+_ATTR_RE = re.compile(r"\b(rel|href)\s*=\s*(?:\"([^\"]*)\"|'([^']*)'|([^\s>/]+))", re.IGNORECASE)
+
+
+_FICLONE = 0x40049409  # ioctl de Linux para reflink (btrfs, xfs, bcachefs)
+
+
+def _copy_file_fast(src: Path, dst: Path) -> str:
+    """
+    Copia src → dst sin cargar el archivo en memoria de Python.
+    Intenta, en orden: reflink (copy-on-write), os.copy_file_range y
+    shutil.copyfile (que usa sendfile donde existe). La copia se hace a un
+    .tmp y se renombra, igual que write_bytes.
+    Retorna el método usado ("reflink", "copy_file_range" o "copyfile").
+    """
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_suffix(dst.suffix + ".tmp")
+    method = "copyfile"
+    try:
+        with open(src, "rb") as fsrc, open(tmp, "wb") as fdst:
+            if fcntl is not None:
+                try:
+                    fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+                    method = "reflink"
+                except OSError:
+                    pass
+            if method != "reflink" and hasattr(os, "copy_file_range"):
+                remaining = -1
+                try:
+                    remaining = os.fstat(fsrc.fileno()).st_size
+                    while remaining > 0:
+                        n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), min(remaining, 1 << 30))
+                        if n == 0:
+                            break
+                        remaining -= n
+                except OSError:
+                    pass  # FS sin soporte (o entre dispositivos en kernels viejos)
+                if remaining == 0:
+                    method = "copy_file_range"
+                else:
+                    # Error o copia corta (origen truncado, FS que devuelve 0):
+                    # descartar lo copiado y usar shutil.copyfile
+                    fsrc.seek(0)
+                    fdst.seek(0)
+                    fdst.truncate()
+        if method == "copyfile":
+            shutil.copyfile(src, tmp)
+        tmp.replace(dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return method
+
+
+@contextmanager
+def _map_file(path: Path) -> Iterator[memoryview]:
+    """memoryview de solo lectura sobre un mmap del archivo (vacío → b"")."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap no admite archivos vacíos
+            yield memoryview(b"")
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                yield view
+            finally:
+                view.release()
+
+
+def _link_attrs(tag: str) -> Dict[str, str]:
+    attrs = {}
+    for m in _ATTR_RE.finditer(tag):
+        attrs[m.group(1).lower()] = next(g for g in m.group(2, 3, 4) if g is not None)
+    return attrs
+
+
+def _stylesheet_link(href: str) -> str:
+    return f'<link rel="stylesheet" type="text/css" href="{html.escape(href)}"/>'
+
+
+def _rewrite_head_stylesheets(raw: str, rel_links: List[str], clear_existing: bool,
+                              href: str = "") -> str:
+    """
+    Reemplaza/añade los <link rel="stylesheet"> editando solo el texto del
+    <head>; el resto del documento (prólogo, DOCTYPE, body) no se toca.
+    """
+    head_open = _HEAD_OPEN_RE.search(raw)
+    if head_open is None or head_open.group(1):
+        # Sin <head> (o <head/> vacío): crear uno con los links
+        links = "".join(f"\n  {_stylesheet_link(h)}" for h in rel_links)
+        if head_open is not None:
+            return f"{raw[:head_open.start()]}<head>{links}\n</head>{raw[head_open.end():]}"
+        html_open = _HTML_OPEN_RE.search(raw)
+        if html_open is None:
+            raise RuntimeError(f"No se encontró <head> ni <html> en {href}")
+        pos = html_open.end()
+        return f"{raw[:pos]}\n<head>{links}\n</head>{raw[pos:]}"
+
+    head_close = _HEAD_CLOSE_RE.search(raw, head_open.end())
+    if head_close is None:
+        raise RuntimeError(f"<head> sin cerrar en {href}")
+    head = raw[head_open.end():head_close.start()]
+
+    # Quitar los stylesheet existentes recordando dónde estaba el primero
+    pieces: List[str] = []
+    last = 0
+    first_removed: Optional[int] = None
+    indent: Optional[str] = None
+    present: set[str] = set()
+    for m in _LINK_TAG_RE.finditer(head):
+        attrs = _link_attrs(m.group(0))
+        if attrs.get("rel", "").strip().lower() != "stylesheet":
+            continue
+        if indent is None:
+            tag = m.group(0)
+            indent = tag[:len(tag) - len(tag.lstrip(" \t"))]
+        if not clear_existing:
+            present.add(attrs.get("href", ""))
+            continue
+        pieces.append(head[last:m.start()])
+        if first_removed is None:
+            first_removed = sum(len(p) for p in pieces)
+        last = m.end()
+    pieces.append(head[last:])
+    new_head = "".join(pieces)
+
+    to_add = [h for h in rel_links if h not in present]
+    if to_add:
+        multiline = "\n" in head
+        if indent is None:
+            m_indent = re.search(r"\n([ \t]*)<", head)
+            indent = m_indent.group(1) if m_indent else ""
+        if not multiline:
+            insert_at = first_removed if first_removed is not None else len(new_head.rstrip())
+            new_tags = "".join(_stylesheet_link(h) for h in to_add)
+        elif first_removed is not None:
+            # Ocupar las líneas de los links quitados
+            insert_at = first_removed
+            new_tags = "".join(f"{indent}{_stylesheet_link(h)}\n" for h in to_add)
+        else:
+            # Al final del head, antes del salto previo a </head>
+            insert_at = len(new_head.rstrip())
+            new_tags = "".join(f"\n{indent}{_stylesheet_link(h)}" for h in to_add)
+        new_head = new_head[:insert_at] + new_tags + new_head[insert_at:]
+
+    return raw[:head_open.end()] + new_head + raw[head_close.start():]
+
+
 # -----------------------------
 # Data holders
 # -----------------------------
@@ -218,10 +391,19 @@ class GutenCore:
         from .hook_index_manager import HookIndexManager
         self.hook_index = HookIndexManager(self)
 
+        # Índice invertido para la búsqueda global (se construye a demanda)
+        from .search_index import SearchIndex
+        self.search_index = SearchIndex(self)
+
+        # Estadísticas por capítulo, cacheadas por huella del contenido
+        from .book_stats import BookStatistics
+        self.book_stats = BookStatistics(self)
+
     # -------------------------
     # Proyecto / apertura
     # -------------------------
     @classmethod
+    @traced("core.open_epub")
     def open_epub(cls, epub_path: Path, workdir: Path) -> "GutenCore":
         """Descomprime el EPUB en workdir/<epub_sin_extension> y prepara el core."""
         book_name = Path(epub_path).stem
@@ -239,6 +421,7 @@ class GutenCore:
         return core
 
     @classmethod
+    @traced("core.open_folder")
     def open_folder(cls, workdir: Path) -> "GutenCore":
         core = cls(workdir)
         core._load_container_and_opf()
@@ -354,9 +537,7 @@ class GutenCore:
 
         # Construir índice de hooks inicial (lazy/async si el proyecto es grande)
         # Por ahora lo hacemos síncrono en el hilo principal
-        stats = self.hook_index.build_full_index()
-        print(f"[HookIndex] Indexados {stats['files_indexed']} archivos, "
-              f"{stats['hooks_found']} hooks en {stats['time_ms']}ms")
+        self.hook_index.build_full_index()
 
     # -------------------------
     # Inventario y metadata
@@ -496,6 +677,7 @@ class GutenCore:
             ids.insert(max(0, min(index, len(ids))), idref)
         self.set_spine(ids)
 
+    @traced("core.spine_move")
     def spine_move(self, idref: str, new_index: int) -> None:
         ids = self.get_spine()
         if idref not in ids:
@@ -515,24 +697,46 @@ class GutenCore:
     # -------------------------
     def add_to_manifest(self, id_: str, href: str, media_type: Optional[str] = None,
                         properties: str = "") -> ManifestItem:
+        return self.add_items_to_manifest([(id_, href, media_type, properties)])[0]
+
+    def add_items_to_manifest(
+        self, items: Iterable[Tuple[str, str, Optional[str], str]]
+    ) -> List[ManifestItem]:
+        """
+        Alta de varios items en una sola transacción: valida todo primero y
+        escribe el OPF (y re-indexa) UNA vez, en lugar de una por item.
+
+        items: tuplas (id, href, media_type|None, properties)
+        """
         assert self.opf_tree is not None
-        root = self.opf_tree.getroot()
-        man = root.find(".//opf:manifest", NS)
-        if id_ in self.items_by_id:
-            raise ValueError(f"Ya existe id {id_}")
-        if href in self.items_by_href:
-            raise ValueError(f"Ya existe href {href}")
-        mt = (media_type or guess_media_type(href))
-        el = ET.SubElement(man, f"{{{NS['opf']}}}item", {
-            "id": id_, "href": href, "media-type": mt
-        })
-        if properties:
-            el.set("properties", properties)
-        mi = ManifestItem(id_, href, mt, properties)
-        self.items_by_id[id_] = mi
-        self.items_by_href[href] = mi
+        items = list(items)
+        if not items:
+            return []
+        new_ids: set[str] = set()
+        new_hrefs: set[str] = set()
+        for id_, href, _mt, _props in items:
+            if id_ in self.items_by_id or id_ in new_ids:
+                raise ValueError(f"Ya existe id {id_}")
+            if href in self.items_by_href or href in new_hrefs:
+                raise ValueError(f"Ya existe href {href}")
+            new_ids.add(id_)
+            new_hrefs.add(href)
+
+        man = self.opf_tree.getroot().find(".//opf:manifest", NS)
+        added: List[ManifestItem] = []
+        for id_, href, media_type, properties in items:
+            mt = (media_type or guess_media_type(href))
+            el = ET.SubElement(man, f"{{{NS['opf']}}}item", {
+                "id": id_, "href": href, "media-type": mt
+            })
+            if properties:
+                el.set("properties", properties)
+            mi = ManifestItem(id_, href, mt, properties or "")
+            self.items_by_id[id_] = mi
+            self.items_by_href[href] = mi
+            added.append(mi)
         self._save_opf()
-        return mi
+        return added
 
     def remove_from_manifest(self, id_or_href: str) -> None:
         assert self.opf_tree is not None
@@ -545,6 +749,7 @@ class GutenCore:
         p = (self.opf_dir / mi.href).resolve()
         if p.exists():
             p.unlink()
+        self.search_index.forget(mi.href)
         # quitar del manifest
         for it in man.findall("opf:item", NS):
             if it.get("id") == mi.id:
@@ -554,6 +759,7 @@ class GutenCore:
         self.items_by_href.pop(mi.href, None)
         self._save_opf()
 
+    @traced("core.rename_item")
     def rename_item(self, id_or_href: str, new_name: str, update_references: bool = False) -> str:
         """
         Renombra un recurso del manifest y su archivo físico.
@@ -595,6 +801,8 @@ class GutenCore:
         if src_path.exists():
             dst_path.parent.mkdir(parents=True, exist_ok=True)
             src_path.rename(dst_path)
+        self.search_index.forget(old_href)
+        self.search_index.forget(new_href)
         
         # Actualizar manifest
         root = self.opf_tree.getroot()
@@ -645,7 +853,7 @@ class GutenCore:
                     
                     if updated_content != content:
                         self.write_text(doc_item.href, updated_content)
-                        print(f"[RENAME] Updated references in {doc_item.href}")
+                        count("rename.files_updated")
                         
             except Exception as e:
                 print(f"[WARNING] Could not update references in {doc_item.href}: {e}")
@@ -661,7 +869,7 @@ class GutenCore:
 
                     if updated_content != content:
                         self.write_text(style_item.href, updated_content)
-                        print(f"[RENAME] Updated references in {style_item.href}")
+                        count("rename.files_updated")
 
             except Exception as e:
                 print(f"[WARNING] Could not update references in {style_item.href}: {e}")
@@ -692,7 +900,7 @@ class GutenCore:
 
                     if updated_nav != nav_content:
                         self.write_text(nav_href, updated_nav)
-                        print(f"[RENAME] Updated navigation references in {nav_href}")
+                        count("rename.files_updated")
 
             except Exception as e:
                 print(f"[WARNING] Could not update references in nav.xhtml: {e}")
@@ -705,7 +913,7 @@ class GutenCore:
             if first_doc and first_doc.href == new_href:
                 try:
                     self.generate_nav_basic(overwrite=True)
-                    print(f"[RENAME] Regenerated navigation for first spine document")
+                    count("rename.nav_regenerated")
                 except Exception as e:
                     print(f"[WARNING] Could not regenerate navigation: {e}")
 
@@ -861,20 +1069,39 @@ class GutenCore:
     def write_text(self, href: str, text: str, encoding: str = "utf-8") -> None:
         p = (self.opf_dir / href).resolve()
         p.parent.mkdir(parents=True, exist_ok=True)
-        
-        # DEBUG: Log quién está llamando
-        import traceback
-        print(f"\n[CORE-WRITE] {href}")
-        print("Stack trace:")
-        for line in traceback.format_stack()[-4:-1]:
-            print(f"  {line.strip()}")
-        
-        tmp = p.with_suffix(p.suffix + ".tmp")
-        tmp.write_text(text, encoding=encoding)
-        tmp.replace(p)
-        
-        print(f"[CORE-WRITE] Completed: {p}")
-
+        with span("core.write_text", href=href):
+            tmp = p.with_suffix(p.suffix + ".tmp")
+            tmp.write_text(text, encoding=encoding)
+            tmp.replace(p)
+        self.search_index.file_written(href, text)
+        count("core.files_written")
+        count("core.chars_written", len(text))
+
+    def write_texts(self, texts: Dict[str, str], encoding: str = "utf-8") -> None:
+        """
+        Escribe varios archivos como una transacción: primero todos los .tmp
+        (si alguno falla se borran y no se toca ningún archivo), después los
+        renombres atómicos.
+        """
+        staged: List[Tuple[Path, Path]] = []
+        with span("core.write_texts", files=len(texts)):
+            try:
+                for href, text in texts.items():
+                    p = (self.opf_dir / href).resolve()
+                    p.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = p.with_suffix(p.suffix + ".tmp")
+                    staged.append((tmp, p))
+                    tmp.write_text(text, encoding=encoding)
+            except Exception:
+                for tmp, _ in staged:
+                    tmp.unlink(missing_ok=True)
+                raise
+            for tmp, p in staged:
+                tmp.replace(p)
+        for href, text in texts.items():
+            self.search_index.file_written(href, text)
+        count("core.files_written", len(texts))
+        count("core.chars_written", sum(len(t) for t in texts.values()))
 
     def read_bytes(self, href: str) -> bytes:
         p = (self.opf_dir / href).resolve()
@@ -887,6 +1114,27 @@ class GutenCore:
         tmp.write_bytes(data)
         tmp.replace(p)
 
+    @contextmanager
+    def open_resource(self, href: str, stream: bool = False) -> Iterator[Union[memoryview, BinaryIO]]:
+        """
+        Acceso de solo lectura a un recurso sin copiarlo a un `bytes`.
+
+        Por defecto entrega un memoryview sobre un mmap del archivo (las páginas
+        se cargan bajo demanda); con stream=True entrega el archivo binario
+        abierto para leerlo por partes. La vista es válida SOLO dentro del
+        `with`: no conservar slices fuera del bloque.
+
+            with core.open_resource("Images/foto.jpg") as view:
+                zf.writestr(info, view)
+        """
+        p = (self.opf_dir / href).resolve()
+        if stream:
+            with open(p, "rb") as f:
+                yield f
+        else:
+            with _map_file(p) as view:
+                yield view
+
     # -------------------------
     # Operaciones compuestas (UX)
     # -------------------------
@@ -923,14 +1171,89 @@ class GutenCore:
         dest_name = dest_name or src.name
         folder = self._folder_for_kind(kind)
         href = f"{folder}/{dest_name}"
-        data = src.read_bytes()
-        self.write_bytes(href, data)
+        _copy_file_fast(src, (self.opf_dir / href).resolve())
+        self.search_index.forget(href)
         id_ = self._unique_id(Path(dest_name).stem)
         mt = guess_media_type(dest_name)
         props = "cover-image" if (set_as_cover and kind == KIND_IMAGE) else ""
         mi = self.add_to_manifest(id_, href, media_type=mt, properties=props)
         return mi
 
+    @traced("core.import_assets_from_disk")
+    def import_assets_from_disk(
+        self,
+        sources: Iterable[Path | Tuple[Path, str]],
+        kind: str,
+        *,
+        cover: Optional[Path] = None,
+        max_workers: int = 8,
+    ) -> Tuple[List[ManifestItem], List[str]]:
+        """
+        Importación masiva de recursos externos (imágenes, fuentes, audio...).
+
+        - sources: rutas, o tuplas (ruta, nombre_destino)
+        - cover: ruta (de sources) a marcar como cover-image (solo imágenes)
+
+        Las copias se hacen en paralelo y por streaming (reflink /
+        copy_file_range / copyfile) y el manifest se actualiza en UNA sola
+        transacción al final. Los conflictos y errores de copia no abortan el
+        lote: se devuelven junto a los items importados.
+
+        Retorna: (items_agregados, errores)
+        """
+        folder = self._folder_for_kind(kind)
+        errors: List[str] = []
+        planned: List[Tuple[Path, str, str]] = []  # (src, href, id)
+        hrefs: set[str] = set()
+        ids: set[str] = set()
+
+        for entry in sources:
+            src, dest_name = (entry if isinstance(entry, tuple) else (entry, None))
+            src = Path(src)
+            dest_name = dest_name or src.name
+            href = f"{folder}/{dest_name}"
+            if href in self.items_by_href or href in hrefs:
+                errors.append(f"{src.name}: ya existe {href}")
+                continue
+            if not src.is_file():
+                errors.append(f"{src.name}: no es un archivo")
+                continue
+            base_id = self._unique_id(Path(dest_name).stem)
+            id_, n = base_id, 1
+            while id_ in ids:
+                n += 1
+                id_ = self._unique_id(f"{base_id}-{n}")
+            hrefs.add(href)
+            ids.add(id_)
+            planned.append((src, href, id_))
+
+        def copy(job: Tuple[Path, str, str]):
+            src, href, _id = job
+            try:
+                _copy_file_fast(src, (self.opf_dir / href).resolve())
+                return None
+            except OSError as e:
+                return f"{src.name}: {e}"
+
+        copied: List[Tuple[Path, str, str]] = []
+        if planned:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(planned)))) as pool:
+                for job, err in zip(planned, pool.map(copy, planned)):
+                    if err:
+                        errors.append(err)
+                    else:
+                        copied.append(job)
+                        self.search_index.forget(job[1])
+
+        cover_path = Path(cover).resolve() if cover is not None else None
+        entries = []
+        for src, href, id_ in copied:
+            is_cover = kind == KIND_IMAGE and cover_path is not None and src.resolve() == cover_path
+            entries.append((id_, href, guess_media_type(href), "cover-image" if is_cover else ""))
+        added = self.add_items_to_manifest(entries)
+        count("assets.imported", len(added))
+        return added, errors
+
     def delete_item(self, id_or_href: str, remove_from_nav: bool = False) -> None:
         # (remove_from_nav queda para cuando implementes edición de nav.xhtml)
         self.remove_from_manifest(id_or_href)
@@ -1015,6 +1338,7 @@ class GutenCore:
 
     # --- Paso 1: recolección (no renderiza nada) ---
 
+    @traced("core.collect_headings")
     def collect_headings(
         self,
         levels: tuple[int, ...] = (1, 2, 3),
@@ -1370,6 +1694,7 @@ class GutenCore:
     # -------------------------
     # Exportar
     # -------------------------
+    @traced("core.export_epub")
     def export_epub(self, out_path: Path, include_unreferenced: bool = False) -> None:
         """
         Empaqueta el workdir como EPUB sin usar ebooklib.
@@ -1397,6 +1722,10 @@ class GutenCore:
         # --- Construir lista de entradas a zipear ---
         entries: list[tuple[Path, str, int]] = []  # (path_absoluto, arcname_relativo, compression)
 
+        def comp_for(media_type: str) -> int:
+            # Formatos ya comprimidos: recomprimir con deflate no gana nada y cuesta CPU
+            return zipfile.ZIP_STORED if media_type in _PRECOMPRESSED_MEDIA else zipfile.ZIP_DEFLATED
+
         # 1) mimetype obligatorio en la raíz, sin compresión y PRIMERO
         mimetype_path = (self.workdir / "mimetype")
         if not mimetype_path.exists():
@@ -1429,7 +1758,7 @@ class GutenCore:
             if not abs_path.exists():
                 raise FileNotFoundError(f"Falta en disco el recurso del manifest: {mi.href}")
             if arcname not in added:
-                entries.append((abs_path, arcname, zipfile.ZIP_DEFLATED))
+                entries.append((abs_path, arcname, comp_for(mi.media_type)))
                 added.add(arcname)
 
         # 4) (Opcional) incluir archivos no referenciados por el manifest
@@ -1446,12 +1775,18 @@ class GutenCore:
                     added.add(arcname)
 
         # --- Escribir ZIP/EPUB respetando el orden (mimetype 1º) ---
+        # Cada archivo se vuelca desde un mmap en una sola escritura (CRC y
+        # deflate corren en C sobre todo el buffer, sin copias intermedias).
         with zipfile.ZipFile(out_path, mode="w") as z:
             for path_abs, arcname, comp in entries:
                 # asegurar separador '/'
                 arcname = arcname.replace("\\", "/")
-                # zipinfo para fijar permisos legibles (no imprescindible)
-                z.write(path_abs, arcname=arcname, compress_type=comp)
+                # zipinfo para fijar fecha y permisos desde el archivo
+                info = zipfile.ZipInfo.from_file(path_abs, arcname)
+                info.compress_type = comp
+                with _map_file(path_abs) as view, \
+                        z.open(info, mode="w", force_zip64=info.file_size > zipfile.ZIP64_LIMIT) as dest:
+                    dest.write(view)
 
         # Validación amistosa
         # Chequeo rápido: abrir el OPF dentro del .epub y verificar que el spine no esté vacío
@@ -1478,6 +1813,7 @@ class GutenCore:
     # -------------------------
     # Persistir OPF
     # -------------------------
+    @traced("core.save_opf")
     def _save_opf(self) -> None:
         assert self.opf_tree is not None and self.opf_path is not None
         self.opf_tree.write(self.opf_path, encoding="utf-8", xml_declaration=True)
@@ -1572,6 +1908,7 @@ class GutenCore:
         frag = frag.replace("<br>", "<br/>").replace("<hr>", "<hr/>")
         return frag
     
+    @traced("core.set_styles_for_documents")
     def set_styles_for_documents(
         self,
         docs: list[str],
@@ -1590,12 +1927,17 @@ class GutenCore:
         - clear_existing: elimina los <link rel="stylesheet"> actuales del <head> antes de insertar.
         - add_to_manifest_if_missing: si un CSS existe en disco pero no está en el manifest, lo agrega.
 
+        Solo se edita el texto del <head> (prólogo, DOCTYPE y body quedan intactos),
+        los documentos se procesan en paralelo y los CSS faltantes se registran en
+        una única escritura del OPF.
+
         Retorna: dict { href_doc: [href_relativos_insertados...] }
                 (los hrefs insertados son relativos al documento, típicamente "../Styles/*.css")
         """
-        # 1) Normalizar lista de estilos a HREFS relativos al OPF y asegurar manifest si corresponde
+        # 1) Normalizar lista de estilos a HREFS relativos al OPF
         styles_dir_name = Path(self.layout["STYLES"]).name
         styles_opf_hrefs: list[str] = []
+        missing: list[tuple[str, str, Optional[str], str]] = []
 
         for s in styles:
             s = s.replace("\\", "/")
@@ -1603,17 +1945,23 @@ class GutenCore:
                 opf_href = f"{styles_dir_name}/{s}"
             else:
                 opf_href = s.lstrip("/")
+            if opf_href in styles_opf_hrefs:
+                continue
             styles_opf_hrefs.append(opf_href)
 
             if add_to_manifest_if_missing and opf_href not in self.items_by_href:
                 abs_path = (self.opf_dir / opf_href).resolve()
                 if abs_path.exists():
                     css_id = self._unique_id(Path(opf_href).stem)
-                    self.add_to_manifest(css_id, opf_href, media_type="text/css")
-
-        results: dict[str, list[str]] = {}
-
-        # 2) Aplicar a cada documento
+                    taken = {m[0] for m in missing}
+                    base_id, n = css_id, 1
+                    while css_id in taken:
+                        n += 1
+                        css_id = self._unique_id(f"{base_id}-{n}")
+                    missing.append((css_id, opf_href, "text/css", ""))
+
+        # 2) Validar documentos y calcular los links relativos de cada uno
+        jobs: list[tuple[str, list[str]]] = []
         for d in docs:
             mi_doc = self._get_item(d)
             mt = (mi_doc.media_type or "").split(";")[0].strip().lower()
@@ -1626,47 +1974,32 @@ class GutenCore:
                 raise ValueError(f"'{d}' no es un documento XHTML/HTML (media-type={mi_doc.media_type})")
 
             # hrefs RELATIVOS al documento (../Styles/foo.css)
-            from posixpath import relpath as posix_relpath
             doc_dir = Path(mi_doc.href).parent.as_posix()
             rel_links = [
-                posix_relpath(opf_href, start=doc_dir) if doc_dir else opf_href
+                posix_relpath(opf_href, start=doc_dir) if doc_dir not in ("", ".") else opf_href
                 for opf_href in styles_opf_hrefs
             ]
+            jobs.append((mi_doc.href, rel_links))
 
-            # Editar el XHTML: limpiar/insertar <link>
-            import xml.etree.ElementTree as ET
-            raw = self.read_text(mi_doc.href)
-            try:
-                root = ET.fromstring(raw)
-            except ET.ParseError as e:
-                raise RuntimeError(f"XHTML mal formado en {mi_doc.href}: {e}")
-
-            head = root.find(".//xhtml:head", NS)
-            if head is None:
-                html = root if root.tag.endswith("html") else None
-                if html is None:
-                    raise RuntimeError(f"No se encontró <head> ni <html> en {mi_doc.href}")
-                head = ET.SubElement(html, f"{{{NS['xhtml']}}}head")
-
-            if clear_existing:
-                for link in list(head.findall("xhtml:link", NS)):
-                    if (link.get("rel") or "").lower() == "stylesheet":
-                        head.remove(link)
-
-            for rel_href in rel_links:
-                ET.SubElement(head, f"{{{NS['xhtml']}}}link", {
-                    "rel": "stylesheet",
-                    "type": "text/css",
-                    "href": rel_href
-                })
-
-            # Guardar (ET no preserva DOCTYPE; válido para EPUB3)
-            new_xml = ET.tostring(root, encoding="unicode")
-            self.write_text(mi_doc.href, new_xml)
-
-            results[mi_doc.href] = rel_links
+        # 3) Reescribir el <head> de cada documento en paralelo. Primero se
+        #    calcula todo: si un documento falla no se escribe nada (ni el OPF).
+        def rewrite(job: tuple[str, list[str]]) -> tuple[str, str, str]:
+            href, rel_links = job
+            raw = self.read_text(href)
+            return href, raw, _rewrite_head_stylesheets(raw, rel_links, clear_existing, href)
 
-        return results
+        with ThreadPoolExecutor(max_workers=min(8, max(1, len(jobs)))) as pool:
+            rewritten = list(pool.map(rewrite, jobs))
+            changed = [(href, new) for href, raw, new in rewritten if new != raw]
+
+            # 4) CSS faltantes: una sola transacción de manifest (un _save_opf)
+            if missing:
+                self.add_items_to_manifest(missing)
+
+            list(pool.map(lambda item: self.write_text(*item), changed))
+        count("styles.documents_rewritten", len(changed))
+
+        return {href: rel_links for href, rel_links in jobs}
 
     def _update_item_properties(self, id_or_href: str, new_properties: str = "") -> None:
         """
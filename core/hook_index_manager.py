@@ -15,6 +15,8 @@ from typing import Dict, List, Optional, Set, Tuple
 from dataclasses import dataclass
 import time
 
+from .instrumentation import span, traced, count
+
 
 @dataclass
 class Hook:
@@ -79,18 +81,21 @@ class HookIndexManager:
 
         start_time = time.time()
 
-        # Limpiar índice anterior
-        self.index.clear()
-        self._dirty_files.clear()
-        self._last_index_time.clear()
+        with span("hook_index.build_full_index") as sp:
+            # Limpiar índice anterior
+            self.index.clear()
+            self._dirty_files.clear()
+            self._last_index_time.clear()
+
+            # Obtener todos los archivos HTML del manifest
+            html_files = self._get_all_html_files()
 
-        # Obtener todos los archivos HTML del manifest
-        html_files = self._get_all_html_files()
+            total_hooks = 0
+            for file_href in html_files:
+                hooks_in_file = self._index_file(file_href)
+                total_hooks += len(hooks_in_file)
 
-        total_hooks = 0
-        for file_href in html_files:
-            hooks_in_file = self._index_file(file_href)
-            total_hooks += len(hooks_in_file)
+            sp.set(files=len(html_files), hooks=total_hooks)
 
         elapsed_ms = int((time.time() - start_time) * 1000)
 
@@ -173,6 +178,7 @@ class HookIndexManager:
             # Actualizar índice maestro
             self.index[file_href] = hooks_dict
             self._last_index_time[file_href] = time.time()
+            count("hook_index.files_parsed")
 
             # Marcar como limpio
             self._dirty_files.discard(file_href)
@@ -223,6 +229,7 @@ class HookIndexManager:
         """
         self._dirty_files.add(file_href)
 
+    @traced("hook_index.update_file_index")
     def update_file_index(self, file_href: str) -> int:
         """
         Re-indexa un archivo específico (actualización reactiva)
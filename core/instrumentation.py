@@ -0,0 +1,274 @@
+"""
+core/instrumentation.py
+Instrumentación liviana: spans con nombre, contadores, traza Chrome y cProfile
+
+Arquitectura:
+- span(nombre, **args): context manager que mide una operación (anidable, por hilo)
+- traced(nombre): decorador equivalente para métodos completos
+- count(nombre, n): contadores acumulados (bytes escritos, archivos tocados, ...)
+- Desactivado (por defecto): span() devuelve un contexto nulo compartido y
+  count() retorna tras un único `if`, así que el costo es prácticamente cero.
+
+Activación por variables de entorno (se leen al importar el módulo):
+    GUTENAI_TRACE=1              registrar spans/contadores en memoria
+    GUTENAI_TRACE=/tmp/t.json    además volcar traza Chrome al salir
+                                 (abrir con chrome://tracing o ui.perfetto.dev)
+    GUTENAI_TRACE_LOG=1          imprimir cada span al cerrarse ("[Trace] ...")
+    GUTENAI_PROFILE=/tmp/prof    un .prof de cProfile por operación de primer nivel
+                                 (ver con `python -m pstats` o snakeviz)
+
+También se puede activar desde código con enable()/disable().
+"""
+
+from __future__ import annotations
+
+import atexit
+import cProfile
+import functools
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+class _State:
+    """Estado global de la instrumentación (un único objeto por proceso)."""
+
+    def __init__(self):
+        self.enabled = False
+        self.log = False
+        self.trace_path: Optional[Path] = None
+        self.profile_dir: Optional[Path] = None
+        self.lock = threading.Lock()
+        self.events: List[dict] = []            # eventos formato Chrome trace
+        self.counters: Dict[str, float] = {}
+        self.totals: Dict[str, List[float]] = {}  # nombre → [llamadas, total_ms, max_ms]
+        self.local = threading.local()          # profundidad de spans por hilo
+        self.profile_seq = 0
+        self.t0 = time.perf_counter()
+
+
+_state = _State()
+
+
+# =====================================================
+# SPANS
+# =====================================================
+
+class _NullSpan:
+    """Span inerte: lo que devuelve span() con la instrumentación apagada."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """Span activo: mide tiempo de pared y registra el evento al cerrarse."""
+    __slots__ = ("name", "args", "_start", "_profiler")
+
+    def __init__(self, name: str, args: Dict[str, Any]):
+        self.name = name
+        self.args = args
+        self._start = 0.0
+        self._profiler: Optional[cProfile.Profile] = None
+
+    def set(self, **args) -> None:
+        """Adjunta datos al span (p.ej. resultados conocidos recién al final)."""
+        self.args.update(args)
+
+    def __enter__(self):
+        local = _state.local
+        depth = getattr(local, "depth", 0)
+        local.depth = depth + 1
+        if depth == 0 and _state.profile_dir is not None:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                self._profiler = profiler
+            except ValueError:
+                # Otro hilo ya está perfilando (cProfile es global en 3.12+)
+                self._profiler = None
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        _state.local.depth -= 1
+        if self._profiler is not None:
+            self._profiler.disable()
+            _dump_profile(self.name, self._profiler)
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        _record_span(self.name, self._start, end, self.args)
+        return False
+
+
+def span(name: str, **args):
+    """
+    Context manager que mide una operación con nombre.
+
+        with span("core.export_epub", out=str(path)) as sp:
+            ...
+            sp.set(entries=len(entries))
+    """
+    if not _state.enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorador: envuelve la función completa en un span."""
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*a, **kw):
+            if not _state.enabled:
+                return fn(*a, **kw)
+            with _Span(span_name, {}):
+                return fn(*a, **kw)
+        return wrapper
+    return decorator
+
+
+def count(name: str, value: float = 1) -> None:
+    """Suma `value` al contador `name`."""
+    if not _state.enabled:
+        return
+    with _state.lock:
+        total = _state.counters.get(name, 0) + value
+        _state.counters[name] = total
+        if _state.trace_path is not None:
+            _state.events.append({
+                "name": name, "ph": "C", "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "ts": _micros(time.perf_counter()),
+                "args": {"value": total},
+            })
+
+
+def _micros(t: float) -> float:
+    return round((t - _state.t0) * 1_000_000, 3)
+
+
+def _record_span(name: str, start: float, end: float, args: Dict[str, Any]) -> None:
+    dur_ms = (end - start) * 1000.0
+    with _state.lock:
+        agg = _state.totals.get(name)
+        if agg is None:
+            _state.totals[name] = [1, dur_ms, dur_ms]
+        else:
+            agg[0] += 1
+            agg[1] += dur_ms
+            if dur_ms > agg[2]:
+                agg[2] = dur_ms
+        if _state.trace_path is not None:
+            _state.events.append({
+                "name": name, "cat": name.split(".", 1)[0], "ph": "X",
+                "pid": os.getpid(), "tid": threading.get_ident(),
+                "ts": _micros(start), "dur": round(dur_ms * 1000.0, 3),
+                "args": {k: _jsonable(v) for k, v in args.items()},
+            })
+    if _state.log:
+        extra = f" {args}" if args else ""
+        print(f"[Trace] {name} {dur_ms:.2f}ms{extra}")
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def _dump_profile(name: str, profiler: cProfile.Profile) -> None:
+    with _state.lock:
+        _state.profile_seq += 1
+        seq = _state.profile_seq
+    safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+    try:
+        _state.profile_dir.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(_state.profile_dir / f"{seq:04d}-{safe}.prof"))
+    except OSError as e:
+        print(f"[Trace] No se pudo guardar el perfil de {name}: {e}")
+
+
+# =====================================================
+# CONFIGURACIÓN Y CONSULTA
+# =====================================================
+
+def enabled() -> bool:
+    return _state.enabled
+
+
+def enable(trace_path: Optional[Path] = None, profile_dir: Optional[Path] = None,
+           log: bool = False) -> None:
+    """Activa la instrumentación (idempotente)."""
+    _state.enabled = True
+    _state.log = log
+    _state.trace_path = Path(trace_path) if trace_path else None
+    _state.profile_dir = Path(profile_dir) if profile_dir else None
+
+
+def disable() -> None:
+    _state.enabled = False
+
+
+def reset() -> None:
+    """Descarta eventos, contadores y totales acumulados."""
+    with _state.lock:
+        _state.events.clear()
+        _state.counters.clear()
+        _state.totals.clear()
+        _state.t0 = time.perf_counter()
+
+
+def counters() -> Dict[str, float]:
+    with _state.lock:
+        return dict(_state.counters)
+
+
+def summary() -> Dict[str, Dict[str, float]]:
+    """Totales por span: {nombre: {"calls", "total_ms", "max_ms"}}."""
+    with _state.lock:
+        return {
+            name: {"calls": int(c), "total_ms": round(t, 3), "max_ms": round(m, 3)}
+            for name, (c, t, m) in _state.totals.items()
+        }
+
+
+def write_chrome_trace(path: Path) -> Path:
+    """Escribe los eventos registrados en formato Chrome trace (JSON)."""
+    path = Path(path)
+    with _state.lock:
+        payload = {"traceEvents": list(_state.events), "displayTimeUnit": "ms"}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload), encoding="utf-8")
+    return path
+
+
+def _configure_from_env() -> None:
+    trace = os.environ.get("GUTENAI_TRACE", "").strip()
+    profile = os.environ.get("GUTENAI_PROFILE", "").strip()
+    log = os.environ.get("GUTENAI_TRACE_LOG", "").strip() not in ("", "0")
+    if not (trace or profile or log):
+        return
+    trace_path = Path(trace) if trace and trace not in ("1", "true", "yes") else None
+    enable(trace_path=trace_path, profile_dir=Path(profile) if profile else None, log=log)
+    if trace_path is not None:
+        atexit.register(write_chrome_trace, trace_path)
+
+
+_configure_from_env()
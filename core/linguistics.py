@@ -0,0 +1,155 @@
+"""
+core/linguistics.py
+Métricas lingüísticas del texto visible (sin dependencias GTK)
+
+Arquitectura:
+- analyze_blocks(): una pasada sobre los bloques (párrafos) de un capítulo:
+  oraciones, palabras en diálogo y vocabulario (Counter de formas en
+  minúsculas, armado con findall en C)
+- Las sílabas se cuentan una vez por forma distinta del vocabulario y se
+  multiplican por su frecuencia: el costo depende del vocabulario, no del
+  largo del libro
+- readability(): Fernández-Huerta (es) o Flesch (en) según dc:language
+- top_words(): palabras más repetidas sin palabras vacías del idioma
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+# Palabras: letras con apóstrofos o guiones internos (no números)
+_WORD_RE = re.compile(r"[^\W\d_]+(?:['’-][^\W\d_]+)*")
+# Fin de oración: . ! ? … (con comillas/paréntesis de cierre) seguido de espacio
+_SENTENCE_SPLIT_RE = re.compile(r"[.!?…]+[»”\"'’)\]]*\s+")
+_HAS_LETTER_RE = re.compile(r"[^\W\d_]")
+# Un párrafo de diálogo empieza con raya o comillas de apertura
+_DIALOGUE_OPENERS = ("—", "―", "–", "«", "“", "\"", "‘")
+
+_ES_VOWEL_GROUP_RE = re.compile(r"[aeiouáéíóúü]+")
+_ES_STRONG = frozenset("aeoáéó")
+_ES_ACCENTED_WEAK = frozenset("íú")
+_EN_VOWEL_GROUP_RE = re.compile(r"[aeiouy]+")
+
+STOPWORDS = {
+    "es": frozenset("""
+        a al algo algunos ante antes así aun aunque bien cada como con contra cual
+        cuando de del desde donde dos el ella ellas ello ellos en entre era eran
+        eres es esa esas ese eso esos esta está estaba estaban estas este esto
+        estos fue fueron ha había habían han hasta hay la las le les lo los más
+        me mi mis mucho muy nada ni no nos nosotros o os otra otro para pero poco
+        por porque que qué quien se sea según ser si sí sin sino sobre son su
+        sus también tan tanto te tenía ti tiene todo todos tu tú tus un una uno
+        unos usted vez y ya yo
+    """.split()),
+    "en": frozenset("""
+        a about after all also an and any are as at be been but by can could did
+        do does for from had has have he her him his how i if in into is it its
+        just me more my no not now of on one only or other our out she so some
+        than that the their them then there these they this to up us was we were
+        what when which who will with would you your
+    """.split()),
+}
+
+READABILITY_FORMULAS = {"es": "Fernández-Huerta", "en": "Flesch"}
+
+
+def base_language(language: str) -> str:
+    """'es-AR' → 'es'"""
+    return (language or "").strip().lower().replace("_", "-").split("-")[0]
+
+
+@lru_cache(maxsize=65536)
+def _syllables_es(word: str) -> int:
+    count = 0
+    for group in _ES_VOWEL_GROUP_RE.findall(word):
+        count += 1
+        # Hiato: dos vocales fuertes o una débil acentuada
+        for a, b in zip(group, group[1:]):
+            if (a in _ES_STRONG and b in _ES_STRONG) or a in _ES_ACCENTED_WEAK \
+                    or b in _ES_ACCENTED_WEAK:
+                count += 1
+    return max(1, count)
+
+
+@lru_cache(maxsize=65536)
+def _syllables_en(word: str) -> int:
+    count = len(_EN_VOWEL_GROUP_RE.findall(word))
+    if count > 1 and word.endswith("e") and not word.endswith(("le", "ee")):
+        count -= 1  # e muda final
+    return max(1, count)
+
+
+def count_syllables(vocabulary: Counter, language: str) -> int:
+    """Sílabas totales (por forma distinta × frecuencia); 0 si el idioma no se soporta"""
+    counter = {"es": _syllables_es, "en": _syllables_en}.get(base_language(language))
+    if counter is None:
+        return 0
+    return sum(counter(word) * n for word, n in vocabulary.items())
+
+
+@dataclass
+class BlockAnalysis:
+    """Resultado de analyze_blocks() para un capítulo"""
+    sentences: int = 0
+    dialogue_words: int = 0
+    vocabulary: Counter = field(default_factory=Counter)
+
+    @property
+    def tokens(self) -> int:
+        return sum(self.vocabulary.values())
+
+
+def analyze_blocks(blocks: Iterable[str]) -> BlockAnalysis:
+    """Oraciones, palabras en diálogo y vocabulario de los bloques de texto visible"""
+    result = BlockAnalysis()
+    words_by_block: List[List[str]] = []
+    for block in blocks:
+        block = block.strip()
+        if not block:
+            continue
+        words = _WORD_RE.findall(block.lower())
+        words_by_block.append(words)
+        result.sentences += sum(1 for part in _SENTENCE_SPLIT_RE.split(block)
+                                if _HAS_LETTER_RE.search(part))
+        if block.startswith(_DIALOGUE_OPENERS):
+            result.dialogue_words += len(words)
+    result.vocabulary = Counter(word for words in words_by_block for word in words)
+    return result
+
+
+def readability(language: str, words: int, sentences: int,
+                syllables: int) -> Optional[Tuple[str, float]]:
+    """
+    (fórmula, puntaje) según el idioma del libro, o None si no hay fórmula
+    o no hay texto. Ambas escalas van de ~0 (muy difícil) a ~100 (muy fácil).
+    """
+    lang = base_language(language)
+    if lang not in READABILITY_FORMULAS or not words or not sentences or not syllables:
+        return None
+    if lang == "es":
+        # L = 206.84 − 0.60·P − 1.02·F (P: sílabas cada 100 palabras, F: palabras por oración)
+        score = 206.84 - 0.60 * (100 * syllables / words) - 1.02 * (words / sentences)
+    else:
+        score = 206.835 - 1.015 * (words / sentences) - 84.6 * (syllables / words)
+    return READABILITY_FORMULAS[lang], round(score, 1)
+
+
+def readability_label(score: float) -> str:
+    """Interpretación del puntaje (escala de Fernández-Huerta/Flesch)"""
+    for limit, label in ((90, "Muy fácil"), (80, "Fácil"), (70, "Bastante fácil"),
+                         (60, "Normal"), (50, "Bastante difícil"), (30, "Difícil")):
+        if score >= limit:
+            return label
+    return "Muy difícil"
+
+
+def top_words(vocabulary: Counter, language: str, n: int = 20) -> List[Tuple[str, int]]:
+    """Palabras más repetidas, sin palabras vacías ni palabras de menos de 3 letras"""
+    stopwords = STOPWORDS.get(base_language(language), frozenset())
+    candidates = Counter({word: c for word, c in vocabulary.items()
+                          if c > 1 and len(word) > 2 and word not in stopwords})
+    return candidates.most_common(n)
@@ -0,0 +1,401 @@
+"""
+core/preview_pipeline.py
+Procesamiento de texto para la previsualización en vivo (sin dependencias GTK)
+
+Arquitectura:
+- split_preview_document(): separa <head> y los bloques de primer nivel del <body>
+  con un tokenizador liviano (sin construir DOM)
+- diff_blocks(): rango mínimo de bloques que cambió entre dos versiones
+  (prefijo/sufijo común)
+- build_patch_script(): JS que reemplaza SOLO esos bloques en el DOM de WebKit
+- source_markers() / annotate_source_offsets(): marcan los elementos de bloque
+  de la copia de preview con data-gutenai-src="<offset fuente>"; la tabla de
+  offsets permite sincronizar editor ↔ preview con búsqueda binaria
+- build_preview_html(): arma la copia de preview en una sola pasada: con los
+  offsets de </head> y </body> ya conocidos empalma marcadores, el CSS de
+  anclajes y el JS de sincronización (bytes precalculados) y codifica una vez
+
+La UI (SidebarRight) decide: si cambió el <head> o no se puede parchear,
+recarga completa; si no, evaluate_javascript con el parche.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, field
+from bisect import bisect_right
+from typing import Iterator, List, Match, Optional, Tuple
+
+# Elementos HTML sin cierre (no abren nivel)
+VOID_ELEMENTS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+    "meta", "param", "source", "track", "wbr",
+})
+
+# Elementos de bloque que reciben marcador de posición fuente
+BLOCK_ELEMENTS = frozenset({
+    "address", "article", "aside", "blockquote", "dd", "details", "div", "dl",
+    "dt", "figcaption", "figure", "footer", "h1", "h2", "h3", "h4", "h5", "h6",
+    "header", "hr", "li", "nav", "ol", "p", "pre", "section", "table", "td",
+    "th", "tr", "ul",
+})
+
+SOURCE_ATTR = "data-gutenai-src"
+
+# Tokens de marcado: comentarios, CDATA, PIs/doctype y tags
+_TOKEN_RE = re.compile(
+    r"<!--.*?-->"
+    r"|<!\[CDATA\[.*?\]\]>"
+    r"|<[!?][^>]*>"
+    r"|<(/?)([A-Za-z][\w:.-]*)((?:\"[^\"]*\"|'[^']*'|[^'\">])*)>",
+    re.DOTALL,
+)
+_HEAD_RE = re.compile(r"<head\b[^>]*>(.*?)</head\s*>", re.IGNORECASE | re.DOTALL)
+_BODY_OPEN_RE = re.compile(r"<body\b[^>]*>", re.IGNORECASE)
+_BODY_CLOSE_RE = re.compile(r"</body\s*>", re.IGNORECASE)
+_RAW_TEXT_ELEMENTS = ("script", "style")
+_HEAD_CLOSE_RE = re.compile(r"</head\s*>", re.IGNORECASE)
+
+# Marcadores visuales (⚓) en elementos con id: ::before sutil, solo en hover,
+# sin afectar el layout ni la impresión
+HOOK_MARKER_CSS = """
+<style id="gutenai-hook-markers">
+/* GutenAI: Marcadores visuales de anclajes (hooks) */
+*[id]::before {
+    content: "⚓";
+    position: absolute;
+    left: -20px;
+    opacity: 0;
+    color: #999;
+    font-size: 0.8em;
+    transition: opacity 0.2s ease;
+    pointer-events: none;
+}
+
+*[id]:hover::before {
+    opacity: 0.6;
+}
+
+/* Asegurar que elementos con id tengan position relative */
+*[id] {
+    position: relative;
+}
+
+/* Ocultar en impresión */
+@media print {
+    *[id]::before {
+        display: none !important;
+    }
+}
+</style>
+"""
+
+# Clic en el preview → mensaje a Python (offset fuente del bloque e id).
+# CDATA para no romper el parseo XML con caracteres como '&' (&&)
+REVERSE_SYNC_JS = """
+<script type="text/javascript" id="gutenai-reverse-sync">
+//<![CDATA[
+(function() {
+    // Evitar múltiples inyecciones
+    if (window.gutenaiSyncInjected) return;
+    window.gutenaiSyncInjected = true;
+    console.log("[GutenAI] JS Injected and Ready");
+
+    document.addEventListener('click', function(e) {
+        // console.log("[GutenAI] Click detected on", e.target.tagName);
+        
+        let target = e.target;
+        
+        // Removed visual feedback
+        let foundId = null;
+        let foundText = target.innerText ? target.innerText.substring(0, 100) : "";
+
+        // Marcador de posición fuente del bloque clicado
+        let marked = target.closest ? target.closest('[data-gutenai-src]') : null;
+        let foundOffset = marked ? parseInt(marked.getAttribute('data-gutenai-src'), 10) : null;
+
+        // Buscar ID en el elemento o sus padres
+        while (target && target !== document.body) {
+            if (target.id && !target.id.startsWith('gutenai-')) {
+                foundId = target.id;
+                break;
+            }
+            target = target.parentElement;
+        }
+        
+        console.log("[GutenAI] Sending message. ID:", foundId, "Text:", foundText.substring(0, 20));
+        
+        // Enviar mensaje a Python
+        if (window.webkit && window.webkit.messageHandlers && window.webkit.messageHandlers.gutenai) {
+            try {
+                window.webkit.messageHandlers.gutenai.postMessage(JSON.stringify({
+                    type: 'click_sync',
+                    offset: foundOffset,
+                    id: foundId,
+                    tag: target ? target.tagName : null,
+                    text: foundText
+                }));
+            } catch(err) {
+                console.error("[GutenAI] Error sending message:", err);
+            }
+        } else {
+            console.error("[GutenAI] WebKit message handler not found!");
+            alert("Error: WebKit bridge broken");
+        }
+    });
+})();
+//]]>
+</script>
+"""
+
+_HOOK_MARKER_CSS_BYTES = HOOK_MARKER_CSS.encode('utf-8')
+_REVERSE_SYNC_JS_BYTES = REVERSE_SYNC_JS.encode('utf-8')
+
+
+@dataclass
+class PreviewDocument:
+    """Vista estructural mínima de un documento para diffs de preview."""
+    head: str                          # contenido del <head> (sin las etiquetas)
+    body_open: str                     # la etiqueta <body ...> completa
+    body_start: int                    # offset del contenido del body en la fuente
+    body_end: int                      # offset del </body> (o fin del texto)
+    blocks: List[str] = field(default_factory=list)
+    offsets: List[int] = field(default_factory=list)  # offset fuente de cada bloque
+    patchable: bool = True             # False si hay texto suelto o tags desbalanceados
+    head_end: int = -1                 # offset del </head> (-1: sin <head>)
+
+
+def _iter_tokens(html: str, pos: int, end: int) -> Iterator[Match[str]]:
+    """
+    Recorre los tokens de html[pos:end]. El contenido de <script>/<style> se
+    salta: tras la etiqueta de apertura se entrega directamente la de cierre.
+    Si falta un cierre, el recorrido termina ahí.
+    """
+    while True:
+        m = _TOKEN_RE.search(html, pos, end)
+        if m is None:
+            return
+        yield m
+        pos = m.end()
+        name = m.group(2)
+        if (name and not m.group(1) and name.lower() in _RAW_TEXT_ELEMENTS
+                and not m.group(3).rstrip().endswith("/")):
+            close = re.compile(rf"</{name}\s*>", re.IGNORECASE).search(html, pos, end)
+            if close is None:
+                return
+            m = _TOKEN_RE.match(html, close.start(), end)
+            yield m
+            pos = m.end()
+
+
+def _body_bounds(html: str):
+    head_m = _HEAD_RE.search(html)
+    body_m = _BODY_OPEN_RE.search(html, head_m.end() if head_m else 0)
+    if body_m is None:
+        return head_m, None, len(html)
+    close_m = None
+    for close_m in _BODY_CLOSE_RE.finditer(html, body_m.end()):
+        pass  # el último </body>
+    return head_m, body_m, close_m.start() if close_m else len(html)
+
+
+def split_preview_document(html: str) -> Optional[PreviewDocument]:
+    """
+    Divide el documento en head + bloques de primer nivel del body.
+    Retorna None si no hay <body> reconocible.
+    """
+    head_m, body_m, body_end = _body_bounds(html)
+    if body_m is None:
+        return None
+
+    doc = PreviewDocument(
+        head=head_m.group(1) if head_m else "",
+        body_open=body_m.group(0),
+        body_start=body_m.end(),
+        body_end=body_end,
+        head_end=head_m.end(1) if head_m else -1,
+    )
+    depth = 0
+    block_start = -1
+    pos = body_m.end()
+
+    for m in _iter_tokens(html, pos, body_end):
+        # texto suelto al nivel superior: no hay elemento que reemplazar
+        if depth == 0 and html[pos:m.start()].strip():
+            doc.patchable = False
+        pos = m.end()
+
+        name = m.group(2)
+        if name is None:
+            continue  # comentario / CDATA / PI: no son elementos
+
+        if m.group(1) == "/":
+            depth -= 1
+            if depth < 0:
+                doc.patchable = False
+                depth = 0
+            elif depth == 0 and block_start >= 0:
+                doc.blocks.append(html[block_start:m.end()])
+                doc.offsets.append(block_start)
+                block_start = -1
+        elif m.group(3).rstrip().endswith("/") or name.lower() in VOID_ELEMENTS:
+            if depth == 0:
+                doc.blocks.append(m.group(0))
+                doc.offsets.append(m.start())
+        else:
+            if depth == 0:
+                block_start = m.start()
+            depth += 1
+
+    if depth != 0 or html[pos:body_end].strip():
+        doc.patchable = False
+    return doc
+
+
+def diff_blocks(old: List[str], new: List[str]) -> Optional[Tuple[int, int, int]]:
+    """
+    Rango mínimo que cambió entre dos listas de bloques.
+    Retorna (inicio, fin_viejo, fin_nuevo) —slices old[inicio:fin_viejo] →
+    new[inicio:fin_nuevo]— o None si son iguales.
+    """
+    n_old, n_new = len(old), len(new)
+    start = 0
+    limit = min(n_old, n_new)
+    while start < limit and old[start] == new[start]:
+        start += 1
+    if start == n_old == n_new:
+        return None
+    end_old, end_new = n_old, n_new
+    while end_old > start and end_new > start and old[end_old - 1] == new[end_new - 1]:
+        end_old -= 1
+        end_new -= 1
+    return start, end_old, end_new
+
+
+def build_patch_script(start: int, old_end: int, expected_count: int,
+                       new_blocks: List[str], shift: int = 0) -> str:
+    """
+    JS que reemplaza los hijos [start, old_end) del <body> por new_blocks.
+
+    Los nodos inyectados por GutenAI (id="gutenai-...") no cuentan como
+    bloques. `shift` se suma a los marcadores data-gutenai-src de los bloques
+    posteriores (el texto fuente se corrió). El script devuelve "ok" o
+    "reload" (si el DOM no coincide con lo esperado o el fragmento no parsea)
+    para que la UI haga recarga completa.
+    """
+    payload = json.dumps("".join(new_blocks))
+    return f"""(function() {{
+    var body = document.body;
+    if (!body) return "reload";
+    var kids = Array.prototype.filter.call(body.children, function(e) {{
+        return !(e.id && e.id.indexOf("gutenai-") === 0);
+    }});
+    if (kids.length !== {expected_count}) return "reload";
+    var frag;
+    try {{
+        var range = document.createRange();
+        range.selectNodeContents(body);
+        frag = range.createContextualFragment({payload});
+    }} catch (err) {{
+        return "reload";
+    }}
+    var anchor = {old_end} < kids.length ? kids[{old_end}] : null;
+    if (!anchor) {{
+        anchor = document.getElementById("gutenai-reverse-sync");
+        if (anchor && anchor.parentNode !== body) anchor = null;
+    }}
+    for (var i = {start}; i < {old_end}; i++) body.removeChild(kids[i]);
+    body.insertBefore(frag, anchor);
+    var shift = {shift};
+    if (shift) {{
+        var attr = "{SOURCE_ATTR}";
+        var move = function(el) {{
+            el.setAttribute(attr, parseInt(el.getAttribute(attr), 10) + shift);
+        }};
+        for (var j = {old_end}; j < kids.length; j++) {{
+            if (kids[j].hasAttribute(attr)) move(kids[j]);
+            Array.prototype.forEach.call(kids[j].querySelectorAll("[" + attr + "]"), move);
+        }}
+    }}
+    return "ok";
+}})();"""
+
+
+def source_markers(html: str, start: int = 0, end: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Etiquetas de apertura de bloque en html[start:end].
+    Retorna pares (offset de la etiqueta, posición donde insertar el atributo).
+    """
+    markers = []
+    for m in _iter_tokens(html, start, len(html) if end is None else end):
+        name = m.group(2)
+        if name and not m.group(1) and name.lower() in BLOCK_ELEMENTS:
+            markers.append((m.start(), m.end(2)))
+    return markers
+
+
+def annotate_source_offsets(html: str, markers: List[Tuple[int, int]],
+                            start: int = 0, end: Optional[int] = None, base: int = 0) -> str:
+    """
+    Copia de html[start:end] con data-gutenai-src en cada marcador.
+    El valor es el offset fuente (offset en `html` + base).
+    """
+    return "".join(_annotated_pieces(html, markers, start, end, base))
+
+
+def _annotated_pieces(html: str, markers: List[Tuple[int, int]],
+                      start: int = 0, end: Optional[int] = None, base: int = 0) -> List[str]:
+    end = len(html) if end is None else end
+    pieces = []
+    pos = start
+    for tag_start, insert_at in markers:
+        if tag_start < start or insert_at > end:
+            continue
+        pieces.append(html[pos:insert_at])
+        pieces.append(f' {SOURCE_ATTR}="{tag_start + base}"')
+        pos = insert_at
+    pieces.append(html[pos:end])
+    return pieces
+
+
+def annotate_preview_html(html: str, doc: Optional[PreviewDocument]) -> Tuple[str, List[int]]:
+    """
+    Marca los bloques del <body> para la copia de preview.
+    Retorna (html marcado, tabla ordenada de offsets fuente).
+    """
+    if doc is None:
+        return html, []
+    markers = source_markers(html, doc.body_start, doc.body_end)
+    annotated = annotate_source_offsets(html, markers, doc.body_start, doc.body_end)
+    return html[:doc.body_start] + annotated + html[doc.body_end:], [m[0] for m in markers]
+
+
+def build_preview_html(html: str, doc: Optional[PreviewDocument]) -> Tuple[bytes, List[int]]:
+    """
+    Copia de preview lista para servir: marcadores de bloque, CSS de anclajes
+    antes de </head> (o de <body>) y JS de sincronización antes de </body>.
+    Retorna (UTF-8, tabla ordenada de offsets fuente).
+    """
+    if doc is None:
+        head_close = _HEAD_CLOSE_RE.search(html)
+        css_at = head_close.start() if head_close else 0
+        return b"".join((html[:css_at].encode('utf-8'), _HOOK_MARKER_CSS_BYTES,
+                         html[css_at:].encode('utf-8'), _REVERSE_SYNC_JS_BYTES)), []
+
+    css_at = doc.head_end if doc.head_end >= 0 else doc.body_start - len(doc.body_open)
+    markers = source_markers(html, doc.body_start, doc.body_end)
+    body = "".join(_annotated_pieces(html, markers, doc.body_start, doc.body_end))
+    return b"".join((
+        html[:css_at].encode('utf-8'), _HOOK_MARKER_CSS_BYTES,
+        (html[css_at:doc.body_start] + body).encode('utf-8'), _REVERSE_SYNC_JS_BYTES,
+        html[doc.body_end:].encode('utf-8'),
+    )), [m[0] for m in markers]
+
+
+def marker_at_or_before(offsets: List[int], offset: int) -> Optional[int]:
+    """Offset del último marcador que empieza en `offset` o antes (búsqueda binaria)"""
+    i = bisect_right(offsets, offset) - 1
+    if i < 0:
+        return offsets[0] if offsets else None
+    return offsets[i]
@@ -0,0 +1,133 @@
+"""
+core/preview_server.py
+Contenido del esquema gutenai:// para la previsualización (sin dependencias GTK)
+
+Arquitectura:
+- El documento en edición se publica en memoria (publish) con su href real:
+  gutenai://book/Text/cap1.xhtml. Así las rutas relativas del documento
+  (../Styles/a.css, ../Images/x.png) resuelven contra el mismo esquema y no
+  se escribe ningún archivo de preview
+- Los demás recursos se leen de GutenCore (opf_dir) con ETag derivado de
+  mtime y tamaño; con If-None-Match igual se responde 304 sin cuerpo. Los
+  bytes quedan en una caché acotada mientras el ETag no cambie
+- Documentos publicados: Cache-Control no-store (siempre frescos);
+  recursos: no-cache (se revalidan y, si no cambiaron, 304)
+
+La UI (SidebarRight) registra el esquema en el WebContext y traduce
+PreviewResponse a WebKit.URISchemeResponse.
+"""
+
+from __future__ import annotations
+
+import mimetypes
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import quote, unquote
+
+from .instrumentation import count
+
+SCHEME = "gutenai"
+HOST = "book"
+BASE_URI = f"{SCHEME}://{HOST}/"
+
+
+@dataclass
+class PreviewResponse:
+    data: bytes
+    content_type: str
+    etag: str
+    cache_control: str
+    status: int = 200
+
+
+class PreviewServer:
+    """Resuelve peticiones gutenai:// contra la memoria y el proyecto"""
+
+    RESOURCE_CACHE_BYTES = 32 * 1024 * 1024
+
+    def __init__(self, core=None):
+        self.core = core
+        self._documents: Dict[str, Tuple[bytes, str]] = {}   # href → (bytes, etag)
+        self._version = 0
+        self._resources: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()  # href → (etag, bytes)
+        self._resource_bytes = 0
+
+    def set_core(self, core):
+        """Proyecto nuevo: descarta documentos publicados y caché"""
+        self.core = core
+        self._documents.clear()
+        self._resources.clear()
+        self._resource_bytes = 0
+
+    @staticmethod
+    def uri_for(href: str) -> str:
+        return BASE_URI + quote(href.lstrip("/"))
+
+    def publish(self, href: str, html: Union[str, bytes]) -> str:
+        """Publica el contenido de preview de un documento (texto o UTF-8); retorna su URI"""
+        self._version += 1
+        data = html.encode('utf-8') if isinstance(html, str) else html
+        self._documents = {href: (data, f'"doc-{self._version}"')}
+        return self.uri_for(href)
+
+    def is_published(self, href: str) -> bool:
+        return href in self._documents
+
+    def resolve(self, path: str, if_none_match: Optional[str] = None) -> PreviewResponse:
+        """
+        Respuesta para la ruta de una petición (p. ej. '/Styles/a.css').
+        Lanza FileNotFoundError o PermissionError (ruta fuera del proyecto).
+        """
+        href = unquote(path).lstrip("/")
+        document = self._documents.get(href)
+        if document is not None:
+            data, etag = document
+            count("preview_server.document")
+            return PreviewResponse(data, self._content_type(href), etag, "no-store")
+        return self._resolve_resource(href, if_none_match)
+
+    def _resolve_resource(self, href: str, if_none_match: Optional[str]) -> PreviewResponse:
+        if self.core is None or self.core.opf_dir is None:
+            raise FileNotFoundError(href)
+        root = Path(self.core.opf_dir).resolve()
+        path = (root / href).resolve()
+        if root not in path.parents:
+            raise PermissionError(f"Fuera del proyecto: {href}")
+        st = path.stat()  # FileNotFoundError si no existe
+        etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+        content_type = self._content_type(href)
+        if if_none_match and if_none_match == etag:
+            count("preview_server.not_modified")
+            return PreviewResponse(b"", content_type, etag, "no-cache", status=304)
+
+        cached = self._resources.get(href)
+        if cached is not None and cached[0] == etag:
+            self._resources.move_to_end(href)
+            count("preview_server.cache_hits")
+            return PreviewResponse(cached[1], content_type, etag, "no-cache")
+
+        data = path.read_bytes()
+        count("preview_server.disk_reads")
+        self._remember(href, etag, data)
+        return PreviewResponse(data, content_type, etag, "no-cache")
+
+    def _remember(self, href: str, etag: str, data: bytes):
+        old = self._resources.pop(href, None)
+        if old is not None:
+            self._resource_bytes -= len(old[1])
+        if len(data) > self.RESOURCE_CACHE_BYTES // 4:
+            return  # recursos enormes no desplazan al resto
+        self._resources[href] = (etag, data)
+        self._resource_bytes += len(data)
+        while self._resource_bytes > self.RESOURCE_CACHE_BYTES:
+            _, (_, evicted) = self._resources.popitem(last=False)
+            self._resource_bytes -= len(evicted)
+
+    def _content_type(self, href: str) -> str:
+        item = getattr(self.core, "items_by_href", {}).get(href) if self.core else None
+        if item is not None and getattr(item, "media_type", None):
+            return item.media_type
+        guessed, _ = mimetypes.guess_type(href)
+        return guessed or "application/octet-stream"
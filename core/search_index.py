@@ -0,0 +1,548 @@
+"""
+core/search_index.py
+Índice invertido para la búsqueda en todo el libro (sin dependencias GTK)
+
+Arquitectura:
+- Tokens: secuencias \\w+ en minúsculas del código fuente de cada documento
+  HTML (texto visible y marcado: etiquetas, atributos, entidades)
+- Posting: token → {href → offsets en la fuente}; la línea se obtiene con
+  búsqueda binaria sobre los inicios de línea del documento
+- El texto de cada documento queda en memoria: las consultas no leen disco
+- Persistencia: un shard por documento en cache_dir, validado por hash del
+  contenido (sirve aunque el EPUB se descomprima en otra carpeta temporal)
+- Actualización incremental: GutenCore.write_text avisa con file_written();
+  el documento se re-tokeniza en apply_pending() (hilo de auto-guardado) o
+  antes de la siguiente consulta. Borrar, renombrar o importar avisan con
+  forget(). Además cada documento guarda (mtime_ns, tamaño) de su archivo y
+  se vuelve a leer si cambiaron: el texto en memoria nunca queda viejo
+
+Consultas (find):
+- Texto simple / palabra completa: el token más largo de la consulta se busca
+  en el vocabulario y cada aparición da una posición candidata que se
+  verifica con el patrón compilado en ese offset
+- Regex: los literales obligatorios del patrón eligen los documentos
+  candidatos; solo sobre ellos corre finditer
+- Alcances (core/text_map.py): código fuente, solo texto visible o solo
+  valores de atributo. El mapa de texto de cada documento se arma una vez
+  por versión y los resultados vuelven a offsets exactos de la fuente
+- ParallelSearch: reparte los candidatos en un pool de hilos y entrega los
+  resultados por lotes, cancelable por generación
+"""
+
+from __future__ import annotations
+
+import hashlib
+import pickle
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Pattern, Set, Tuple
+
+try:
+    from re import _parser as _sre_parse, _constants as _sre
+except ImportError:  # Python < 3.11
+    import sre_parse as _sre_parse
+    import sre_constants as _sre
+
+from .instrumentation import span, traced, count
+from .text_map import SCOPE_RAW, SCOPE_TEXT, TextMap, build_text_map, find_in_scope
+from .text_search import build_search_pattern
+
+_WORD_RE = re.compile(r"\w+")
+SHARD_VERSION = 1
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def tokenize(text: str) -> Dict[str, array]:
+    """Postings de un documento: token en minúsculas → offsets ordenados"""
+    postings: Dict[str, array] = {}
+    for m in _WORD_RE.finditer(text):
+        token = m.group().lower()
+        offsets = postings.get(token)
+        if offsets is None:
+            offsets = postings[token] = array('q')
+        offsets.append(m.start())
+    return postings
+
+
+def required_literals(pattern: str, flags: int = 0) -> List[str]:
+    """
+    Tramos literales que toda coincidencia del regex debe contener.
+    Conservador: alternativas, clases y repeticiones opcionales cortan el tramo.
+    """
+    try:
+        parsed = _sre_parse.parse(pattern, flags)
+    except Exception:
+        return []
+    runs: List[str] = []
+    _collect_literals(parsed, runs)
+    return [run for run in runs if run]
+
+
+def _collect_literals(items, runs: List[str]):
+    current: List[str] = []
+    for op, av in items:
+        if op is _sre.LITERAL:
+            current.append(chr(av))
+            continue
+        runs.append("".join(current))
+        current = []
+        if op is _sre.SUBPATTERN:
+            _collect_literals(av[-1], runs)
+        elif op in (_sre.MAX_REPEAT, _sre.MIN_REPEAT) and av[0] >= 1:
+            _collect_literals(av[2], runs)
+    runs.append("".join(current))
+
+
+def _anchor(literals: Iterable[str]) -> Tuple[str, int, int]:
+    """(token más largo en minúsculas, literal de origen, posición en el literal)"""
+    best = ("", -1, 0)
+    for i, literal in enumerate(literals):
+        for m in _WORD_RE.finditer(literal.lower()):
+            if len(m.group()) > len(best[0]):
+                best = (m.group(), i, m.start())
+    return best
+
+
+@dataclass
+class SearchHit:
+    """Coincidencia en un documento del libro"""
+    href: str
+    start: int              # offset en la fuente
+    end: int
+    line: int               # 1-based
+    column: int             # inicio dentro de la línea
+    line_end: int           # fin de la línea (offset en la fuente)
+    source: str = field(repr=False, compare=False)  # texto del documento, compartido (no se copia)
+
+    @property
+    def line_text(self) -> str:
+        return self.source[self.start - self.column:self.line_end]
+
+    def context(self, radius: int = 50) -> Tuple[str, str, str]:
+        """(antes, coincidencia, después) con hasta `radius` caracteres por lado dentro de la línea"""
+        line_start = self.start - self.column
+        match_end = min(self.end, self.line_end)
+        return (self.source[max(line_start, self.start - radius):self.start],
+                self.source[self.start:match_end],
+                self.source[match_end:min(self.line_end, match_end + radius)])
+
+
+@dataclass
+class SearchPlan:
+    """Consulta compilada + documentos candidatos (ver SearchIndex.plan)"""
+    pattern: Pattern[str]
+    documents: List[str]
+    regex: bool
+    scope: str = SCOPE_RAW
+    anchor: str = ""                # token más largo de la consulta (minúsculas)
+    anchor_pos: int = 0             # su posición dentro de la consulta
+    tokens: List[str] = field(default_factory=list)  # vocabulario que contiene el ancla
+
+
+@dataclass
+class _IndexedDoc:
+    text: str
+    digest: str
+    postings: Dict[str, array]
+    stat: Optional[Tuple[int, int]] = None      # (mtime_ns, tamaño) al indexar
+    line_starts: Optional[array] = None
+    text_map: Optional[TextMap] = None
+
+    def get_text_map(self) -> TextMap:
+        """Mapa texto visible ↔ fuente (se arma una vez por versión del documento)"""
+        if self.text_map is None:
+            with span("search_index.text_map", chars=len(self.text)):
+                self.text_map = build_text_map(self.text)
+        return self.text_map
+
+    def line_of(self, offset: int) -> Tuple[int, int, int]:
+        """(número de línea 1-based, inicio, fin) de la línea que contiene offset"""
+        if self.line_starts is None:
+            starts = array('q', [0])
+            starts.extend(m.end() for m in re.finditer("\n", self.text))
+            self.line_starts = starts
+        i = bisect_right(self.line_starts, offset) - 1
+        start = self.line_starts[i]
+        end = self.line_starts[i + 1] - 1 if i + 1 < len(self.line_starts) else len(self.text)
+        return i + 1, start, end
+
+
+class SearchIndex:
+    """Índice invertido incremental de los documentos HTML del proyecto"""
+
+    def __init__(self, core, cache_dir: Optional[Path] = None):
+        self.core = core
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._docs: Dict[str, _IndexedDoc] = {}
+        self._token_docs: Dict[str, Set[str]] = {}  # vocabulario global → documentos
+        self._pending: Dict[str, Optional[str]] = {}  # escritos desde la última indexación
+        self._built = False
+        self._lock = threading.RLock()
+
+    # =====================================================
+    # CONSTRUCCIÓN Y ACTUALIZACIÓN
+    # =====================================================
+
+    def _document_hrefs(self) -> List[str]:
+        hrefs = []
+        for item in getattr(self.core, "items_by_id", {}).values():
+            media_type = (item.media_type or "").lower()
+            if media_type in ("application/xhtml+xml", "text/html") or \
+                    item.href.endswith(('.html', '.xhtml', '.htm')):
+                hrefs.append(item.href)
+        return hrefs
+
+    @traced("search_index.ensure_built")
+    def ensure_built(self) -> int:
+        """
+        Sincroniza el índice con el manifest y aplica lo escrito desde la
+        última consulta. La primera vez usa los shards persistidos para los
+        documentos cuyo contenido no cambió. Retorna documentos re-tokenizados.
+        """
+        with self._lock:
+            hrefs = self._document_hrefs()
+            current = set(hrefs)
+            for href in [h for h in self._docs if h not in current]:
+                self._drop(href)
+            tokenized = 0
+            for href in hrefs:
+                stat = self._stat(href)
+                doc = self._docs.get(href)
+                if doc is not None and href not in self._pending:
+                    if doc.stat == stat:
+                        continue
+                    count("search_index.stale_documents")
+                text = self._pending.pop(href, None)
+                try:
+                    if text is None:
+                        text = self.core.read_text(href)
+                except (OSError, UnicodeDecodeError) as e:
+                    print(f"[SearchIndex] Error leyendo {href}: {e}")
+                    self._drop(href)
+                    continue
+                tokenized += self._index(href, text, use_cache=not self._built, stat=stat)
+            self._pending.clear()
+            self._built = True
+            return tokenized
+
+    def file_written(self, href: str, text: Optional[str] = None):
+        """Aviso de escritura (GutenCore.write_text); se indexa en diferido"""
+        with self._lock:
+            if self._built:
+                self._pending[href] = text
+
+    def forget(self, href: str):
+        """Aviso de borrado, renombre o importación: el documento se vuelve a leer"""
+        with self._lock:
+            self._pending.pop(href, None)
+            self._drop(href)
+
+    def apply_pending(self) -> int:
+        """Re-tokeniza lo escrito (p. ej. desde el hilo de auto-guardado)"""
+        with self._lock:
+            if not self._built or not self._pending:
+                return 0
+        return self.ensure_built()
+
+    def invalidate(self):
+        """Descarta el índice en memoria (los shards en disco siguen valiendo)"""
+        with self._lock:
+            self._docs.clear()
+            self._token_docs.clear()
+            self._pending.clear()
+            self._built = False
+
+    def _stat(self, href: str) -> Optional[Tuple[int, int]]:
+        opf_dir = getattr(self.core, "opf_dir", None)
+        if opf_dir is None:
+            return None
+        try:
+            st = (Path(opf_dir) / href).stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _index(self, href: str, text: str, use_cache: bool,
+               stat: Optional[Tuple[int, int]] = None) -> int:
+        digest = _digest(text)
+        old = self._docs.get(href)
+        if old is not None and old.digest == digest:
+            old.stat = stat
+            return 0
+        postings = self._load_shard(href, digest) if use_cache else None
+        tokenized = postings is None
+        if tokenized:
+            with span("search_index.tokenize", href=href, chars=len(text)):
+                postings = tokenize(text)
+            self._save_shard(href, digest, postings)
+            count("search_index.files_tokenized")
+        self._drop(href)
+        self._docs[href] = _IndexedDoc(text, digest, postings, stat)
+        for token in postings:
+            docs = self._token_docs.get(token)
+            if docs is None:
+                docs = self._token_docs[token] = set()
+            docs.add(href)
+        return int(tokenized)
+
+    def _drop(self, href: str):
+        doc = self._docs.pop(href, None)
+        if doc is None:
+            return
+        for token in doc.postings:
+            docs = self._token_docs.get(token)
+            if docs is not None:
+                docs.discard(href)
+                if not docs:
+                    del self._token_docs[token]
+
+    # === Persistencia ===
+
+    def _shard_path(self, href: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        name = hashlib.blake2b(href.encode('utf-8'), digest_size=8).hexdigest()
+        return self.cache_dir / f"{name}.idx"
+
+    def _load_shard(self, href: str, digest: str) -> Optional[Dict[str, array]]:
+        path = self._shard_path(href)
+        if path is None or not path.exists():
+            return None
+        try:
+            with open(path, "rb") as f:
+                data = pickle.load(f)
+            if (data.get("version") == SHARD_VERSION and data.get("href") == href
+                    and data.get("digest") == digest):
+                count("search_index.shards_loaded")
+                return data["postings"]
+        except Exception as e:
+            print(f"[SearchIndex] Shard ilegible para {href}: {e}")
+        return None
+
+    def _save_shard(self, href: str, digest: str, postings: Dict[str, array]):
+        path = self._shard_path(href)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump({"version": SHARD_VERSION, "href": href, "digest": digest,
+                             "postings": postings}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp.replace(path)
+        except OSError as e:
+            print(f"[SearchIndex] Error guardando shard de {href}: {e}")
+
+    # =====================================================
+    # CONSULTAS
+    # =====================================================
+
+    def text_of(self, href: str) -> Optional[str]:
+        """Contenido indexado de un documento (sin leer disco)"""
+        with self._lock:
+            doc = self._docs.get(href)
+            return doc.text if doc else None
+
+    def text_map_of(self, href: str) -> Optional[TextMap]:
+        """Mapa de texto visible cacheado de un documento"""
+        with self._lock:
+            doc = self._docs.get(href)
+        return doc.get_text_map() if doc else None
+
+    def documents_with_token(self, token: str) -> Set[str]:
+        """Documentos que contienen exactamente el token (minúsculas)"""
+        with self._lock:
+            return set(self._token_docs.get(token.lower(), ()))
+
+    def plan(self, query: str, *, regex: bool = False, case_sensitive: bool = False,
+             whole_words: bool = False, scope: str = SCOPE_RAW,
+             hrefs: Optional[Iterable[str]] = None) -> SearchPlan:
+        """
+        Compila la consulta y elige los documentos candidatos (en el orden de
+        hrefs). Lanza re.error si el regex es inválido.
+
+        En alcance de texto visible no hay prefiltro: una palabra cortada por
+        etiquetas (pala<em>bra</em>) no existe como token de la fuente.
+        """
+        pattern = build_search_pattern(query, regex=regex, case_sensitive=case_sensitive,
+                                       whole_words=whole_words)
+        literals = required_literals(pattern.pattern, pattern.flags) if regex else [query]
+        anchor, _, anchor_pos = _anchor(literals)
+        self.ensure_built()
+        with self._lock:
+            order = [h for h in (hrefs if hrefs is not None else self._docs) if h in self._docs]
+            plan = SearchPlan(pattern, order, regex, scope, anchor, anchor_pos)
+            if not anchor or scope == SCOPE_TEXT:
+                return plan
+            if whole_words and not regex and anchor == query.lower():
+                plan.tokens = [anchor] if anchor in self._token_docs else []
+            else:
+                plan.tokens = [t for t in self._token_docs if anchor in t]
+            docs: Set[str] = set()
+            for token in plan.tokens:
+                docs |= self._token_docs[token]
+            plan.documents = [h for h in order if h in docs]
+            return plan
+
+    @traced("search_index.find")
+    def find(self, query: str, *, regex: bool = False, case_sensitive: bool = False,
+             whole_words: bool = False, scope: str = SCOPE_RAW,
+             hrefs: Optional[Iterable[str]] = None) -> List[SearchHit]:
+        """
+        Busca en todos los documentos (o en `hrefs`, en ese orden).
+        Misma semántica que pattern.finditer sobre cada documento (o sobre
+        su texto visible / sus valores de atributo, según el alcance).
+        """
+        plan = self.plan(query, regex=regex, case_sensitive=case_sensitive,
+                         whole_words=whole_words, scope=scope, hrefs=hrefs)
+        hits: List[SearchHit] = []
+        for href in plan.documents:
+            hits.extend(self.search_document(href, plan))
+        count("search_index.hits", len(hits))
+        return hits
+
+    def search_document(self, href: str, plan: SearchPlan) -> List[SearchHit]:
+        """Coincidencias de un documento candidato, sobre su texto en memoria"""
+        with self._lock:
+            doc = self._docs.get(href)
+        if doc is None:
+            return []
+        pattern = plan.pattern
+        if plan.scope != SCOPE_RAW:
+            tmap = doc.get_text_map()
+            return [self._hit(href, doc, start, end)
+                    for start, end in find_in_scope(doc.text, pattern, plan.scope, tmap)]
+        if plan.regex or not plan.anchor:
+            return [self._hit(href, doc, m.start(), m.end()) for m in pattern.finditer(doc.text)]
+
+        # Posiciones candidatas: cada aparición del ancla dentro de un token
+        starts = set()
+        for token in plan.tokens:
+            offsets = doc.postings.get(token)
+            if not offsets:
+                continue
+            i = token.find(plan.anchor)
+            while i >= 0:
+                shift = i - plan.anchor_pos
+                starts.update(off + shift for off in offsets)
+                i = token.find(plan.anchor, i + 1)
+
+        hits = []
+        end = -1
+        for start in sorted(starts):
+            if start < end or start < 0:
+                continue  # igual que finditer: sin solapamientos
+            m = pattern.match(doc.text, start)
+            if m is not None:
+                end = max(m.end(), start + 1)
+                hits.append(self._hit(href, doc, start, m.end()))
+        return hits
+
+    @staticmethod
+    def _hit(href: str, doc: _IndexedDoc, start: int, end: int) -> SearchHit:
+        line, line_start, line_end = doc.line_of(start)
+        return SearchHit(href, start, end, line, start - line_start, line_end, doc.text)
+
+
+BatchCallback = Callable[[int, List[SearchHit]], None]
+DoneCallback = Callable[[int, str], None]
+
+
+class ParallelSearch:
+    """
+    Búsqueda global en un pool de hilos con entrega progresiva.
+
+    Un hilo coordinador arma el plan (construyendo el índice si hace falta,
+    fuera del hilo de la UI) y reparte los documentos candidatos en el pool.
+    Los resultados se entregan en orden de documento, por lotes, a través de
+    `dispatch` (en la UI, GLib.idle_add). Cada start() incrementa la
+    generación: la búsqueda anterior deja de entregar y los documentos que
+    aún no empezaron se saltan.
+
+    Estados finales para on_done: "done" o "error: <mensaje>".
+    """
+
+    BATCH_SIZE = 500
+    FLUSH_INTERVAL = 0.05  # segundos máximos que un lote espera antes de entregarse
+
+    def __init__(self, index: SearchIndex, dispatch: Callable = None, max_workers: int = 4):
+        self.index = index
+        self._dispatch = dispatch or (lambda fn, *args: fn(*args))
+        self.max_workers = max_workers
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def cancel(self) -> int:
+        """Invalida la búsqueda en curso; retorna la nueva generación"""
+        with self._lock:
+            self._generation += 1
+            return self._generation
+
+    def is_current(self, generation: int) -> bool:
+        return generation == self._generation
+
+    def start(self, query: str, options: dict, hrefs: Optional[List[str]],
+              on_batch: BatchCallback, on_done: DoneCallback) -> int:
+        """Lanza la búsqueda (options: regex, case_sensitive, whole_words, scope)"""
+        generation = self.cancel()
+        threading.Thread(
+            target=self._run, args=(generation, query, options, hrefs, on_batch, on_done),
+            name="global-search", daemon=True,
+        ).start()
+        return generation
+
+    def _search_document(self, generation: int, href: str, plan: SearchPlan) -> List[SearchHit]:
+        if generation != self._generation:
+            return []
+        return self.index.search_document(href, plan)
+
+    def _run(self, generation: int, query: str, options: dict, hrefs: Optional[List[str]],
+             on_batch: BatchCallback, on_done: DoneCallback):
+        try:
+            plan = self.index.plan(query, hrefs=hrefs, **options)
+        except Exception as e:
+            if generation == self._generation:
+                self._dispatch(on_done, generation, f"error: {e}")
+            return
+
+        batch: List[SearchHit] = []
+        last_flush = time.monotonic()
+        with span("search_index.parallel", documents=len(plan.documents)) as sp, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self._search_document, generation, href, plan)
+                       for href in plan.documents]
+            total = 0
+            for future in futures:
+                hits = future.result()
+                if generation != self._generation:
+                    for pending in futures:
+                        pending.cancel()
+                    return
+                batch.extend(hits)
+                now = time.monotonic()
+                if len(batch) >= self.BATCH_SIZE or (batch and now - last_flush >= self.FLUSH_INTERVAL):
+                    total += len(batch)
+                    self._dispatch(on_batch, generation, batch)
+                    batch = []
+                    last_flush = now
+            total += len(batch)
+            sp.set(hits=total)
+
+        if generation != self._generation:
+            return
+        if batch:
+            self._dispatch(on_batch, generation, batch)
+        self._dispatch(on_done, generation, "done")
@@ -0,0 +1,203 @@
+"""
+core/text_map.py
+Mapa texto visible ↔ código fuente de un documento HTML (sin dependencias GTK)
+
+Arquitectura:
+- build_text_map(): una pasada con el tokenizador de preview_pipeline arma
+  el texto visible del <body> (nodos de texto, entidades decodificadas, sin
+  <script>/<style> ni comentarios) como una lista de segmentos con su
+  offset en la fuente. Los elementos de bloque y <br> agregan un salto de
+  línea virtual, así una búsqueda no une el final de un párrafo con el
+  siguiente
+- TextMap.to_source(): convierte un rango del texto visible al rango exacto
+  de la fuente (búsqueda binaria sobre los segmentos)
+- TextMap.attribute_spans: rangos de los valores de atributo en la fuente
+- find_in_scope() / replace_in_scope(): búsqueda y reemplazo por alcance;
+  un reemplazo en texto visible que cruza etiquetas ("pala<em>bra</em>")
+  edita cada nodo de texto y conserva las etiquetas
+"""
+
+from __future__ import annotations
+
+import html as html_lib
+import re
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Callable, List, Match, Optional, Pattern, Tuple
+
+from .preview_pipeline import BLOCK_ELEMENTS, _RAW_TEXT_ELEMENTS, _body_bounds, _iter_tokens
+
+SCOPE_RAW = "raw"
+SCOPE_TEXT = "text"
+SCOPE_ATTRIBUTES = "attributes"
+SCOPES = (SCOPE_RAW, SCOPE_TEXT, SCOPE_ATTRIBUTES)
+
+_ENTITY_RE = re.compile(r"&(?:#\d+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);")
+_ATTR_VALUE_RE = re.compile(r"""[\w:.-]+\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'<>=`]+))""")
+
+Edit = Tuple[int, int, str]  # (inicio fuente, fin fuente, texto nuevo)
+
+
+@dataclass
+class TextMap:
+    """Texto visible de un documento y su correspondencia con la fuente"""
+    text: str = ""
+    text_starts: array = field(default_factory=lambda: array('q'))  # inicio de cada segmento en text
+    src_starts: array = field(default_factory=lambda: array('q'))   # inicio en la fuente
+    src_ends: array = field(default_factory=lambda: array('q'))     # fin en la fuente
+    exact: bytearray = field(default_factory=bytearray)  # 1: texto literal (1 a 1)
+    attribute_spans: List[Tuple[int, int]] = field(default_factory=list)
+
+    def _segment(self, offset: int) -> int:
+        return max(0, bisect_right(self.text_starts, offset) - 1)
+
+    def _segment_end(self, i: int) -> int:
+        return self.text_starts[i + 1] if i + 1 < len(self.text_starts) else len(self.text)
+
+    def to_source(self, start: int, end: int) -> Tuple[int, int]:
+        """Rango de la fuente que cubre text[start:end]"""
+        if not self.text_starts:
+            return 0, 0
+        i = self._segment(start)
+        src_start = (self.src_starts[i] + start - self.text_starts[i]) if self.exact[i] \
+            else self.src_starts[i]
+        if end <= start:
+            return src_start, src_start
+        j = self._segment(end - 1)
+        src_end = (self.src_starts[j] + end - self.text_starts[j]) if self.exact[j] \
+            else self.src_ends[j]
+        return src_start, src_end
+
+    def source_edits(self, start: int, end: int, replacement: str) -> List[Edit]:
+        """
+        Ediciones de la fuente que reemplazan text[start:end] sin tocar las
+        etiquetas intermedias: el primer nodo recibe el reemplazo (ya
+        escapado) y en los demás se borra la parte cubierta.
+        """
+        if end <= start or not self.text_starts:
+            src_start, _ = self.to_source(start, start)
+            return [(src_start, src_start, replacement)]
+        edits: List[Edit] = []
+        for i in range(self._segment(start), self._segment(end - 1) + 1):
+            if self.src_starts[i] == self.src_ends[i]:
+                continue  # salto de línea virtual: no existe en la fuente
+            seg_start, seg_end = self.text_starts[i], self._segment_end(i)
+            lo, hi = max(start, seg_start), min(end, seg_end)
+            if self.exact[i]:
+                src_lo = self.src_starts[i] + lo - seg_start
+                src_hi = self.src_starts[i] + hi - seg_start
+            else:
+                src_lo, src_hi = self.src_starts[i], self.src_ends[i]
+            edits.append((src_lo, src_hi, "" if edits else replacement))
+        if not edits:
+            src_start, _ = self.to_source(start, start)
+            edits.append((src_start, src_start, replacement))
+        return edits
+
+
+def build_text_map(source: str) -> TextMap:
+    """Texto visible del <body> (o del documento si no hay body) + valores de atributos"""
+    tmap = TextMap()
+    pieces: List[str] = []
+    length = 0
+
+    def add(text: str, src_start: int, src_end: int, exact: bool):
+        nonlocal length
+        tmap.text_starts.append(length)
+        tmap.src_starts.append(src_start)
+        tmap.src_ends.append(src_end)
+        tmap.exact.append(1 if exact else 0)
+        pieces.append(text)
+        length += len(text)
+
+    def add_text(a: int, b: int):
+        pos = a
+        for m in _ENTITY_RE.finditer(source, a, b):
+            if m.start() > pos:
+                add(source[pos:m.start()], pos, m.start(), True)
+            add(html_lib.unescape(m.group()), m.start(), m.end(), False)
+            pos = m.end()
+        if b > pos:
+            add(source[pos:b], pos, b, True)
+
+    _, body_m, body_end = _body_bounds(source)
+    start = body_m.end() if body_m else 0
+    pos = start
+    skip_raw = False
+    for m in _iter_tokens(source, start, body_end):
+        if not skip_raw and m.start() > pos:
+            add_text(pos, m.start())
+        pos = m.end()
+        name = m.group(2)
+        if not name:
+            continue
+        lowered = name.lower()
+        closing = m.group(1) == "/"
+        skip_raw = not closing and lowered in _RAW_TEXT_ELEMENTS and \
+            not m.group(3).rstrip().endswith("/")
+        if (lowered in BLOCK_ELEMENTS or lowered == "br") and pieces and not pieces[-1].endswith("\n"):
+            add("\n", m.start(), m.start(), False)
+    if body_end > pos and not skip_raw:
+        add_text(pos, body_end)
+    tmap.text = "".join(pieces)
+
+    for m in _iter_tokens(source, 0, len(source)):
+        if m.group(2) and not m.group(1) and m.group(3):
+            base = m.start(3)
+            for attr in _ATTR_VALUE_RE.finditer(m.group(3)):
+                group = next(g for g in (1, 2, 3) if attr.group(g) is not None)
+                tmap.attribute_spans.append((base + attr.start(group), base + attr.end(group)))
+    return tmap
+
+
+def find_in_scope(source: str, pattern: Pattern[str], scope: str,
+                  tmap: Optional[TextMap] = None) -> List[Tuple[int, int]]:
+    """Rangos de la fuente donde `pattern` coincide dentro del alcance"""
+    if scope == SCOPE_RAW:
+        return [m.span() for m in pattern.finditer(source)]
+    if tmap is None:
+        tmap = build_text_map(source)
+    if scope == SCOPE_TEXT:
+        return [tmap.to_source(*m.span()) for m in pattern.finditer(tmap.text)]
+    return [m.span() for start, end in tmap.attribute_spans
+            for m in pattern.finditer(source, start, end)]
+
+
+def replace_in_scope(source: str, pattern: Pattern[str], replace: Callable[[Match[str]], str],
+                     scope: str, tmap: Optional[TextMap] = None) -> Tuple[str, int]:
+    """
+    Como pattern.subn(replace, source) pero solo dentro del alcance.
+    El texto devuelto por `replace` se escapa como texto o como valor de
+    atributo según el alcance (en código fuente se inserta tal cual).
+    """
+    if scope == SCOPE_RAW:
+        return pattern.subn(replace, source)
+    if tmap is None:
+        tmap = build_text_map(source)
+    edits: List[Edit] = []
+    n = 0
+    if scope == SCOPE_TEXT:
+        for m in pattern.finditer(tmap.text):
+            edits.extend(tmap.source_edits(m.start(), m.end(),
+                                           html_lib.escape(replace(m), quote=False)))
+            n += 1
+    else:
+        for start, end in tmap.attribute_spans:
+            for m in pattern.finditer(source, start, end):
+                edits.append((m.start(), m.end(), html_lib.escape(replace(m), quote=True)))
+                n += 1
+    if not edits:
+        return source, 0
+
+    edits.sort(key=lambda e: e[0])
+    out: List[str] = []
+    pos = 0
+    for src_start, src_end, new in edits:
+        if src_start < pos:
+            continue  # solapado con la edición anterior (p. ej. dentro de una entidad)
+        out.append(source[pos:src_start])
+        out.append(new)
+        pos = src_end
+    out.append(source[pos:])
+    return "".join(out), n
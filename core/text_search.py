@@ -0,0 +1,311 @@
+"""
+core/text_search.py
+Búsqueda dentro de un documento (sin dependencias GTK)
+
+Arquitectura:
+- build_search_pattern(): compila la consulta según las opciones del panel
+- SearchMatches: coincidencias como arrays de offsets (no TextIter), con
+  búsqueda binaria para saber cuáles caen en un rango visible
+- replace_all_splice(): reemplazar-todo en una pasada sobre el texto completo,
+  devuelto como un único tramo a sustituir en el buffer
+- ElementIdIndex: mapa id de elemento → offset, actualizado por ediciones
+  (solo se re-escanean las líneas tocadas)
+- BackgroundSearch: ejecuta la búsqueda en un hilo sobre un snapshot del
+  texto, entrega resultados por lotes y se cancela por generación
+
+El editor solo convierte a TextIter las coincidencias que va a resaltar o
+seleccionar, así que el costo por navegación/scroll no depende del total.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Callable, Iterable, List, Match, Optional, Pattern, Tuple
+
+from .instrumentation import span
+
+# Módulo 'regex' (requirements.txt): libera el GIL durante el match
+# (concurrent=True) y acepta timeout, lo que corta el backtracking
+# catastrófico. Si falta en el entorno se usa 're' sin esa protección.
+try:
+    import regex as _regex
+except ImportError:
+    _regex = None
+
+
+def build_search_pattern(query: str, *, regex: bool = False, case_sensitive: bool = False,
+                         whole_words: bool = False, dotall: bool = False) -> Pattern[str]:
+    """
+    Compila la consulta del panel de búsqueda.
+
+    En modo regex la consulta se usa tal cual (re.error si es inválida);
+    si no, se escapa y opcionalmente se rodea de límites de palabra.
+    MULTILINE siempre activo para que ^ y $ funcionen por línea.
+    """
+    flags = re.MULTILINE
+    if not case_sensitive:
+        flags |= re.IGNORECASE
+    if regex:
+        if dotall:
+            flags |= re.DOTALL
+        return re.compile(query, flags)
+
+    escaped = re.escape(query)
+    if whole_words:
+        escaped = r'\b' + escaped + r'\b'
+    return re.compile(escaped, flags)
+
+
+class SearchMatches:
+    """Coincidencias ordenadas por posición, guardadas como offsets de caracteres"""
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, spans: Iterable[Tuple[int, int]] = ()):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.extend(spans)
+
+    def extend(self, spans: Iterable[Tuple[int, int]]):
+        """Agrega coincidencias (deben llegar en orden creciente)"""
+        for start, end in spans:
+            self.starts.append(start)
+            self.ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __bool__(self) -> bool:
+        return len(self.starts) > 0
+
+    def __getitem__(self, index: int) -> Tuple[int, int]:
+        return self.starts[index], self.ends[index]
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def index_in_range(self, lo: int, hi: int) -> Tuple[int, int]:
+        """
+        Índices [primero, último) de las coincidencias que empiezan dentro de
+        [lo, hi), incluida la que empieza antes de lo y lo atraviesa.
+        """
+        first = bisect_left(self.starts, lo)
+        if first > 0 and self.ends[first - 1] > lo:
+            first -= 1
+        last = bisect_left(self.starts, hi, first)
+        return first, last
+
+    def index_at_or_after(self, offset: int) -> int:
+        """Índice de la primera coincidencia que empieza en offset o después (-1 si no hay)"""
+        i = bisect_left(self.starts, offset)
+        return i if i < len(self.starts) else -1
+
+
+def replace_all_splice(text: str, pattern: Pattern[str],
+                       replace: Callable[[Match[str]], str]) -> Optional[Tuple[int, int, str, int]]:
+    """
+    Reemplaza todas las coincidencias en una sola pasada sobre `text`.
+
+    Los matches se evalúan sobre el texto completo (lookbehind y anclas ven
+    su contexto real). Retorna (inicio, fin, segmento_nuevo, cantidad): basta
+    sustituir text[inicio:fin] por segmento_nuevo para obtener el mismo
+    resultado que pattern.sub(replace, text). None si no hay coincidencias.
+    """
+    pieces: List[str] = []
+    start = pos = -1
+    count = 0
+    for match in pattern.finditer(text):
+        if count == 0:
+            start = match.start()
+        else:
+            pieces.append(text[pos:match.start()])
+        pieces.append(replace(match))
+        pos = match.end()
+        count += 1
+    if count == 0:
+        return None
+    return start, pos, "".join(pieces), count
+
+
+# Atributo id con cualquier estilo de comillas: id="x", id='x', id=x, ID = "x"
+_ID_ATTR_RE = re.compile(
+    r"""(?:(?<=\s)|^)id\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'<>=`]+))""",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+class ElementIdIndex:
+    """
+    Índice id → offset del atributo en el documento del editor.
+
+    Las posiciones se guardan ordenadas; cada edición descarta y re-escanea
+    solo el tramo de líneas afectado y desplaza las posiciones posteriores.
+    Con ids duplicados gana la primera aparición (como una búsqueda desde el
+    inicio).
+    """
+
+    def __init__(self):
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+        self._ids: List[str] = []
+        self._by_id: Optional[dict] = None
+        self.valid = False
+
+    def invalidate(self):
+        """Marca el índice para reconstrucción completa en la próxima consulta"""
+        self.valid = False
+
+    def rebuild(self, text: str):
+        self._starts, self._ends, self._ids = [], [], []
+        self._scan_into(text, 0, self._starts, self._ends, self._ids)
+        self._by_id = None
+        self.valid = True
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @staticmethod
+    def _scan_into(text: str, base: int, starts, ends, ids):
+        for match in _ID_ATTR_RE.finditer(text):
+            starts.append(base + match.start())
+            ends.append(base + match.end())
+            ids.append(next(g for g in match.groups() if g is not None))
+
+    def apply_edit(self, region_start: int, old_region_end: int, region_text: str):
+        """
+        Aplica una edición ya hecha en el buffer.
+
+        [region_start, old_region_end) es el tramo afectado en coordenadas
+        previas a la edición (líneas completas); `region_text` es su contenido
+        actual. Lo posterior al tramo se desplaza por la diferencia de largo.
+        """
+        if not self.valid:
+            return
+        delta = len(region_text) - (old_region_end - region_start)
+        lo = bisect_left(self._starts, region_start)
+        hi = bisect_left(self._starts, old_region_end, lo)
+
+        starts: List[int] = []
+        ends: List[int] = []
+        ids: List[str] = []
+        self._scan_into(region_text, region_start, starts, ends, ids)
+        if delta:
+            starts.extend(x + delta for x in self._starts[hi:])
+            ends.extend(x + delta for x in self._ends[hi:])
+        else:
+            starts.extend(self._starts[hi:])
+            ends.extend(self._ends[hi:])
+        ids.extend(self._ids[hi:])
+
+        del self._starts[lo:], self._ends[lo:], self._ids[lo:]
+        self._starts.extend(starts)
+        self._ends.extend(ends)
+        self._ids.extend(ids)
+        self._by_id = None
+
+    def lookup(self, element_id: str) -> Optional[Tuple[int, int]]:
+        """(inicio, fin) del atributo id="..." o None si no existe"""
+        if self._by_id is None:
+            self._by_id = {}
+            for i in range(len(self._ids) - 1, -1, -1):
+                self._by_id[self._ids[i]] = i
+        i = self._by_id.get(element_id)
+        if i is None:
+            return None
+        return self._starts[i], self._ends[i]
+
+
+BatchCallback = Callable[[int, List[Tuple[int, int]]], None]
+DoneCallback = Callable[[int, str], None]
+
+
+class BackgroundSearch:
+    """
+    Búsqueda en un hilo de trabajo con cancelación por generación.
+
+    Cada start() incrementa la generación; el hilo anterior lo nota en el
+    siguiente match y se detiene sin entregar nada más. Los callbacks se
+    invocan a través de `dispatch` (en la UI, GLib.idle_add) y reciben la
+    generación para descartar entregas que llegaron tarde.
+
+    Estados finales para on_done: "done", "timeout" o "error: <mensaje>".
+    Con 'regex' el timeout corta también un match con backtracking
+    catastrófico sin retener el GIL; con 're' (sin 'regex' instalado) el
+    presupuesto solo se revisa entre coincidencias.
+    """
+
+    BATCH_SIZE = 2000
+
+    def __init__(self, dispatch: Callable = None, time_budget: float = 3.0):
+        self._dispatch = dispatch or (lambda fn, *args: fn(*args))
+        self.time_budget = time_budget
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def cancel(self) -> int:
+        """Invalida la búsqueda en curso; retorna la nueva generación"""
+        with self._lock:
+            self._generation += 1
+            return self._generation
+
+    def is_current(self, generation: int) -> bool:
+        return generation == self._generation
+
+    def start(self, text: str, pattern: Pattern[str], on_batch: BatchCallback,
+              on_done: DoneCallback) -> int:
+        """Lanza la búsqueda sobre `text` (snapshot inmutable) y retorna su generación"""
+        generation = self.cancel()
+        worker = threading.Thread(
+            target=self._run, args=(generation, text, pattern, on_batch, on_done),
+            daemon=True,
+        )
+        worker.start()
+        return generation
+
+    def _finditer(self, pattern: Pattern[str], text: str):
+        if _regex is not None:
+            try:
+                compiled = _regex.compile(pattern.pattern, pattern.flags)
+                return compiled.finditer(text, concurrent=True, timeout=self.time_budget)
+            except _regex.error:
+                pass  # sintaxis que solo entiende 're'
+        return pattern.finditer(text)
+
+    def _run(self, generation: int, text: str, pattern: Pattern[str],
+             on_batch: BatchCallback, on_done: DoneCallback):
+        with span("editor.search", chars=len(text)) as sp:
+            deadline = time.monotonic() + self.time_budget
+            batch: List[Tuple[int, int]] = []
+            found = 0
+            status = "done"
+            try:
+                for match in self._finditer(pattern, text):
+                    if generation != self._generation:
+                        sp.set(status="cancelled", matches=found)
+                        return
+                    batch.append(match.span())
+                    found += 1
+                    if len(batch) >= self.BATCH_SIZE:
+                        self._dispatch(on_batch, generation, batch)
+                        batch = []
+                    if time.monotonic() > deadline:
+                        status = "timeout"
+                        break
+            except TimeoutError:
+                status = "timeout"
+            except Exception as e:
+                status = f"error: {e}"
+            sp.set(status=status, matches=found)
+            if generation != self._generation:
+                return
+            if batch:
+                self._dispatch(on_batch, generation, batch)
+            self._dispatch(on_done, generation, status)
@@ -0,0 +1,213 @@
+"""
+core/word_count.py
+Conteo en vivo de palabras y caracteres visibles del documento del editor (sin dependencias GTK)
+
+Arquitectura:
+- Conteo por línea de la fuente: cada línea guarda (palabras, letras) de su
+  texto visible (sin etiquetas, entidades decodificadas). Un salto de línea
+  es espacio en HTML, así que una palabra nunca cruza líneas
+- Cada línea guarda también el estado del escáner al terminarla (texto,
+  dentro de comentario, de etiqueta —con su comilla abierta— o del contenido
+  de <script>/<style>), y la siguiente empieza en ese estado: comentarios,
+  etiquetas y bloques raw de varias líneas no cuentan como texto
+- apply_edit(): tras una edición se recuentan solo las líneas tocadas y se
+  empalman en los arreglos; el total se ajusta por diferencia. Si el estado
+  al final de la región cambia (p. ej. se abrió un <!--), las líneas
+  siguientes ya no valen y se invalida el conteo
+- Solo cuenta el <body>: las líneas hasta la de <body ...> valen 0. Una
+  edición que toca esa zona invalida el conteo (reconstrucción a demanda)
+- Los números coinciden con core/book_stats.chapter_statistics para el
+  marcado habitual (etiquetas en línea no cortan palabras, las de bloque sí)
+"""
+
+from __future__ import annotations
+
+import html as html_lib
+import re
+from array import array
+from typing import Hashable, List, Tuple
+
+from .preview_pipeline import BLOCK_ELEMENTS, _RAW_TEXT_ELEMENTS
+
+_TAG_RE = re.compile(r"<(/?)([A-Za-z][\w:.-]*)?[^<>]*>|<!--.*?-->", re.DOTALL)
+_BODY_OPEN_RE = re.compile(r"<body\b", re.IGNORECASE)
+_TAG_NAME_RE = re.compile(r"(/?)([A-Za-z][\w:.-]*)")
+_TAG_STOP_RE = re.compile(r"[\"'>]")
+_RAW_CLOSE_RE = {name: re.compile(rf"</{name}\s*>", re.IGNORECASE) for name in _RAW_TEXT_ELEMENTS}
+
+# Estados del escáner entre líneas (mismos tokens que preview_pipeline._TOKEN_RE).
+# Las etiquetas abiertas son ("tag", comilla abierta o None, "script"/"style" o None)
+# y el contenido raw es ("raw", "script"/"style")
+TEXT = "text"
+COMMENT = "comment"
+CDATA = "cdata"
+DECL = "decl"                     # <!DOCTYPE ...>, <?xml ...?>
+_TERMINATORS = {COMMENT: "-->", CDATA: "]]>", DECL: ">"}
+
+
+def _tag_sub(m: re.Match) -> str:
+    name = m.group(2)
+    if name and (name.lower() in BLOCK_ELEMENTS or name.lower() == "br"):
+        return " "
+    return ""
+
+
+def visible_text(fragment: str) -> str:
+    """
+    Texto visible de un fragmento de fuente (una línea o una selección).
+    Los restos de etiquetas cortadas en los bordes se descartan.
+    """
+    close = fragment.find(">")
+    if close != -1 and fragment.find("<", 0, close) == -1:
+        fragment = fragment[close + 1:]   # continuación de una etiqueta de la línea anterior
+    text = _TAG_RE.sub(_tag_sub, fragment)
+    open_at = text.rfind("<")
+    if open_at != -1:
+        text = text[:open_at]             # etiqueta que sigue en la línea siguiente
+    if '&' in text:
+        text = html_lib.unescape(text)
+    return text
+
+
+def count_text(fragment: str) -> Tuple[int, int]:
+    """(palabras, letras) del texto visible de un fragmento"""
+    words = visible_text(fragment).split()
+    return len(words), sum(map(len, words))
+
+
+def _scan_line(line: str, state: Hashable) -> Tuple[int, int, Hashable]:
+    """(palabras, letras, estado final) de una línea que empieza en `state`"""
+    pieces: List[str] = []
+    pos, n = 0, len(line)
+    while pos < n:
+        if state == TEXT:
+            lt = line.find("<", pos)
+            if lt == -1:
+                pieces.append(line[pos:])
+                break
+            pieces.append(line[pos:lt])
+            if line.startswith("<!--", lt):
+                state, pos = COMMENT, lt + 4
+            elif line.startswith("<![CDATA[", lt):
+                state, pos = CDATA, lt + 9
+            elif line.startswith(("<!", "<?"), lt):
+                state, pos = DECL, lt + 2
+            else:
+                m = _TAG_NAME_RE.match(line, lt + 1)
+                if m is None:
+                    pieces.append("<")    # '<' suelto: es texto
+                    pos = lt + 1
+                    continue
+                name = m.group(2).lower()
+                if name in BLOCK_ELEMENTS or name == "br":
+                    pieces.append(" ")
+                raw = name if not m.group(1) and name in _RAW_TEXT_ELEMENTS else None
+                state, pos = ("tag", None, raw), m.end()
+        elif state in _TERMINATORS:
+            end = line.find(_TERMINATORS[state], pos)
+            if end == -1:
+                break
+            state, pos = TEXT, end + len(_TERMINATORS[state])
+        elif state[0] == "tag":
+            _, quote, raw = state
+            if quote:
+                end = line.find(quote, pos)
+                if end == -1:
+                    break
+                state, pos = ("tag", None, raw), end + 1
+                continue
+            m = _TAG_STOP_RE.search(line, pos)
+            if m is None:
+                break
+            if m.group() != ">":
+                state, pos = ("tag", m.group(), raw), m.end()
+                continue
+            self_closing = line[pos:m.start()].rstrip().endswith("/")
+            state = ("raw", raw) if raw and not self_closing else TEXT
+            pos = m.end()
+        else:                             # ("raw", nombre): hasta </script> o </style>
+            m = _RAW_CLOSE_RE[state[1]].search(line, pos)
+            if m is None:
+                break
+            state, pos = TEXT, m.start()
+    text = "".join(pieces)
+    if '&' in text:
+        text = html_lib.unescape(text)
+    words = text.split()
+    return len(words), sum(map(len, words)), state
+
+
+def characters(words: int, letters: int) -> int:
+    """Caracteres con espacios, con los espacios colapsados entre palabras"""
+    return letters + max(0, words - 1)
+
+
+class LiveWordCount:
+    """Palabras y letras visibles por línea, actualizadas por edición"""
+
+    def __init__(self):
+        self._words = array('q')
+        self._letters = array('q')
+        self._states: List[Hashable] = []   # estado del escáner al final de cada línea
+        self._body_line = -1          # línea de <body ...>; -1: documento sin body
+        self.words = 0
+        self.letters = 0
+        self.valid = False
+
+    @property
+    def characters(self) -> int:
+        return characters(self.words, self.letters)
+
+    def invalidate(self):
+        """Marca el conteo para reconstrucción completa en la próxima consulta"""
+        self.valid = False
+
+    def rebuild(self, text: str):
+        """Cuenta todo el documento"""
+        lines = text.split("\n")
+        body = _BODY_OPEN_RE.search(text)
+        self._body_line = text.count("\n", 0, body.start()) if body else -1
+        self._words = array('q', bytes(8 * len(lines)))
+        self._letters = array('q', bytes(8 * len(lines)))
+        self._states = [TEXT] * len(lines)
+        state = TEXT
+        for i in range(max(0, self._body_line), len(lines)):
+            line = lines[i]
+            if i == self._body_line:
+                line = line[body.start() - (text.rfind("\n", 0, body.start()) + 1):]
+            self._words[i], self._letters[i], state = _scan_line(line, state)
+            self._states[i] = state
+        self.words = sum(self._words)
+        self.letters = sum(self._letters)
+        self.valid = True
+
+    def apply_edit(self, first_line: int, old_line_count: int, region_text: str):
+        """
+        Aplica una edición ya hecha en el buffer.
+
+        Las líneas [first_line, first_line + old_line_count) previas a la
+        edición pasan a ser las líneas completas de `region_text`.
+        """
+        if not self.valid:
+            return
+        if first_line <= self._body_line or _BODY_OPEN_RE.search(region_text):
+            self.invalidate()             # zona del <head> o del <body ...>: recontar todo
+            return
+        old_end = first_line + old_line_count
+        state = self._states[first_line - 1]
+        words = array('q')
+        letters = array('q')
+        states: List[Hashable] = []
+        for line in region_text.split("\n"):
+            w, n, state = _scan_line(line, state)
+            words.append(w)
+            letters.append(n)
+            states.append(state)
+        if state != self._states[old_end - 1]:
+            self.invalidate()             # se abrió o cerró un comentario/etiqueta/raw: cambian las líneas siguientes
+            return
+        self.words += sum(words) - sum(self._words[first_line:old_end])
+        self.letters += sum(letters) - sum(self._letters[first_line:old_end])
+        self._words[first_line:old_end] = words
+        self._letters[first_line:old_end] = letters
+        self._states[first_line:old_end] = states
@@ -9,4 +9,5 @@ import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
 gi.require_version('GtkSource', '5')
-gi.require_version('WebKit', '6.0')
\ No newline at end of file
+gi.require_version('WebKit', '6.0')
+gi.require_version('Soup', '3.0')
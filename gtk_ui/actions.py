@@ -321,6 +321,11 @@ class ActionManager:
         """Limpia el proyecto anterior si existe"""
         import shutil
 
+        # Guardar lo pendiente (el auto-guardado puede estar esperando) y
+        # cerrar el diario del documento abierto: no sobrevive al proyecto
+        self.main_window.central_editor.force_save()
+        self.main_window.central_editor.close_journal()
+
         # Si hay una carpeta temporal, eliminarla
         if self.main_window.temp_workdir and self.main_window.temp_workdir.exists():
             try:
@@ -466,6 +471,15 @@ class ActionManager:
         project_path = str(self.main_window.core.workdir)
         settings.set_current_project(project_path)
 
+        # Ediciones que quedaron en el diario tras un cierre inesperado
+        self.main_window.central_editor.recover_unsaved_edits()
+
+        # Índice de búsqueda persistente (shards por documento)
+        self.main_window.core.search_index.cache_dir = \
+            self.main_window.get_project_cache_dir("search_index")
+        self.main_window.core.book_stats.cache_dir = \
+            self.main_window.get_project_cache_dir("statistics")
+
         # Actualizar título del libro
         metadata = self.main_window.core.get_metadata()
         book_title = metadata.get("title", "EPUB sin título")
@@ -418,6 +418,9 @@ class BatchRenameDialog(Adw.Window):
         try:
             print(f"\n[BatchRename] Iniciando renombrado de {len(rename_list)} archivos...")
 
+            # Escrituras del editor en cola: a disco antes de mover archivos
+            self.main_window.central_editor.force_save()
+
             # Renombrar cada archivo
             for old_href, new_href, idref in rename_list:
                 print(f"[BatchRename] Renombrando: {old_href} -> {new_href}")
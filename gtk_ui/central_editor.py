@@ -4,10 +4,21 @@ ui/central_editor.py - Auto-guardado corregido
 from . import *
 
 from gi.repository import Gtk, GtkSource, Gio, GLib, Gdk
+import threading
+import time
+from functools import partial
 from pathlib import Path
-from typing import Optional, TYPE_CHECKING
+from typing import Optional, Set, TYPE_CHECKING
 
+from core.autosave import AutosaveWorker
+from core.book_stats import spine_documents
+from core.edit_journal import EditJournal, content_hash, recover_journals
 from core.guten_core import KIND_DOCUMENT, KIND_STYLE
+from core.text_search import (
+    BackgroundSearch, ElementIdIndex, SearchMatches, build_search_pattern, replace_all_splice,
+)
+
+from core.word_count import LiveWordCount, characters, count_text
 
 from .css_style_context_menu import CSSStyleManager
 
@@ -25,13 +36,59 @@ class CentralEditor:
         
         # Estado del auto-guardado
         self._save_timeout = None
-        self._last_saved_content = ""
-        self._is_saving = False
         self._needs_save = False
+        self._autosave: Optional[AutosaveWorker] = None  # escritor en segundo plano (por core)
+        # Diario de ediciones entre guardados (recuperación tras cierre inesperado)
+        self._journal: Optional[EditJournal] = None
+        self._journal_core = None
         
         # Configuración del auto-guardado
         self.AUTOSAVE_DELAY = 1500  # 1.5 segundos (un poco más conservador)
         self.AUTOSAVE_INTERVAL = 5000  # Guardado forzado cada 5 segundos si hay cambios
+        # Con el diario activo las ediciones ya están a salvo: el archivo
+        # completo se reescribe con menos frecuencia (menos amplificación)
+        self.JOURNAL_AUTOSAVE_DELAY = 10000
+        self.JOURNAL_SAVE_INTERVAL = 60.0  # segundos máximos sin guardar el archivo
+        self._last_save_time = time.monotonic()
+
+        # Seguimiento de cambios: cada 'changed' del buffer incrementa la
+        # generación; el snapshot de texto se reutiliza mientras no cambie.
+        # "Sucio" = generación distinta a la guardada (O(1)); el hash del
+        # contenido guardado detecta ediciones que vuelven al original.
+        self._change_generation = 0
+        self._snapshot_text: Optional[str] = None
+        self._snapshot_generation = -1
+        self._saved_generation = 0
+        self._saved_hash: Optional[bytes] = None
+
+        # Índice id → offset del documento (navegación y sincronización inversa)
+        self._id_index = ElementIdIndex()
+        self._pending_delete_len = 0
+        self.ID_INDEX_RESCAN_LIMIT = 64 * 1024  # ediciones mayores: reconstrucción diferida
+
+        # Conteo de palabras en vivo: por línea, se recuenta solo lo editado.
+        # Total del libro = capítulo actual en vivo + caché de los demás
+        self._word_count = LiveWordCount()
+        self._pending_delete_lines = 0
+        self._word_count_timeout = None
+        self._other_chapters = None     # (palabras, caracteres) del resto del spine
+        self._current_in_spine = False
+        self._word_count_href = None    # documento del conteo en vivo
+        self._chapters_to_recount: Set[str] = set()  # documentos dejados (pudieron cambiar)
+        self._book_totals_lock = threading.Lock()    # un solo cálculo de totales a la vez
+        self._selection_counted = False
+        self.WORD_COUNT_DELAY = 150
+
+        # Modo archivo grande: sin preview en vivo ni sincronización de cursor,
+        # resaltado liviano y carga por bloques fuera del hilo principal
+        self.large_file_mode = False
+        self._large_load_active = False
+        self._large_load_token = 0
+        self.LARGE_FILE_CHUNK = 256 * 1024  # caracteres por inserción
+
+        # Preview en vivo con debounce: una ráfaga de teclas = una actualización
+        self._preview_timeout = None
+        self.PREVIEW_DELAY = 250
 
         self._setup_widget()
         self._setup_editor_actions()
@@ -40,8 +97,15 @@ class CentralEditor:
         # Estado de búsqueda
         self.search_visible = False
         self.current_search_text = ""
-        self.search_results = []
+        self.search_results = SearchMatches()
         self.current_result_index = -1
+        # Resaltado por viewport: solo se etiquetan coincidencias visibles
+        self._highlighted_span = None   # (offset_ini, offset_fin) etiquetado con search-highlight
+        self._current_tagged = -1       # índice que tiene el tag search-current
+        self._highlight_idle = None
+        # Búsqueda en hilo de trabajo; resultados por lotes vía idle_add
+        self._search_worker = BackgroundSearch(dispatch=GLib.idle_add)
+        self._search_on_complete = None
 
         # Estado de sincronización
         self._sync_timeout = None
@@ -70,6 +134,7 @@ class CentralEditor:
         self.editor_scroll.set_child(self.source_view)
         self.editor_scroll.set_vexpand(True)
         self.editor_scroll.set_hexpand(True)
+        self.editor_scroll.get_vadjustment().connect('value-changed', self._on_editor_scrolled)
 
         # Crear controladores de eventos antes del panel de búsqueda
         # IMPORTANTE: NO usar CAPTURE phase para no bloquear la escritura en el editor
@@ -94,12 +159,32 @@ class CentralEditor:
         self.main_container.append(self.editor_scroll)
         self.main_container.append(self.search_overlay)
 
+        # Área de estado: palabras/caracteres del capítulo, la selección y el libro
+        self.word_count_label = Gtk.Label()
+        self.word_count_label.set_halign(Gtk.Align.END)
+        self.word_count_label.set_margin_start(12)
+        self.word_count_label.set_margin_end(12)
+        self.word_count_label.set_margin_top(2)
+        self.word_count_label.set_margin_bottom(2)
+        self.word_count_label.add_css_class("dim-label")
+        self.word_count_label.add_css_class("caption")
+        self.word_count_label.set_visible(False)
+        self.main_container.append(self.word_count_label)
+
         # Conectar señales
-        self.source_buffer.connect('changed', self._on_text_changed)
+        self._text_changed_handler = self.source_buffer.connect('changed', self._on_text_changed)
+        self.source_buffer.connect_after('insert-text', self._on_buffer_text_inserted)
+        self.source_buffer.connect('delete-range', self._on_buffer_range_deleting)
+        self.source_buffer.connect_after('delete-range', self._on_buffer_range_deleted)
         self.source_buffer.connect('cursor-moved', self._on_cursor_moved)
+        self.source_buffer.connect('cursor-moved', self._on_selection_changed)
     
     def _on_text_changed(self, buffer):
         """Maneja cambios en el texto del editor con auto-guardado inteligente"""
+        # Invalida el snapshot cacheado (sin copiar el buffer)
+        self._change_generation += 1
+        self._snapshot_text = None
+
         if not self.main_window.core or not self.main_window.current_resource:
             return
         
@@ -112,100 +197,268 @@ class CentralEditor:
         
         # Programar guardado - IMPORTANTE: NO pasar el texto como parámetro
         # para evitar race conditions, lo obtenemos en el momento del guardado
-        if not self._is_saving:
-            self._save_timeout = GLib.timeout_add(self.AUTOSAVE_DELAY, self._do_auto_save)
+        self._save_timeout = GLib.timeout_add(self._autosave_delay(), self._do_auto_save)
         
-        # Actualizar preview inmediatamente (más responsive)
-        if (self.current_resource_type == KIND_DOCUMENT and 
+        # Actualizar preview con debounce (el texto se lee al disparar)
+        if (self.current_resource_type == KIND_DOCUMENT and not self.large_file_mode and
             self.main_window.current_resource.endswith(('.html', '.xhtml', '.htm'))):
-            # Obtener texto actual para preview
-            current_text = self.get_current_text()
+            self._schedule_preview_update()
+
+    def _schedule_preview_update(self):
+        """Reprograma la actualización del preview al final de la ráfaga de edición"""
+        if self.large_file_mode:
+            return
+        if self._preview_timeout:
+            GLib.source_remove(self._preview_timeout)
+        self._preview_timeout = GLib.timeout_add(self.PREVIEW_DELAY, self._do_preview_update)
+
+    def _do_preview_update(self) -> bool:
+        """Envía el texto actual al preview (que decide parche o recarga)"""
+        self._preview_timeout = None
+        if (self.main_window.core and self.main_window.current_resource and
+                self.current_resource_type == KIND_DOCUMENT):
             self.main_window.sidebar_right._update_preview_content(
-                current_text, 
+                self.get_current_text(),
                 self.main_window.current_resource
             )
+        return False
     
     def _do_auto_save(self) -> bool:
         """Ejecuta el auto-guardado obteniendo el texto más reciente"""
         if not self.main_window.core or not self.main_window.current_resource:
             return False
 
-        if self._is_saving:
+        # Nunca guardar un buffer a medio cargar
+        if self._large_load_active:
+            return False
+
+        # Sin cambios desde el último guardado: no tocar el buffer
+        if not self._is_dirty():
+            self._needs_save = False
+            self._save_timeout = None
             return False
 
         # Obtener el texto MÁS RECIENTE del buffer
+        generation = self._change_generation
         current_text = self.get_current_text()
+        content_hash = self._content_hash(current_text)
 
-        # Solo guardar si realmente cambió
-        if current_text == self._last_saved_content:
-            self._needs_save = False
+        # Ediciones que vuelven exactamente al contenido guardado (p. ej. deshacer)
+        if content_hash == self._saved_hash:
+            self._mark_saved(generation, content_hash)
             self._save_timeout = None
             return False
 
-        try:
-            self._is_saving = True
+        core = self.main_window.core
+        is_opf = self.current_resource_type == "opf" and core.opf_path
+        href = core.opf_path.name if is_opf else self.main_window.current_resource
 
-            # Caso especial: guardar archivo OPF
-            if self.current_resource_type == "opf" and self.main_window.core.opf_path:
-                self.main_window.core.opf_path.write_text(current_text, encoding='utf-8')
-                # Recargar el OPF en el core para actualizar metadatos
-                self.main_window.core._parse_opf()
-            else:
-                # Guardar recurso normal
-                self.main_window.core.write_text(self.main_window.current_resource, current_text)
+        # Estado optimista: se revierte en _on_autosave_done si la escritura falla
+        self._mark_saved(generation, content_hash)
+        self._save_timeout = None
+        self._last_save_time = time.monotonic()
+
+        # Registros del diario que este snapshot ya incluye (se compactan al escribir)
+        journal = self._journal
+        journal_mark = None
+        if journal is not None and journal.active and journal.href == href:
+            journal_mark = (journal.session, journal.seq, content_hash)
+
+        # Escritura atómica en el hilo escritor (hooks: en _on_autosave_done)
+        self._get_autosave_worker().submit(
+            href, current_text,
+            reindex=self.current_resource_type == KIND_DOCUMENT,
+            token=self.current_resource_type,
+            on_done=partial(self._on_autosave_done, journal_mark=journal_mark),
+        )
+        return False  # No repetir el timeout
 
-            # Actualizar estado
-            self._last_saved_content = current_text
-            self._needs_save = False
+    def _get_autosave_worker(self) -> AutosaveWorker:
+        """Escritor del proyecto actual (se recrea si cambió el core)"""
+        core = self.main_window.core
+        if self._autosave is None or self._autosave.core is not core:
+            if self._autosave is not None:
+                self._autosave.shutdown()
+            self._autosave = AutosaveWorker(core, dispatch=GLib.idle_add)
+        return self._autosave
+
+    def _on_autosave_done(self, job, error, journal_mark=None) -> bool:
+        """Resultado de un guardado en segundo plano (hilo de la UI)"""
+        core = self.main_window.core
+        is_current = job.href == self.main_window.current_resource or (
+            job.token == "opf" and self.current_resource_type == "opf")
+        if error is not None:
+            self.main_window.show_error(f"Error auto-guardando: {error}")
+            if is_current:
+                # Forzar un nuevo intento con el contenido actual
+                self._saved_generation = -1
+                self._saved_hash = None
+                self._needs_save = True
+            return False
 
+        if is_current:
             # Indicador visual sutil
             self._show_save_indicator()
 
-            # ACTUALIZACIÓN DEL ÍNDICE DE HOOKS (solo para archivos HTML)
-            if (self.current_resource_type == KIND_DOCUMENT and
-                self.main_window.core and
-                hasattr(self.main_window.core, 'hook_index')):
-                # Re-indexar archivo actual de forma reactiva
-                self.main_window.core.hook_index.update_file_index(
-                    self.main_window.current_resource
-                )
+        # Re-indexar hooks en el hilo de la UI (HookIndexManager no tiene lock).
+        # El href puede ya no existir si se renombró o eliminó tras el flush.
+        if (job.reindex and core and getattr(core, 'hook_index', None) is not None
+                and job.href in core.items_by_href):
+            core.hook_index.update_file_index(job.href)
 
-            # Si estamos editando CSS, actualizar preview del HTML actual
-            if self.current_resource_type == KIND_STYLE:
-                self._refresh_html_preview_after_css_change()
+        # Lo escrito ya no necesita el diario: compactar sobre la nueva base
+        if journal_mark is not None and self._journal is not None:
+            self._journal.checkpoint(*journal_mark)
 
-        except Exception as e:
-            self.main_window.show_error(f"Error auto-guardando: {e}")
-        finally:
-            self._is_saving = False
-            self._save_timeout = None
+        # Caso especial: recargar el OPF en el core para actualizar metadatos
+        if job.token == "opf" and core:
+            core._parse_opf()
+
+        # Si estamos editando CSS, actualizar preview del HTML actual
+        if job.token == KIND_STYLE:
+            self._refresh_html_preview_after_css_change()
+        return False
+
+    def flush_autosave(self):
+        """Espera a que el hilo escritor termine lo pendiente"""
+        if self._autosave is not None:
+            self._autosave.flush()
 
-        return False  # No repetir el timeout
-    
     def _periodic_save_check(self) -> bool:
         """Guardado forzado periódico si hay cambios pendientes"""
-        if self._needs_save and not self._is_saving:
-            current_text = self.get_current_text()
-            if current_text != self._last_saved_content:
-                self._do_auto_save()
+        # O(1) en reposo: solo compara contadores
+        if self._needs_save and self._is_dirty():
+            # Con diario, la ráfaga en curso ya está a salvo: solo forzar si pasó
+            # JOURNAL_SAVE_INTERVAL (el guardado normal llega al terminar la ráfaga)
+            if (self._journal_active() and
+                    time.monotonic() - self._last_save_time < self.JOURNAL_SAVE_INTERVAL):
+                return True
+            self._do_auto_save()
         
         return True  # Continuar el timer periódico
     
     def force_save(self):
-        """Fuerza el guardado inmediato"""
-        if self._needs_save or self.get_current_text() != self._last_saved_content:
+        """Fuerza el guardado inmediato (espera a que llegue a disco)"""
+        if self._needs_save or self._is_dirty():
             self._do_auto_save()
+        self.flush_autosave()
     
     def has_unsaved_changes(self) -> bool:
-        """Verifica si hay cambios sin guardar - CORREGIDO"""
-        current_text = self.get_current_text()
-        return current_text != self._last_saved_content
+        """Verifica si hay cambios sin guardar"""
+        if self._large_load_active or not self._is_dirty():
+            return False
+        # Hubo ediciones: confirmar por hash (pueden haber vuelto al original)
+        generation = self._change_generation
+        content_hash = self._content_hash(self.get_current_text())
+        if content_hash == self._saved_hash:
+            self._mark_saved(generation, content_hash)
+            return False
+        return True
+
+    def _is_dirty(self) -> bool:
+        """True si el buffer cambió desde el último guardado (O(1))"""
+        return self._change_generation != self._saved_generation
+
+    def _mark_saved(self, generation: int, content_hash: bytes):
+        """Registra que el contenido de la generación dada está en disco"""
+        self._saved_generation = generation
+        self._saved_hash = content_hash
+        self._needs_save = generation != self._change_generation
+
+    @staticmethod
+    def _content_hash(text: str) -> bytes:
+        """Huella del contenido para detectar ediciones que vuelven al original"""
+        return content_hash(text)
+
+    # === DIARIO DE EDICIONES ===
+
+    def _get_edit_journal(self) -> Optional[EditJournal]:
+        """Diario del proyecto actual (se recrea si cambió el core)"""
+        core = self.main_window.core
+        if core is None:
+            return None
+        if self._journal is None or self._journal_core is not core:
+            self.close_journal()
+            if self._journal is not None:
+                self._journal.shutdown()
+            self._journal = EditJournal(self.main_window.get_project_cache_dir("journal"))
+            self._journal_core = core
+        return self._journal
+
+    def _journal_active(self) -> bool:
+        journal = self._journal
+        return journal is not None and journal.active and journal.href == self._journal_href()
+
+    def _autosave_delay(self) -> int:
+        """Espera tras la última edición antes de reescribir el archivo (ms)"""
+        from .settings_manager import get_settings
+        if self._journal_active():
+            return get_settings().get("editor.journal_auto_save_delay", self.JOURNAL_AUTOSAVE_DELAY)
+        return self.AUTOSAVE_DELAY
+
+    def _journal_href(self) -> Optional[str]:
+        """href del recurso de texto abierto (el OPF por su nombre, como al guardar)"""
+        core = self.main_window.core
+        if self.current_resource_type == "opf" and core and core.opf_path:
+            return core.opf_path.name
+        if self.current_resource_type in (KIND_DOCUMENT, KIND_STYLE):
+            return self.main_window.current_resource
+        return None
+
+    def _begin_journal(self):
+        """Empieza a registrar ediciones sobre el contenido recién marcado como guardado"""
+        from .settings_manager import get_settings
+        href = self._journal_href()
+        if not href or self._saved_hash is None or not get_settings().get("editor.edit_journal", True):
+            return
+        journal = self._get_edit_journal()
+        if journal is not None:
+            journal.begin(href, self._saved_hash, str(self.main_window.core.opf_dir / href))
+
+    def _journal_record(self, offset: int, deleted: int, inserted: str):
+        journal = self._journal
+        if journal is not None and journal.active and not self._large_load_active:
+            journal.record(offset, deleted, inserted)
+
+    def close_journal(self):
+        """
+        Termina el diario del documento actual (llamar tras force_save). Si la
+        última escritura de ese documento falló, el diario se conserva para
+        recuperarlo al reabrir el proyecto.
+        """
+        journal = self._journal
+        if journal is None or journal.href is None:
+            return
+        error = self._autosave.error_for(journal.href) if self._autosave is not None else None
+        if error is not None:
+            print(f"[Journal] {journal.href} no llegó a disco ({error}): se conserva el diario")
+        journal.close(discard=error is None)
+
+    def recover_unsaved_edits(self):
+        """Re-aplica ediciones registradas antes de un cierre inesperado"""
+        journal = self._get_edit_journal()
+        if journal is None:
+            return
+        recovered, stale = recover_journals(self.main_window.core, journal)
+        if recovered:
+            self.main_window.show_info(
+                f"Recuperadas ediciones sin guardar en {len(recovered)} archivo(s): "
+                + ", ".join(Path(href).name for href in recovered)
+            )
+        if stale:
+            self.main_window.show_error(
+                "No se pudieron recuperar ediciones de: "
+                + ", ".join(Path(href).name for href in stale)
+            )
     
     def load_resource(self, href: str):
         """Carga un recurso en el editor"""
         if not self.main_window.core:
             return
 
+        # No leer de disco un archivo con escrituras en cola
+        self.flush_autosave()
+
         # EVENTO FOCUSOUT: Al cambiar de archivo, re-indexar el anterior si era HTML
         if (self.main_window.current_resource and
             self.main_window.current_resource != href and
@@ -218,6 +471,9 @@ class CentralEditor:
                 self.main_window.current_resource
             )
 
+        # El documento anterior ya está en disco; la carga no se registra
+        self.close_journal()
+
         try:
             # Caso especial: archivo OPF (content.opf, package.opf, etc.)
             if href.endswith('.opf') and self.main_window.core.opf_path:
@@ -238,6 +494,8 @@ class CentralEditor:
         except Exception as e:
             self.main_window.show_error(f"Error cargando recurso: {e}")
 
+        self._reset_word_count(href)
+
         # Reset del estado de auto-guardado DESPUÉS de cargar
         self._reset_autosave_state()
     
@@ -247,18 +505,26 @@ class CentralEditor:
         if self._save_timeout:
             GLib.source_remove(self._save_timeout)
             self._save_timeout = None
-        
+
+        # El recurso recién cargado ya se previsualizó completo
+        if self._preview_timeout:
+            GLib.source_remove(self._preview_timeout)
+            self._preview_timeout = None
+
         # Reset estado
         self._needs_save = False
-        self._is_saving = False
         
         # Actualizar contenido guardado al contenido actual
         # Lo hacemos con un pequeño delay para asegurar que el buffer esté listo
         GLib.timeout_add(100, self._update_last_saved_content)
     
     def _update_last_saved_content(self) -> bool:
-        """Actualiza el contenido 'guardado' al contenido actual del buffer"""
-        self._last_saved_content = self.get_current_text()
+        """Marca el contenido actual del buffer como 'guardado'"""
+        if self._large_load_active:
+            return False  # lo marca _finish_large_load con el hash del archivo
+        generation = self._change_generation
+        self._mark_saved(generation, self._content_hash(self.get_current_text()))
+        self._begin_journal()
         return False  # No repetir
     
     def _show_save_indicator(self):
@@ -1071,8 +1337,10 @@ class CentralEditor:
     
     def _load_text_resource(self, href: str):
         """Carga un recurso de texto editable"""
-        content = self.main_window.core.read_text(href)
-        
+        self._cancel_large_load()
+        size = (self.main_window.core.opf_dir / href).stat().st_size
+        self._set_large_file_mode(size >= self._large_file_threshold(), size)
+
         # Configurar resaltado de sintaxis
         lang_manager = GtkSource.LanguageManager.get_default()
         if self.current_resource_type == KIND_DOCUMENT:
@@ -1083,18 +1351,112 @@ class CentralEditor:
             language = lang_manager.get_language('xml')
         
         self.source_buffer.set_language(language)
+
+        if self.large_file_mode:
+            self._load_text_chunked(href)
+            return
+
+        content = self.main_window.core.read_text(href)
         self.source_buffer.set_text(content)
         
         # Actualizar preview si es documento HTML
         if self.current_resource_type == KIND_DOCUMENT:
             self.main_window.sidebar_right.update_preview()
-    
+
+    # === MODO ARCHIVO GRANDE ===
+
+    def _large_file_threshold(self) -> int:
+        """Umbral en bytes a partir del cual se activa el modo archivo grande"""
+        from .settings_manager import get_settings
+        return int(get_settings().get("editor.large_file_threshold_mb", 2) * 1024 * 1024)
+
+    def _set_large_file_mode(self, enabled: bool, size: int = 0):
+        """Activa/desactiva las funciones costosas según el tamaño del recurso"""
+        if not enabled and not self.large_file_mode:
+            return
+        self.large_file_mode = enabled
+        self.source_buffer.set_highlight_syntax(not enabled)
+        self.source_buffer.set_highlight_matching_brackets(not enabled)
+        self.source_view.set_highlight_current_line(not enabled)
+        self.source_view.set_wrap_mode(Gtk.WrapMode.NONE if enabled else Gtk.WrapMode.WORD_CHAR)
+        if enabled:
+            self.main_window.show_info(
+                f"Archivo grande ({size / (1024 * 1024):.1f} MB): sin previsualización en vivo, "
+                "sin sincronización de cursor, sin resaltado de sintaxis ni ajuste de línea"
+            )
+
+    def _load_text_chunked(self, href: str):
+        """
+        Lee el archivo en un hilo y lo inserta por bloques desde idle_add.
+
+        Durante la carga el editor es de solo lectura, sin deshacer y sin
+        procesar 'changed'; el hash del contenido se calcula en el hilo.
+        """
+        buffer = self.source_buffer
+        token = self._large_load_token
+        self._large_load_active = True
+        buffer.handler_block(self._text_changed_handler)
+        buffer.set_enable_undo(False)
+        self.source_view.set_editable(False)
+        buffer.set_text("")
+        core = self.main_window.core
+        chunk = self.LARGE_FILE_CHUNK
+
+        def worker():
+            try:
+                text = core.read_text(href)
+                content_hash = self._content_hash(text)
+                for i in range(0, len(text), chunk):
+                    GLib.idle_add(self._append_large_chunk, token, text[i:i + chunk])
+                GLib.idle_add(self._finish_large_load, token, content_hash, None)
+            except Exception as e:
+                GLib.idle_add(self._finish_large_load, token, None, e)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _append_large_chunk(self, token: int, chunk: str) -> bool:
+        if token != self._large_load_token:
+            return False  # carga cancelada
+        self.source_buffer.insert(self.source_buffer.get_end_iter(), chunk)
+        # 'changed' está bloqueado: invalidar el snapshot a mano, sin quedar "sucio"
+        self._change_generation += 1
+        self._snapshot_text = None
+        self._saved_generation = self._change_generation
+        return False
+
+    def _finish_large_load(self, token: int, content_hash: Optional[bytes], error) -> bool:
+        if token != self._large_load_token:
+            return False
+        self._end_large_load()
+        if error is not None:
+            self.main_window.show_error(f"Error cargando recurso: {error}")
+            return False
+        self._mark_saved(self._change_generation, content_hash)
+        self._begin_journal()
+        self.source_buffer.place_cursor(self.source_buffer.get_start_iter())
+        self._schedule_word_count_update()
+        return False
+
+    def _end_large_load(self):
+        self._large_load_active = False
+        self.source_buffer.handler_unblock(self._text_changed_handler)
+        self.source_buffer.set_enable_undo(True)
+        self.source_view.set_editable(True)
+
+    def _cancel_large_load(self):
+        """Descarta los bloques pendientes de una carga anterior"""
+        self._large_load_token += 1
+        if self._large_load_active:
+            self._end_large_load()
+
     def _load_non_text_resource(self, href: str):
         """Muestra información para recursos no editables"""
         info_text = f"Recurso: {href}\n"
         info_text += f"Tipo: {self.current_resource_type}\n\n"
         info_text += "Este tipo de recurso no es editable como texto."
 
+        self._cancel_large_load()
+        self._set_large_file_mode(False)
         self.source_buffer.set_language(None)
         self.source_buffer.set_text(info_text)
 
@@ -1107,6 +1469,8 @@ class CentralEditor:
             return
 
         # Leer contenido del OPF
+        self._cancel_large_load()
+        self._set_large_file_mode(False)
         content = self.main_window.core.opf_path.read_text(encoding='utf-8')
         
         # Cargar en el editor
@@ -1123,43 +1487,181 @@ class CentralEditor:
         """Desplaza el editor al elemento con el ID especificado"""
         if not element_id:
             return
-            
-        # Buscar patrón id="element_id"
+
         buffer = self.source_buffer
-        start_iter = buffer.get_start_iter()
-        
-        # Intentar varias variaciones de comillas
-        patterns = [
-            f'id="{element_id}"',
-            f"id='{element_id}'",
-            f'id={element_id}'
-        ]
-        
-        found = False
-        match_start = None
-        match_end = None
-        
-        for pattern in patterns:
-            found_tuple = start_iter.forward_search(
-                pattern,
-                GtkSource.SearchFlags.CASE_INSENSITIVE,
-                None
-            )
-            if found_tuple:
-                match_start, match_end = found_tuple
-                found = True
-                break
-        
-        if found and match_start:
+        if not self._id_index.valid:
+            self._id_index.rebuild(self.get_current_text())
+
+        found = self._id_index.lookup(element_id)
+        if found:
+            match_start = buffer.get_iter_at_offset(found[0])
+            match_end = buffer.get_iter_at_offset(found[1])
+
             # Scroll al lugar
             self.source_view.scroll_to_iter(match_start, 0.0, True, 0.0, 0.5)
-            
+
             # Resaltar o seleccionar
             buffer.select_range(match_start, match_end)
-            
+
             # Foco al editor
             self.source_view.grab_focus()
 
+    def _on_buffer_text_inserted(self, buffer, location, text, length):
+        """Mantiene el índice de ids tras una inserción (location queda al final)"""
+        end = location.get_offset()
+        self._journal_record(end - len(text), 0, text)
+        region = self._edited_region(end - len(text), end, len(text))
+        self._update_id_index(region, len(text))
+        self._update_word_count(region, 1, len(text))
+
+    def _on_buffer_range_deleting(self, buffer, start, end):
+        self._pending_delete_len = end.get_offset() - start.get_offset()
+        self._pending_delete_lines = end.get_line() - start.get_line()
+        self._journal_record(start.get_offset(), self._pending_delete_len, "")
+
+    def _on_buffer_range_deleted(self, buffer, start, end):
+        """Mantiene el índice de ids tras un borrado (start == end tras borrar)"""
+        offset = start.get_offset()
+        region = self._edited_region(offset, offset, -self._pending_delete_len)
+        self._update_id_index(region, -self._pending_delete_len)
+        self._update_word_count(region, 1 + self._pending_delete_lines, -self._pending_delete_len)
+
+    def _edited_region(self, start: int, end: int, delta: int):
+        """
+        Líneas completas tocadas por la edición [start, end): (iter de inicio,
+        texto). None si nadie la necesita o si es demasiado grande para
+        actualizar por partes.
+        """
+        if not self._id_index.valid and not self._word_count.valid:
+            return None
+        if abs(delta) > self.ID_INDEX_RESCAN_LIMIT:
+            # Carga de documento o pegado enorme: reconstruir al consultar
+            self._id_index.invalidate()
+            self._word_count.invalidate()
+            return None
+        region_start = self.source_buffer.get_iter_at_offset(start)
+        region_start.set_line_offset(0)
+        region_end = self.source_buffer.get_iter_at_offset(end)
+        if not region_end.ends_line():
+            region_end.forward_to_line_end()
+        return region_start, self.source_buffer.get_text(region_start, region_end, False)
+
+    def _update_id_index(self, region, delta: int):
+        """Re-escanea solo las líneas tocadas por la edición"""
+        if region is None or not self._id_index.valid:
+            return
+        region_start, region_text = region
+        first = region_start.get_offset()
+        self._id_index.apply_edit(first, first + len(region_text) - delta, region_text)
+
+    def _update_word_count(self, region, old_line_count: int, delta: int):
+        """Recuenta solo las líneas tocadas por la edición"""
+        if self.current_resource_type != KIND_DOCUMENT:
+            return
+        if region is not None and self._word_count.valid:
+            region_start, region_text = region
+            self._word_count.apply_edit(region_start.get_line(), old_line_count, region_text)
+        self._schedule_word_count_update()
+
+    # === CONTEO DE PALABRAS ===
+
+    def _reset_word_count(self, href: str):
+        """
+        Recurso nuevo: recuento completo y totales del resto del libro.
+        Los totales salen de la caché de estadísticas (sin validar); solo se
+        recalculan los documentos que se dejaron desde el último cálculo y,
+        con la caché fría, los que nunca se analizaron.
+        """
+        if self._word_count_href is not None and self._word_count_href != href:
+            self._chapters_to_recount.add(self._word_count_href)
+        self._word_count_href = None
+        self._word_count.invalidate()
+        self._other_chapters = None
+        if self.current_resource_type != KIND_DOCUMENT or not self.main_window.core:
+            self.word_count_label.set_visible(False)
+            return
+        self._word_count_href = href
+        self._schedule_word_count_update()
+
+        core = self.main_window.core
+
+        def worker():
+            with self._book_totals_lock:
+                if href != self.main_window.current_resource:
+                    return  # ya se cambió de documento: lo calcula el siguiente
+                try:
+                    hrefs = spine_documents(core)
+                    in_spine = set(hrefs)
+                    while self._chapters_to_recount:  # pop es atómico frente al hilo de la UI
+                        other = self._chapters_to_recount.pop()
+                        if other in in_spine:
+                            core.book_stats.chapter(other)
+                    others = [h for h in hrefs if h != href]
+                    missing = [h for h in others if core.book_stats.cached(h) is None]
+                    if missing:
+                        core.book_stats.compute(missing)
+                    words = chars = 0
+                    for other in others:
+                        stats = core.book_stats.cached(other)
+                        if stats is not None:
+                            words += stats.words
+                            chars += stats.characters
+                except Exception as e:
+                    print(f"[WordCount] Error calculando totales del libro: {e}")
+                    return
+            GLib.idle_add(self._on_other_chapters_counted, href, href in hrefs, (words, chars))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_other_chapters_counted(self, href: str, in_spine: bool, totals) -> bool:
+        if href == self.main_window.current_resource:
+            self._current_in_spine = in_spine
+            self._other_chapters = totals
+            self._refresh_word_count()
+        return False
+
+    def _on_selection_changed(self, buffer):
+        """El conteo de la selección se actualiza solo si hay (o había) selección"""
+        if self.current_resource_type == KIND_DOCUMENT and \
+                (buffer.get_has_selection() or self._selection_counted):
+            self._schedule_word_count_update()
+
+    def _schedule_word_count_update(self):
+        """Una ráfaga de ediciones = una actualización de la etiqueta"""
+        if self._word_count_timeout is None:
+            self._word_count_timeout = GLib.timeout_add(self.WORD_COUNT_DELAY,
+                                                        self._on_word_count_timeout)
+
+    def _on_word_count_timeout(self) -> bool:
+        self._word_count_timeout = None
+        self._refresh_word_count()
+        return False
+
+    def _refresh_word_count(self):
+        """Actualiza el área de estado (reconstruye el conteo solo si se invalidó)"""
+        if self.current_resource_type != KIND_DOCUMENT or self._large_load_active:
+            return
+        if not self._word_count.valid:
+            self._word_count.rebuild(self.get_current_text())
+        count = self._word_count
+        parts = [f"{count.words:,} palabras · {count.characters:,} caracteres"]
+
+        bounds = self.source_buffer.get_selection_bounds()
+        self._selection_counted = bool(bounds)
+        if bounds:
+            words, letters = count_text(self.source_buffer.get_text(bounds[0], bounds[1], False))
+            parts.append(f"Selección: {words:,} palabras · {characters(words, letters):,} caracteres")
+
+        if self._other_chapters is not None:
+            book_words, book_chars = self._other_chapters
+            if self._current_in_spine:
+                book_words += count.words
+                book_chars += count.characters
+            parts.append(f"Libro: {book_words:,} palabras · {book_chars:,} caracteres")
+
+        self.word_count_label.set_text("   │   ".join(parts))
+        self.word_count_label.set_visible(True)
+
     def scroll_to_text(self, text: str):
         """Desplaza el editor a la primera ocurrencia del texto usando búsqueda difusa"""
         if not text or len(text) < 5:
@@ -1178,11 +1680,9 @@ class CentralEditor:
         # Recuperar la flexibilidad de espacios: reemplazar los espacios escapados (\ ) por \s+
         search_pattern = escaped_text.replace(r'\ ', r'\s+')
         
-        # Obtener todo el texto del buffer para buscar con regex de Python
+        # Texto del buffer para buscar con regex de Python (copia cacheada)
         buffer = self.source_buffer
-        start_iter = buffer.get_start_iter()
-        end_iter = buffer.get_end_iter()
-        full_content = buffer.get_text(start_iter, end_iter, False)
+        full_content = self.get_current_text()
         
         # Buscar
         match = re.search(search_pattern, full_content, re.IGNORECASE | re.MULTILINE)
@@ -1216,12 +1716,24 @@ class CentralEditor:
 
     
     def get_current_text(self) -> str:
-        """Obtiene el texto actual del editor"""
-        return self.source_buffer.get_text(
-            self.source_buffer.get_start_iter(),
-            self.source_buffer.get_end_iter(),
-            False
-        )
+        """
+        Obtiene el texto actual del editor.
+
+        La copia del buffer se cachea hasta el próximo 'changed', así que
+        llamadas repetidas (preview, guardado, búsqueda) no vuelven a copiarlo.
+        """
+        if self._snapshot_text is None or self._snapshot_generation != self._change_generation:
+            self._snapshot_text = self.source_buffer.get_text(
+                self.source_buffer.get_start_iter(),
+                self.source_buffer.get_end_iter(),
+                False
+            )
+            self._snapshot_generation = self._change_generation
+        return self._snapshot_text
+
+    def get_change_generation(self) -> int:
+        """Contador de cambios del buffer (para cachés externos)"""
+        return self._change_generation
     
     def set_text(self, text: str):
         """Establece el texto del editor"""
@@ -1303,11 +1815,7 @@ class CentralEditor:
             hasattr(self, 'main_window') and
             self.main_window.current_resource):
 
-            full_text = self.get_current_text()
-            self.main_window.sidebar_right._update_preview_content(
-                full_text,
-                self.main_window.current_resource
-            )
+            self._schedule_preview_update()
 
     def _refresh_html_preview_after_css_change(self):
         """Refresca el preview HTML cuando se modifican archivos CSS"""
@@ -1367,6 +1875,7 @@ class CentralEditor:
 
     def hide_search_panel(self):
         """Oculta el panel de búsqueda y reemplazo"""
+        self._search_worker.cancel()
         self.search_visible = False
         self.search_revealer.set_reveal_child(False)
         self.replace_revealer.set_reveal_child(False)
@@ -1390,6 +1899,7 @@ class CentralEditor:
         if search_text:
             self._perform_search(search_text)
         else:
+            self._search_worker.cancel()
             self._clear_search_results()
 
     def _on_search_next(self, widget=None):
@@ -1535,13 +2045,12 @@ class CentralEditor:
         if self.current_result_index >= 0 and self.current_result_index < len(self.search_results):
             import re
 
-            start_iter, end_iter = self.search_results[self.current_result_index]
+            replace_offset, end_offset = self.search_results[self.current_result_index]
+            start_iter = self.source_buffer.get_iter_at_offset(replace_offset)
+            end_iter = self.source_buffer.get_iter_at_offset(end_offset)
             matched_text = self.source_buffer.get_text(start_iter, end_iter, False)
             replacement_template = self.replace_entry.get_text()
 
-            # Guardar offset donde ocurre el reemplazo
-            replace_offset = start_iter.get_offset()
-
             # Si regex está activo, procesar grupos de captura
             if self.regex_check.get_active():
                 try:
@@ -1567,18 +2076,10 @@ class CentralEditor:
             # Calcular nuevo offset después del reemplazo
             new_offset = replace_offset + len(replacement)
 
-            # Actualizar búsqueda
-            search_text = self.search_entry.get_text()
-            if search_text:
-                self._perform_search(search_text)
-
-                # Buscar el siguiente resultado después de la posición del reemplazo
+            # Buscar el siguiente resultado después de la posición del reemplazo
+            def jump_after_replace():
                 if self.search_results:
-                    next_index = -1
-                    for i, (s_iter, e_iter) in enumerate(self.search_results):
-                        if s_iter.get_offset() >= new_offset:
-                            next_index = i
-                            break
+                    next_index = self.search_results.index_at_or_after(new_offset)
 
                     # Si no hay siguiente, volver al primero
                     if next_index == -1:
@@ -1587,8 +2088,13 @@ class CentralEditor:
                     # Saltar al resultado encontrado
                     self._jump_to_result(next_index)
 
+            # Actualizar búsqueda
+            search_text = self.search_entry.get_text()
+            if search_text:
+                self._perform_search(search_text, on_complete=jump_after_replace)
+
     def _on_replace_all(self, widget):
-        """Reemplaza todas las coincidencias"""
+        """Reemplaza todas las coincidencias en una sola pasada y un solo paso de deshacer"""
         if not self.search_results:
             return
 
@@ -1596,48 +2102,42 @@ class CentralEditor:
 
         search_text = self.search_entry.get_text()
         replacement_template = self.replace_entry.get_text()
+        use_regex = self.regex_check.get_active()
 
-        # Preparar patrón si regex está activo
-        if self.regex_check.get_active():
-            try:
-                flags = self._get_regex_flags()
-                pattern = re.compile(search_text, flags)
-            except re.error as e:
-                self.main_window.show_error(f"Error en expresión de reemplazo: {e}")
-                return
+        try:
+            pattern = build_search_pattern(
+                search_text,
+                regex=use_regex,
+                case_sensitive=self.case_sensitive_check.get_active(),
+                whole_words=self.whole_words_check.get_active(),
+                dotall=self.dotall_check.get_active(),
+            )
+        except re.error as e:
+            self.main_window.show_error(f"Error en expresión de reemplazo: {e}")
+            return
 
-        # Convertir iteradores a offsets y guardar texto para evitar invalidación
-        replacements_data = []
-        for start_iter, end_iter in self.search_results:
-            start_offset = start_iter.get_offset()
-            end_offset = end_iter.get_offset()
-            matched_text = self.source_buffer.get_text(start_iter, end_iter, False)
+        if use_regex:
+            # Grupos de captura (\1, \g<nombre>) y luego secuencias de escape
+            def replace(match):
+                return self._process_escape_sequences(match.expand(replacement_template))
+        else:
+            literal = self._process_escape_sequences(replacement_template)
 
-            # Calcular reemplazo según modo
-            if self.regex_check.get_active():
-                try:
-                    # Usar re.sub para procesar grupos de captura (\1, \2, etc.)
-                    replacement = pattern.sub(replacement_template, matched_text)
-                    # Procesar secuencias de escape DESPUÉS de re.sub
-                    replacement = self._process_escape_sequences(replacement)
-                except Exception as e:
-                    self.main_window.show_error(f"Error procesando reemplazo: {e}")
-                    return
-            else:
-                # Procesar secuencias de escape en modo no-regex
-                replacement = self._process_escape_sequences(replacement_template)
+            def replace(match):
+                return literal
 
-            replacements_data.append((start_offset, end_offset, replacement))
+        try:
+            splice = replace_all_splice(self.get_current_text(), pattern, replace)
+        except Exception as e:
+            self.main_window.show_error(f"Error procesando reemplazo: {e}")
+            return
+        if splice is None:
+            return
 
-        # Comenzar desde el final para evitar invalidar posiciones
-        for start_offset, end_offset, replacement in reversed(replacements_data):
-            start_iter = self.source_buffer.get_iter_at_offset(start_offset)
-            end_iter = self.source_buffer.get_iter_at_offset(end_offset)
-            self.source_buffer.delete(start_iter, end_iter)
-            self.source_buffer.insert(start_iter, replacement)
+        start_offset, end_offset, new_segment, count = splice
+        self._apply_edits_as_one_action([(start_offset, end_offset, new_segment)])
 
         # Mostrar mensaje
-        count = len(self.search_results)
         self.main_window.show_info(f"Reemplazadas {count} coincidencias")
 
         # Limpiar resultados y actualizar interfaz
@@ -1647,6 +2147,28 @@ class CentralEditor:
         if search_text:
             self._perform_search(search_text)
 
+    def _apply_edits_as_one_action(self, edits):
+        """
+        Aplica ediciones (inicio, fin, texto) como una sola acción de usuario.
+
+        'changed' se bloquea durante las ediciones y se procesa una vez al final:
+        un paso de deshacer, un auto-guardado y una actualización del preview.
+        """
+        buffer = self.source_buffer
+        buffer.handler_block(self._text_changed_handler)
+        buffer.begin_user_action()
+        try:
+            # De atrás hacia adelante para no invalidar offsets
+            for start_offset, end_offset, text in sorted(edits, reverse=True):
+                start_iter = buffer.get_iter_at_offset(start_offset)
+                end_iter = buffer.get_iter_at_offset(end_offset)
+                buffer.delete(start_iter, end_iter)
+                buffer.insert(start_iter, text)
+        finally:
+            buffer.end_user_action()
+            buffer.handler_unblock(self._text_changed_handler)
+        self._on_text_changed(buffer)
+
     def _on_selective_replace(self, widget):
         """Abre el diálogo de reemplazo selectivo"""
         if not self.search_results:
@@ -1669,7 +2191,9 @@ class CentralEditor:
 
         # Recopilar todas las coincidencias con su reemplazo
         matches_data = []
-        for i, (start_iter, end_iter) in enumerate(self.search_results):
+        for i, (start_offset, end_offset) in enumerate(self.search_results):
+            start_iter = self.source_buffer.get_iter_at_offset(start_offset)
+            end_iter = self.source_buffer.get_iter_at_offset(end_offset)
             matched_text = self.source_buffer.get_text(start_iter, end_iter, False)
 
             # Calcular reemplazo
@@ -1692,8 +2216,8 @@ class CentralEditor:
                 'matched': matched_text,
                 'replacement': replacement,
                 'line': line_num,
-                'start_offset': start_iter.get_offset(),
-                'end_offset': end_iter.get_offset(),
+                'start_offset': start_offset,
+                'end_offset': end_offset,
                 'selected': True  # Por defecto todos seleccionados
             })
 
@@ -1862,15 +2386,10 @@ class CentralEditor:
                 self.main_window.show_info("No hay coincidencias seleccionadas")
                 return
 
-            # Ordenar por posición (de atrás hacia adelante para no invalidar offsets)
-            selected_matches.sort(key=lambda m: m['start_offset'], reverse=True)
-
-            # Aplicar reemplazos
-            for match_data in selected_matches:
-                start_iter = self.source_buffer.get_iter_at_offset(match_data['start_offset'])
-                end_iter = self.source_buffer.get_iter_at_offset(match_data['end_offset'])
-                self.source_buffer.delete(start_iter, end_iter)
-                self.source_buffer.insert(start_iter, match_data['replacement'])
+            # Aplicar reemplazos (una acción, un paso de deshacer)
+            self._apply_edits_as_one_action([
+                (m['start_offset'], m['end_offset'], m['replacement']) for m in selected_matches
+            ])
 
             # Mostrar mensaje
             count = len(selected_matches)
@@ -1890,72 +2409,81 @@ class CentralEditor:
         dialog.set_child(main_box)
         dialog.present(self.main_window)
 
-    def _perform_search(self, search_text):
-        """Ejecuta la búsqueda en el documento"""
+    def _perform_search(self, search_text, on_complete=None):
+        """
+        Lanza la búsqueda en el documento en un hilo de trabajo.
+
+        Los resultados llegan por lotes (_on_search_batch); una nueva búsqueda
+        cancela la anterior. `on_complete` se llama en el hilo de la UI cuando
+        la búsqueda termina.
+        """
         import re
+        from .settings_manager import get_settings
 
+        self._search_worker.cancel()
+        self._search_on_complete = None
         self.current_search_text = search_text
-        self.search_results = []
-
-        # Obtener texto completo del buffer
-        start_iter = self.source_buffer.get_start_iter()
-        end_iter = self.source_buffer.get_end_iter()
-        text = self.source_buffer.get_text(start_iter, end_iter, False)
+        self._clear_search_results()
 
         # Preparar patrón de búsqueda
-        if self.regex_check.get_active():
-            try:
-                # Obtener flags configuradas
-                flags = self._get_regex_flags()
-                pattern = re.compile(search_text, flags)
-            except re.error:
-                self._update_search_status("Regex inválido")
-                return
-        else:
-            # Escapar caracteres especiales de regex
-            escaped_text = re.escape(search_text)
-
-            # Añadir límites de palabra si está activado
-            if self.whole_words_check.get_active():
-                escaped_text = r'\b' + escaped_text + r'\b'
-
-            # Usar las mismas flags que regex (sin DOTALL)
-            flags = re.MULTILINE
-            if not self.case_sensitive_check.get_active():
-                flags |= re.IGNORECASE
-            pattern = re.compile(escaped_text, flags)
-
-        # Buscar todas las coincidencias
-        # NOTA: No usamos timeout con signal.SIGALRM porque puede interferir con GTK/WebKit
         try:
-            match_count = 0
-            for match in pattern.finditer(text):
-                start_pos = match.start()
-                end_pos = match.end()
-
-                # Convertir posiciones a iteradores de GTK
-                start_iter = self.source_buffer.get_iter_at_offset(start_pos)
-                end_iter = self.source_buffer.get_iter_at_offset(end_pos)
-
-                self.search_results.append((start_iter, end_iter))
-
-                # Límite de seguridad: máximo 10000 resultados
-                match_count += 1
-                if match_count >= 10000:
-                    self._update_search_status(f"Más de 10000 resultados (límite alcanzado)")
-                    self.main_window.show_error(
-                        "Se encontraron más de 10000 coincidencias.\n"
-                        "Usa un patrón más específico para evitar sobrecarga."
-                    )
-                    break
-
-        except Exception as e:
-            self._update_search_status(f"Error en búsqueda: {str(e)}")
-            self.main_window.show_error(f"Error en búsqueda de regex: {e}")
+            pattern = build_search_pattern(
+                search_text,
+                regex=self.regex_check.get_active(),
+                case_sensitive=self.case_sensitive_check.get_active(),
+                whole_words=self.whole_words_check.get_active(),
+                dotall=self.dotall_check.get_active(),
+            )
+        except re.error:
+            self._update_search_status("Regex inválido")
             return
 
-        # Actualizar interfaz
-        self._update_search_results()
+        # Snapshot inmutable del buffer: el hilo nunca toca GTK
+        text = self.get_current_text()
+        budget_ms = get_settings().get("editor.search_time_budget_ms", 3000)
+        self._search_worker.time_budget = budget_ms / 1000.0
+        self._search_on_complete = on_complete
+        self._update_search_status("Buscando…")
+        self._search_worker.start(text, pattern, self._on_search_batch, self._on_search_done)
+
+    def _on_search_batch(self, generation, spans):
+        """Agrega un lote de coincidencias (hilo de la UI)"""
+        if not self._search_worker.is_current(generation):
+            return False
+        first_batch = not self.search_results
+        self.search_results.extend(spans)
+        if first_batch:
+            self._update_search_results()
+        else:
+            self.results_label.set_text(
+                f"{self.current_result_index + 1} de {len(self.search_results)}…")
+            self._refresh_visible_highlights()
+        return False
+
+    def _on_search_done(self, generation, status):
+        """Cierra la búsqueda: contador final, avisos y callback pendiente"""
+        if not self._search_worker.is_current(generation):
+            return False
+        count = len(self.search_results)
+        if status == "done":
+            if count == 0:
+                self._update_search_results()
+            else:
+                self.results_label.set_text(f"{self.current_result_index + 1} de {count}")
+        elif status == "timeout":
+            self._update_search_status(f"{count}+ (tiempo agotado)")
+            self.main_window.show_error(
+                "La búsqueda superó el tiempo límite.\n"
+                "Los resultados pueden estar incompletos; usa un patrón más específico."
+            )
+        else:
+            self._update_search_status("Error en búsqueda")
+            self.main_window.show_error(f"Error en búsqueda de regex: {status[len('error: '):]}")
+
+        on_complete, self._search_on_complete = self._search_on_complete, None
+        if on_complete:
+            on_complete()
+        return False
 
     def _update_search_results(self):
         """Actualiza la interfaz con los resultados de búsqueda"""
@@ -1966,7 +2494,6 @@ class CentralEditor:
             self.current_result_index = 0
             self.results_label.set_text(f"1 de {count}")
             self._highlight_search_results()
-            self._jump_to_result(0)
         else:
             self.current_result_index = -1
             self.results_label.set_text("0 de 0")
@@ -1981,11 +2508,18 @@ class CentralEditor:
         self.selective_replace_button.set_sensitive(has_results)
 
     def _highlight_search_results(self):
-        """Resalta todos los resultados de búsqueda"""
-        # Limpiar resaltados anteriores
+        """
+        Resalta los resultados de búsqueda desde cero.
+
+        Solo se etiquetan las coincidencias visibles (más un margen); el resto
+        se etiqueta al hacer scroll, así que el costo no depende del total.
+        """
         self._clear_search_highlights()
+        self._refresh_visible_highlights()
+        self._jump_to_result(self.current_result_index)
 
-        # Crear tags para resaltado si no existen
+    def _get_search_tags(self):
+        """Retorna (tag de coincidencias, tag del resultado actual), creándolos si no existen"""
         tag_table = self.source_buffer.get_tag_table()
 
         # Tag para todas las coincidencias
@@ -2037,14 +2571,70 @@ class CentralEditor:
                     underline=3  # Subrayado
                 )
 
-        # Resaltar todas las coincidencias
-        for i, (start_iter, end_iter) in enumerate(self.search_results):
-            if i == self.current_result_index:
-                # Resultado actual con resaltado especial
-                self.source_buffer.apply_tag(current_tag, start_iter, end_iter)
-            else:
-                # Otras coincidencias con resaltado normal
-                self.source_buffer.apply_tag(search_tag, start_iter, end_iter)
+        return search_tag, current_tag
+
+    def _visible_offset_range(self):
+        """Rango de offsets visible en el editor, con una pantalla de margen arriba y abajo"""
+        rect = self.source_view.get_visible_rect()
+        margin = max(rect.height, 1)
+        _, top_iter = self.source_view.get_iter_at_location(0, max(0, rect.y - margin))
+        _, bottom_iter = self.source_view.get_iter_at_location(0, rect.y + rect.height + margin)
+        top_iter.set_line_offset(0)
+        if not bottom_iter.ends_line():
+            bottom_iter.forward_to_line_end()
+        return top_iter.get_offset(), bottom_iter.get_offset()
+
+    def _refresh_visible_highlights(self):
+        """Etiqueta solo las coincidencias cercanas al viewport"""
+        if not self.search_results:
+            return
+        search_tag, _ = self._get_search_tags()
+
+        # Quitar el resaltado de la ventana anterior
+        if self._highlighted_span:
+            old_lo, old_hi = self._highlighted_span
+            self.source_buffer.remove_tag(search_tag,
+                                          self.source_buffer.get_iter_at_offset(old_lo),
+                                          self.source_buffer.get_iter_at_offset(old_hi))
+            self._highlighted_span = None
+
+        lo, hi = self._visible_offset_range()
+        first, last = self.search_results.index_in_range(lo, hi)
+        for i in range(first, last):
+            start, end = self.search_results[i]
+            self.source_buffer.apply_tag(search_tag,
+                                         self.source_buffer.get_iter_at_offset(start),
+                                         self.source_buffer.get_iter_at_offset(end))
+        if first < last:
+            self._highlighted_span = (self.search_results.starts[first],
+                                      self.search_results.ends[last - 1])
+
+    def _tag_current_result(self):
+        """Mueve el tag search-current: solo se re-etiquetan la anterior y la nueva"""
+        _, current_tag = self._get_search_tags()
+        count = len(self.search_results)
+        if 0 <= self._current_tagged < count:
+            start, end = self.search_results[self._current_tagged]
+            self.source_buffer.remove_tag(current_tag,
+                                          self.source_buffer.get_iter_at_offset(start),
+                                          self.source_buffer.get_iter_at_offset(end))
+        self._current_tagged = -1
+        if 0 <= self.current_result_index < count:
+            start, end = self.search_results[self.current_result_index]
+            self.source_buffer.apply_tag(current_tag,
+                                         self.source_buffer.get_iter_at_offset(start),
+                                         self.source_buffer.get_iter_at_offset(end))
+            self._current_tagged = self.current_result_index
+
+    def _on_editor_scrolled(self, adjustment):
+        """Reprograma el resaltado del viewport (una vez por ciclo de idle)"""
+        if self.search_results and self.search_visible and self._highlight_idle is None:
+            self._highlight_idle = GLib.idle_add(self._on_highlight_idle)
+
+    def _on_highlight_idle(self) -> bool:
+        self._highlight_idle = None
+        self._refresh_visible_highlights()
+        return False
 
     def _clear_search_highlights(self):
         """Limpia todos los resaltados de búsqueda"""
@@ -2062,6 +2652,9 @@ class CentralEditor:
         if current_tag:
             self.source_buffer.remove_tag(current_tag, start_iter, end_iter)
 
+        self._highlighted_span = None
+        self._current_tagged = -1
+
     def _jump_to_result(self, index):
         """Salta al resultado especificado"""
         if index < 0 or index >= len(self.search_results):
@@ -2069,13 +2662,15 @@ class CentralEditor:
 
         # Actualizar el índice actual
         self.current_result_index = index
-        start_iter, end_iter = self.search_results[index]
+        start_offset, end_offset = self.search_results[index]
+        start_iter = self.source_buffer.get_iter_at_offset(start_offset)
+        end_iter = self.source_buffer.get_iter_at_offset(end_offset)
 
         # Actualizar contador
         self.results_label.set_text(f"{index + 1} de {len(self.search_results)}")
 
-        # Actualizar resaltado (esto cambiará el resultado actual)
-        self._highlight_search_results()
+        # Mover el resaltado del resultado actual (solo anterior y nuevo)
+        self._tag_current_result()
 
         # Seleccionar el texto encontrado
         self.source_buffer.select_range(start_iter, end_iter)
@@ -2088,7 +2683,7 @@ class CentralEditor:
 
     def _clear_search_results(self):
         """Limpia los resultados de búsqueda"""
-        self.search_results = []
+        self.search_results = SearchMatches()
         self.current_result_index = -1
         self.results_label.set_text("0 de 0")
         self.prev_button.set_sensitive(False)
@@ -2134,8 +2729,8 @@ class CentralEditor:
 
     def _on_cursor_moved(self, buffer):
         """Maneja movimiento del cursor para sincronizar con WebKit"""
-        # Solo sincronizar si es un documento HTML
-        if (self.current_resource_type == KIND_DOCUMENT and
+        # Solo sincronizar si es un documento HTML (y no en modo archivo grande)
+        if (self.current_resource_type == KIND_DOCUMENT and not self.large_file_mode and
             self.main_window.current_resource and
             self.main_window.current_resource.endswith(('.html', '.xhtml', '.htm'))):
 
@@ -2165,200 +2760,24 @@ class CentralEditor:
             # Solo sincronizar si es un documento HTML
             if not self.main_window.current_resource or not self.main_window.current_resource.endswith(('.html', '.xhtml', '.htm')):
                 return
+            if self.large_file_mode:
+                return
 
-            # Obtener contexto alrededor del cursor
-            start_iter = self.source_buffer.get_start_iter()
-            end_iter = self.source_buffer.get_end_iter()
-
-            # Obtener el texto antes y después del cursor para tener contexto
-            line_start = text_iter.copy()
-            line_start.set_line_offset(0)
-            line_end = text_iter.copy()
-            if not line_end.ends_line():
-                line_end.forward_to_line_end()
-
-            # Extraer texto de la línea actual
-            current_line_text = self.source_buffer.get_text(line_start, line_end, False)
-
-            # Extraer texto visible (sin tags HTML) cerca del cursor
-            context_text = self._extract_visible_text_context(text_iter)
-            line_number = text_iter.get_line() + 1
-
-            # JavaScript mejorado para buscar por contenido de texto
-            scroll_script = f"""
-                (function() {{
-                    try {{
-                        var contextText = {repr(context_text)};
-                        var lineNumber = {line_number};
-
-                        // Función para limpiar texto (remover espacios extra, normalizar)
-                        function cleanText(text) {{
-                            return text.replace(/\\s+/g, ' ').trim().toLowerCase();
-                        }}
-
-                        var foundElement = null;
-                        var foundPosition = null;
-
-                        // Si tenemos contexto de texto, buscar por contenido
-                        if (contextText && contextText.length > 3) {{
-                            var cleanContext = cleanText(contextText);
-
-                            // Buscar en todos los elementos de texto
-                            var walker = document.createTreeWalker(
-                                document.body,
-                                NodeFilter.SHOW_TEXT,
-                                {{
-                                    acceptNode: function(node) {{
-                                        var text = cleanText(node.textContent);
-                                        return text.length > 2 ? NodeFilter.FILTER_ACCEPT : NodeFilter.FILTER_SKIP;
-                                    }}
-                                }}
-                            );
-
-                            var node;
-                            while (node = walker.nextNode()) {{
-                                var nodeText = cleanText(node.textContent);
-                                if (nodeText.includes(cleanContext) || cleanContext.includes(nodeText)) {{
-                                    foundElement = node.parentElement;
-                                    break;
-                                }}
-                            }}
-                        }}
-
-                        // Si no encontramos por contexto, usar scroll proporcional
-                        if (foundElement) {{
-                            // Scroll al elemento encontrado
-                            foundElement.scrollIntoView({{
-                                behavior: 'smooth',
-                                block: 'center',
-                                inline: 'nearest'
-                            }});
-
-                            // Resaltar temporalmente el elemento
-                            var originalStyle = foundElement.style.cssText;
-                            foundElement.style.backgroundColor = 'rgba(255, 165, 0, 0.3)';
-                            foundElement.style.transition = 'background-color 0.5s';
-
-                            setTimeout(function() {{
-                                foundElement.style.backgroundColor = '';
-                                setTimeout(function() {{
-                                    foundElement.style.cssText = originalStyle;
-                                }}, 500);
-                            }}, 1000);
-
-                        }} else {{
-                            // Fallback: scroll proporcional por línea
-                            var totalHeight = document.documentElement.scrollHeight;
-                            var viewportHeight = window.innerHeight;
-                            var maxScroll = totalHeight - viewportHeight;
-
-                            // Estimar posición basada en contenido HTML vs líneas totales
-                            var htmlLines = document.body.innerHTML.split('\\n').length;
-                            var percentage = Math.min(lineNumber / Math.max(htmlLines * 0.7, 1), 1.0);
-                            var targetScroll = Math.max(0, maxScroll * percentage);
-
-                            window.scrollTo({{
-                                top: targetScroll,
-                                behavior: 'smooth'
-                            }});
-                        }}
-
-                        // Indicador visual mejorado
-                        var indicator = document.getElementById('cursor-indicator');
-                        if (!indicator) {{
-                            indicator = document.createElement('div');
-                            indicator.id = 'cursor-indicator';
-                            indicator.style.cssText = `
-                                position: fixed;
-                                right: 20px;
-                                top: 50%;
-                                transform: translateY(-50%);
-                                background: rgba(255, 165, 0, 0.9);
-                                color: white;
-                                padding: 8px 12px;
-                                border-radius: 6px;
-                                font-size: 11px;
-                                font-family: monospace;
-                                z-index: 9999;
-                                pointer-events: none;
-                                transition: opacity 0.3s ease;
-                                box-shadow: 0 2px 8px rgba(0,0,0,0.3);
-                            `;
-                            document.body.appendChild(indicator);
-                        }}
-
-                        var statusText = foundElement ?
-                            'Línea {line_number} ✓' :
-                            'Línea {line_number} (~)';
-                        indicator.textContent = statusText;
-                        indicator.style.opacity = '1';
-
-                        // Ocultar el indicador después de 1.5 segundos
-                        setTimeout(function() {{
-                            if (indicator) {{
-                                indicator.style.opacity = '0';
-                                setTimeout(function() {{
-                                    if (indicator && indicator.parentNode) {{
-                                        indicator.parentNode.removeChild(indicator);
-                                    }}
-                                }}, 300);
-                            }}
-                        }}, 1500);
-
-                    }} catch (e) {{
-                        console.log('Error en sincronización de scroll:', e);
-                    }}
-                }})();
-            """
-
-            # Ejecutar en WebKit principal
+            # El preview resuelve el offset con su tabla de marcadores fuente
             sidebar_right = self.main_window.sidebar_right
-            if sidebar_right and hasattr(sidebar_right, 'web_view'):
-                sidebar_right.web_view.evaluate_javascript(scroll_script, -1, None, None, None, None, None)
-
-            # Ejecutar en WebKit fullscreen si está activo
-            if sidebar_right and sidebar_right._is_fullscreen_active():
-                sidebar_right.fullscreen_web_view.evaluate_javascript(scroll_script, -1, None, None, None, None, None)
+            if sidebar_right:
+                sidebar_right.scroll_to_source_offset(text_iter.get_offset(), text_iter.get_line() + 1)
 
         except Exception as e:
             print(f"[DEBUG] Error sincronizando WebKit: {e}")
 
-    def _extract_visible_text_context(self, text_iter):
-        """Extrae el texto visible (sin tags HTML) alrededor del cursor"""
-        try:
-            import re
-
-            # Obtener contexto de ~100 caracteres alrededor del cursor
-            start_context = text_iter.copy()
-            start_context.backward_chars(50)
-            end_context = text_iter.copy()
-            end_context.forward_chars(50)
-
-            context_html = self.source_buffer.get_text(start_context, end_context, False)
-
-            # Remover tags HTML y extraer solo texto visible
-            # Primero, remover comentarios HTML
-            context_html = re.sub(r'<!--.*?-->', '', context_html, flags=re.DOTALL)
-
-            # Remover tags pero mantener el contenido
-            visible_text = re.sub(r'<[^>]+>', '', context_html)
-
-            # Limpiar espacios en blanco excesivos
-            visible_text = re.sub(r'\s+', ' ', visible_text).strip()
-
-            # Tomar una porción razonable (palabras completas)
-            words = visible_text.split()
-            if len(words) > 5:
-                # Tomar 3-5 palabras del medio para tener un buen contexto
-                start_idx = max(0, len(words)//2 - 2)
-                end_idx = min(len(words), start_idx + 5)
-                visible_text = ' '.join(words[start_idx:end_idx])
-
-            return visible_text[:50]  # Limitar a 50 caracteres
-
-        except Exception as e:
-            print(f"[DEBUG] Error extrayendo contexto: {e}")
-            return ""
+    def scroll_to_source_offset(self, offset: int):
+        """Desplaza el editor a un offset fuente (sincronización inversa por marcador)"""
+        buffer = self.source_buffer
+        target = buffer.get_iter_at_offset(max(0, offset))
+        self.source_view.scroll_to_iter(target, 0.0, True, 0.0, 0.3)
+        buffer.place_cursor(target)
+        self.source_view.grab_focus()
 
     def scroll_to_line(self, line_number: int):
         """Hace scroll a una línea específica en el editor y sincroniza con WebKit"""
@@ -159,7 +159,8 @@ p {
         if filters:
             dialog.set_filters(filters)
         
-        dialog.open(self.main_window, None, self._on_import_resource_response, resource_type)
+        # Selección múltiple: todo se importa en un solo lote
+        dialog.open_multiple(self.main_window, None, self._on_import_resource_response, resource_type)
     
     def _create_image_filters(self):
         """Crea filtros para archivos de imagen"""
@@ -220,24 +221,32 @@ p {
     def _on_import_resource_response(self, dialog, result, resource_type):
         """Maneja la respuesta del diálogo de importación"""
         try:
-            file = dialog.open_finish(result)
-            if file:
-                src_path = Path(file.get_path())
-                
-                # Importar usando el core
-                item = self.main_window.core.create_asset_from_disk(
-                    src_path,
-                    resource_type,
-                    dest_name=src_path.name,
-                    set_as_cover=(False)
-                )
-                
-                tipo_nombre = self._get_resource_type_name(resource_type)
-                self.main_window.show_info(f"{tipo_nombre.title()} '{src_path.name}' importada correctamente")
-                
+            files = dialog.open_multiple_finish(result)
+            if not files or files.get_n_items() == 0:
+                return
+
+            sources = [Path(files.get_item(i).get_path()) for i in range(files.get_n_items())]
+
+            # Importar usando el core (copias en paralelo + un único alta en el manifest)
+            items, errors = self.main_window.core.import_assets_from_disk(sources, resource_type)
+
+            tipo_nombre = self._get_resource_type_name(resource_type)
+            if len(items) == 1:
+                message = f"{tipo_nombre.title()} '{Path(items[0].href).name}' importada correctamente"
+            else:
+                message = f"Se importaron {len(items)} archivo(s) de tipo {tipo_nombre}"
+            if errors:
+                message += f"\n\nErrores en {len(errors)} archivo(s):\n" + "\n".join(errors[:5])
+                if len(errors) > 5:
+                    message += f"\n... y {len(errors) - 5} error(es) más"
+
+            if items:
+                self.main_window.show_info(message)
                 # Actualizar la estructura
                 self.main_window.refresh_structure()
-                
+            else:
+                self.main_window.show_error(message)
+
         except Exception as e:
             self.main_window.show_error(f"Error importando archivo: {e}")
     
@@ -598,6 +607,10 @@ p {
             return
         
         try:
+            # Escrituras del editor en cola: a disco ANTES de mover archivos y
+            # reescribir referencias (un snapshot tardío las pisaría)
+            self.main_window.central_editor.force_save()
+
             # Renombrar usando el core mejorado
             new_href = self.main_window.core.rename_item(
                 href,
@@ -615,6 +628,12 @@ p {
             if self.main_window.current_resource == href:
                 self.main_window.current_resource = new_href
                 self.main_window.resource_title.set_text(f"Recurso: {Path(new_href).name}")
+
+            # El documento abierto pudo recibir referencias reescritas: recargarlo
+            # para que el buffer no vuelva a guardar la versión anterior
+            current = self.main_window.current_resource
+            if current:
+                self.main_window.set_current_resource(current, Path(current).name)
                 
         except Exception as e:
             self.main_window.show_error(f"Error renombrando: {e}")
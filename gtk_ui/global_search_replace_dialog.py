@@ -3,15 +3,27 @@ ui/global_search_replace_dialog.py
 Diálogo para buscar y reemplazar en todo el libro
 """
 from . import *
-from gi.repository import Gtk, Adw, GLib
+from gi.repository import Gtk, Adw, GLib, Gio, GObject
 from pathlib import Path
-from typing import TYPE_CHECKING, List, Tuple
-import re
+from typing import TYPE_CHECKING, Optional
+import threading
+
+from core.global_replace import ReplaceSnapshot, reindex_hooks, replace_all, undo_replace
+from core.search_index import ParallelSearch, SearchHit
+from core.text_map import SCOPE_ATTRIBUTES, SCOPE_RAW, SCOPE_TEXT
 
 if TYPE_CHECKING:
     from .main_window import GutenAIWindow
 
 
+class SearchHitWrapper(GObject.Object):
+    """Wrapper GObject para SearchHit (modelo de la lista de resultados)"""
+
+    def __init__(self, hit: SearchHit):
+        super().__init__()
+        self.hit = hit
+
+
 class GlobalSearchReplaceDialog(Adw.Window):
     """Diálogo para buscar y reemplazar texto en todos los documentos del libro"""
 
@@ -31,12 +43,22 @@ class GlobalSearchReplaceDialog(Adw.Window):
         self.set_transient_for(main_window)
 
         # Variables
-        self.search_results = []  # Lista de (href, line_num, line_text, match_start, match_end)
+        self.search_results: list[SearchHit] = []
         self.use_regex = False
         self.case_sensitive = False
+        self.scope = SCOPE_RAW
+
+        # Búsqueda en pool de hilos; resultados por lotes vía idle_add
+        self._search = ParallelSearch(self.core.search_index, dispatch=GLib.idle_add)
+        self._search_timeout = None
+        self.SEARCH_DELAY = 250  # ms de pausa al tipear antes de buscar
+
+        # Pre-imagen del último reemplazo (deshacer con un clic)
+        self._undo_snapshot: Optional[ReplaceSnapshot] = None
 
         # Crear interfaz
         self._setup_ui()
+        self.connect('close-request', self._on_close_request)
 
     def _setup_ui(self):
         """Configura la interfaz del diálogo"""
@@ -66,6 +88,8 @@ class GlobalSearchReplaceDialog(Adw.Window):
         # Campo de búsqueda
         self.search_entry = Adw.EntryRow()
         self.search_entry.set_title("Buscar")
+        self.search_entry.connect('changed', self._on_query_changed)
+        self.search_entry.connect('entry-activated', self._on_search)
         search_group.add(self.search_entry)
 
         # Campo de reemplazo
@@ -83,14 +107,26 @@ class GlobalSearchReplaceDialog(Adw.Window):
 
         # Checkbox sensible a mayúsculas
         self.case_check = Gtk.CheckButton(label="Sensible a mayúsculas")
-        self.case_check.connect('toggled', lambda cb: setattr(self, 'case_sensitive', cb.get_active()))
+        self.case_check.connect('toggled', self._on_option_toggled, 'case_sensitive')
         options_box.append(self.case_check)
 
         # Checkbox regex
         self.regex_check = Gtk.CheckButton(label="Usar expresiones regulares")
-        self.regex_check.connect('toggled', lambda cb: setattr(self, 'use_regex', cb.get_active()))
+        self.regex_check.connect('toggled', self._on_option_toggled, 'use_regex')
         options_box.append(self.regex_check)
 
+        # Alcance: código fuente, texto visible o valores de atributo
+        self.SCOPES = [(SCOPE_RAW, "Código fuente"), (SCOPE_TEXT, "Solo texto"),
+                       (SCOPE_ATTRIBUTES, "Solo atributos")]
+        string_list = Gtk.StringList()
+        for _, label in self.SCOPES:
+            string_list.append(label)
+        self.scope_dropdown = Gtk.DropDown()
+        self.scope_dropdown.set_model(string_list)
+        self.scope_dropdown.set_selected(0)
+        self.scope_dropdown.connect('notify::selected', self._on_scope_changed)
+        options_box.append(self.scope_dropdown)
+
         options_row.add_suffix(options_box)
         search_group.add(options_row)
 
@@ -114,6 +150,12 @@ class GlobalSearchReplaceDialog(Adw.Window):
         self.replace_all_btn.connect('clicked', self._on_replace_all)
         buttons_box.append(self.replace_all_btn)
 
+        # Botón deshacer el último reemplazo
+        self.undo_btn = Gtk.Button(label="Deshacer Reemplazo")
+        self.undo_btn.set_sensitive(False)
+        self.undo_btn.connect('clicked', self._on_undo_replace)
+        buttons_box.append(self.undo_btn)
+
         search_group.add(Adw.PreferencesRow(child=buttons_box))
         main_box.append(search_group)
 
@@ -139,12 +181,17 @@ class GlobalSearchReplaceDialog(Adw.Window):
         scrolled.set_vexpand(True)
         scrolled.set_min_content_height(300)
 
-        # ListBox para resultados
-        self.results_listbox = Gtk.ListBox()
-        self.results_listbox.set_selection_mode(Gtk.SelectionMode.SINGLE)
-        self.results_listbox.add_css_class("boxed-list")
-        self.results_listbox.connect('row-activated', self._on_result_activated)
-        scrolled.set_child(self.results_listbox)
+        # Lista virtualizada: solo existen widgets para las filas visibles
+        self.results_store = Gio.ListStore(item_type=SearchHitWrapper)
+        selection = Gtk.SingleSelection.new(self.results_store)
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self._on_factory_setup)
+        factory.connect("bind", self._on_factory_bind)
+        self.results_view = Gtk.ListView(model=selection, factory=factory)
+        self.results_view.set_single_click_activate(True)
+        self.results_view.add_css_class("boxed-list")
+        self.results_view.connect('activate', self._on_result_activated)
+        scrolled.set_child(self.results_view)
 
         results_group.add(Adw.PreferencesRow(child=scrolled))
         main_box.append(results_group)
@@ -155,48 +202,83 @@ class GlobalSearchReplaceDialog(Adw.Window):
         toolbar_view.set_content(self.toast_overlay)
         self.set_content(toolbar_view)
 
-    def _on_search(self, button):
-        """Busca en todos los documentos del libro"""
-        search_text = self.search_entry.get_text()
+    def _on_query_changed(self, entry):
+        """Reprograma la búsqueda al final de la ráfaga de tipeo"""
+        if self._search_timeout:
+            GLib.source_remove(self._search_timeout)
+        self._search_timeout = GLib.timeout_add(self.SEARCH_DELAY, self._on_search_timeout)
 
-        if not search_text:
-            self._show_toast("Ingresa un texto para buscar")
-            return
-
-        # Limpiar resultados anteriores
-        self.search_results = []
-        while True:
-            row = self.results_listbox.get_row_at_index(0)
-            if row is None:
-                break
-            self.results_listbox.remove(row)
-
-        # Buscar en todos los documentos del spine
-        spine = self.core.get_spine()
-        total_matches = 0
-
-        for idref in spine:
-            item = self.core._get_item(idref)
-            href = item.href
-
-            # Solo buscar en documentos HTML
-            if not href.endswith(('.html', '.xhtml', '.htm')):
-                continue
+    def _on_search_timeout(self) -> bool:
+        self._search_timeout = None
+        if self.search_entry.get_text():
+            self._start_search()
+        else:
+            self._search.cancel()
+            self._clear_results()
+        return False
 
-            try:
-                content = self.core.read_text(href)
-                matches = self._find_matches(content, search_text)
+    def _on_option_toggled(self, check, option: str):
+        setattr(self, option, check.get_active())
+        if self.search_entry.get_text():
+            self._start_search()
 
-                if matches:
-                    total_matches += len(matches)
-                    for line_num, line_text, match_start, match_end in matches:
-                        self.search_results.append((href, line_num, line_text, match_start, match_end))
-                        self._add_result_row(href, line_num, line_text, match_start, match_end, search_text)
+    def _on_scope_changed(self, dropdown, _pspec):
+        self.scope = self.SCOPES[dropdown.get_selected()][0]
+        if self.search_entry.get_text():
+            self._start_search()
 
-            except Exception as e:
-                print(f"[GlobalSearch] Error buscando en {href}: {e}")
+    def _on_search(self, widget):
+        """Busca en todos los documentos del libro"""
+        if self._search_timeout:
+            GLib.source_remove(self._search_timeout)
+            self._search_timeout = None
+        if not self.search_entry.get_text():
+            self._show_toast("Ingresa un texto para buscar")
+            return
+        self._start_search()
+
+    def _spine_documents(self) -> list[str]:
+        """Documentos HTML del spine, en orden de lectura"""
+        hrefs = []
+        for idref in self.core.get_spine():
+            href = self.core._get_item(idref).href
+            if href.endswith(('.html', '.xhtml', '.htm')):
+                hrefs.append(href)
+        return hrefs
+
+    def _start_search(self):
+        """Lanza la búsqueda; la anterior (si sigue corriendo) se descarta"""
+        self._clear_results()
+        self.results_label.set_text("Buscando…")
+        self._search.start(
+            self.search_entry.get_text(),
+            {"regex": self.use_regex, "case_sensitive": self.case_sensitive,
+             "scope": self.scope},
+            self._spine_documents(),
+            self._on_search_batch, self._on_search_done,
+        )
+
+    def _on_search_batch(self, generation: int, hits: list[SearchHit]) -> bool:
+        """Lote de resultados (hilo de la UI): un solo items-changed por lote"""
+        if not self._search.is_current(generation):
+            return False
+        self.search_results.extend(hits)
+        self.results_store.splice(self.results_store.get_n_items(), 0,
+                                  [SearchHitWrapper(hit) for hit in hits])
+        self.results_label.set_text(f"{len(self.search_results)} coincidencias (buscando…)")
+        return False
+
+    def _on_search_done(self, generation: int, status: str) -> bool:
+        if not self._search.is_current(generation):
+            return False
+        if status.startswith("error"):
+            self._show_toast(f"Error en expresión regular: {status[7:]}")
+            self.results_label.set_text("")
+            self.replace_all_btn.set_sensitive(False)
+            return False
 
         # Actualizar label de resultados
+        total_matches = len(self.search_results)
         if total_matches == 0:
             self.results_label.set_text("No se encontraron coincidencias")
             self.replace_all_btn.set_sensitive(False)
@@ -206,42 +288,24 @@ class GlobalSearchReplaceDialog(Adw.Window):
         else:
             self.results_label.set_text(f"{total_matches} coincidencias encontradas")
             self.replace_all_btn.set_sensitive(True)
+        return False
+
+    def _clear_results(self):
+        self.search_results = []
+        self.results_store.remove_all()
+        self.results_label.set_text("")
+        self.replace_all_btn.set_sensitive(False)
 
-    def _find_matches(self, content: str, search_text: str) -> List[Tuple[int, str, int, int]]:
-        """Encuentra todas las coincidencias en el contenido"""
-        matches = []
-        lines = content.split('\n')
-
-        for line_num, line in enumerate(lines, 1):
-            if self.use_regex:
-                # Usar expresiones regulares
-                try:
-                    flags = 0 if self.case_sensitive else re.IGNORECASE
-                    pattern = re.compile(search_text, flags)
-                    for match in pattern.finditer(line):
-                        matches.append((line_num, line, match.start(), match.end()))
-                except re.error as e:
-                    self._show_toast(f"Error en expresión regular: {e}")
-                    return []
-            else:
-                # Búsqueda simple
-                search_in = line if self.case_sensitive else line.lower()
-                search_for = search_text if self.case_sensitive else search_text.lower()
-
-                start = 0
-                while True:
-                    pos = search_in.find(search_for, start)
-                    if pos == -1:
-                        break
-                    matches.append((line_num, line, pos, pos + len(search_text)))
-                    start = pos + 1
-
-        return matches
-
-    def _add_result_row(self, href: str, line_num: int, line_text: str, match_start: int, match_end: int, search_text: str):
-        """Agrega una fila de resultado"""
-        row = Gtk.ListBoxRow()
+    def _on_close_request(self, window):
+        """Cancela la búsqueda en curso al cerrar"""
+        if self._search_timeout:
+            GLib.source_remove(self._search_timeout)
+            self._search_timeout = None
+        self._search.cancel()
+        return False
 
+    def _on_factory_setup(self, factory, list_item):
+        """Crea los widgets de una fila (se reciclan al hacer scroll)"""
         box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
         box.set_margin_start(12)
         box.set_margin_end(12)
@@ -250,50 +314,41 @@ class GlobalSearchReplaceDialog(Adw.Window):
 
         # Archivo y línea
         file_label = Gtk.Label()
-        file_label.set_markup(f"<b>{Path(href).name}</b> — Línea {line_num}")
         file_label.set_halign(Gtk.Align.START)
         file_label.add_css_class("caption")
         box.append(file_label)
 
         # Contexto con el match resaltado
-        # Mostrar hasta 100 caracteres alrededor del match
-        context_start = max(0, match_start - 50)
-        context_end = min(len(line_text), match_end + 50)
-        context = line_text[context_start:context_end].strip()
-
-        # Ajustar posiciones del match en el contexto
-        adjusted_start = match_start - context_start
-        adjusted_end = match_end - context_start
-
-        # Crear label con markup
-        before = GLib.markup_escape_text(context[:adjusted_start])
-        match = GLib.markup_escape_text(context[adjusted_start:adjusted_end])
-        after = GLib.markup_escape_text(context[adjusted_end:])
-
         context_label = Gtk.Label()
-        context_label.set_markup(f"{before}<span background='yellow' foreground='black'><b>{match}</b></span>{after}")
         context_label.set_halign(Gtk.Align.START)
         context_label.set_ellipsize(3)  # ELLIPSIZE_END
         context_label.set_max_width_chars(80)
         context_label.add_css_class("monospace")
         box.append(context_label)
 
-        row.set_child(box)
-
-        # Guardar datos en la fila
-        row.href = href
-        row.line_num = line_num
+        list_item.set_child(box)
 
-        self.results_listbox.append(row)
+    def _on_factory_bind(self, factory, list_item):
+        """Carga un resultado en los widgets de la fila"""
+        hit = list_item.get_item().hit
+        file_label = list_item.get_child().get_first_child()
+        context_label = file_label.get_next_sibling()
+        file_label.set_markup(f"<b>{GLib.markup_escape_text(Path(hit.href).name)}</b> — Línea {hit.line}")
 
-    def _on_result_activated(self, listbox, row):
-        """Abre el archivo y va a la línea del resultado"""
-        if hasattr(row, 'href'):
-            # Abrir el archivo
-            self.main_window.set_current_resource(row.href, Path(row.href).name)
+        # Mostrar hasta 100 caracteres alrededor del match (sin copiar la línea entera)
+        before, match, after = hit.context(50)
+        before = GLib.markup_escape_text(before.lstrip())
+        match = GLib.markup_escape_text(match)
+        after = GLib.markup_escape_text(after.rstrip())
+        context_label.set_markup(f"{before}<span background='yellow' foreground='black'><b>{match}</b></span>{after}")
 
-            # TODO: Ir a la línea específica (requiere implementar scroll a línea en el editor)
-            self._show_toast(f"Abriendo {Path(row.href).name}")
+    def _on_result_activated(self, list_view, position):
+        """Abre el archivo y va a la coincidencia"""
+        hit = self.results_store.get_item(position).hit
+        self.main_window.set_current_resource(hit.href, Path(hit.href).name)
+        if self.main_window.current_resource == hit.href:
+            GLib.idle_add(self.main_window.central_editor.scroll_to_source_offset, hit.start)
+        self._show_toast(f"Abriendo {Path(hit.href).name}")
 
     def _on_replace_all(self, button):
         """Reemplaza todas las coincidencias"""
@@ -331,75 +386,101 @@ class GlobalSearchReplaceDialog(Adw.Window):
         dialog.present()
 
     def _perform_replace_all(self, search_text: str, replace_text: str):
-        """Realiza el reemplazo en todos los archivos"""
-        try:
-            # Agrupar por archivo
-            files_to_modify = {}
-            for href, line_num, line_text, match_start, match_end in self.search_results:
-                if href not in files_to_modify:
-                    files_to_modify[href] = []
-                files_to_modify[href].append((line_num, line_text, match_start, match_end))
-
-            total_replacements = 0
-
-            # Procesar cada archivo
-            for href, matches in files_to_modify.items():
-                try:
-                    content = self.core.read_text(href)
-
-                    # Realizar reemplazos
-                    if self.use_regex:
-                        flags = 0 if self.case_sensitive else re.IGNORECASE
-                        pattern = re.compile(search_text, flags)
-                        new_content = pattern.sub(replace_text, content)
-                        replacements = len(pattern.findall(content))
-                    else:
-                        if self.case_sensitive:
-                            replacements = content.count(search_text)
-                            new_content = content.replace(search_text, replace_text)
-                        else:
-                            # Reemplazo case-insensitive sin regex
-                            pattern = re.compile(re.escape(search_text), re.IGNORECASE)
-                            replacements = len(pattern.findall(content))
-                            new_content = pattern.sub(replace_text, content)
-
-                    # Guardar si hubo cambios
-                    if new_content != content:
-                        self.core.write_text(href, new_content)
-                        total_replacements += replacements
-                        print(f"[GlobalReplace] {href}: {replacements} reemplazos")
-
-                except Exception as e:
-                    print(f"[GlobalReplace] Error procesando {href}: {e}")
-
-            # Recargar el archivo actual si fue modificado
-            if self.main_window.current_resource in files_to_modify:
-                self.main_window.central_editor.load_resource(self.main_window.current_resource)
-
-            # Mostrar resultado
-            self._show_toast(f"Se reemplazaron {total_replacements} coincidencia(s)")
-
-            # Limpiar resultados
-            self.search_results = []
-            while True:
-                row = self.results_listbox.get_row_at_index(0)
-                if row is None:
-                    break
-                self.results_listbox.remove(row)
+        """Lanza el reemplazo transaccional en segundo plano"""
+        # Lo pendiente del editor debe estar en disco (y en el índice)
+        self.main_window.central_editor.force_save()
+        self._search.cancel()
+        self._set_busy(True)
+        hrefs = self._spine_documents()
+        self._run_in_background(
+            lambda: replace_all(
+                self.core, search_text, replace_text, regex=self.use_regex,
+                case_sensitive=self.case_sensitive, scope=self.scope, hrefs=hrefs,
+                reindex_hooks=False,
+            ),
+            self._on_replace_finished,
+        )
+
+    def _run_in_background(self, job, on_done):
+        """Ejecuta job() en un hilo y entrega (resultado, error) en la UI"""
+        def worker():
+            try:
+                result, error = job(), None
+            except Exception as e:
+                result, error = None, e
+            GLib.idle_add(on_done, result, error)
 
-            self.results_label.set_text("")
-            self.replace_all_btn.set_sensitive(False)
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _set_busy(self, busy: bool):
+        self.replace_all_btn.set_sensitive(not busy and bool(self.search_results))
+        self.undo_btn.set_sensitive(not busy and self._undo_snapshot is not None)
 
-        except Exception as e:
-            print(f"[GlobalReplace] Error: {e}")
-            import traceback
-            traceback.print_exc()
+    def _reload_if_current(self, hrefs):
+        """Recarga el recurso abierto si fue modificado"""
+        if self.main_window.current_resource in hrefs:
+            self.main_window.central_editor.load_resource(self.main_window.current_resource)
 
+    def _on_replace_finished(self, result, error) -> bool:
+        if error is not None:
+            print(f"[GlobalReplace] Error: {error}")
+            self._set_busy(False)
             error_dialog = Adw.MessageDialog(transient_for=self, modal=True)
             error_dialog.set_heading("Error al reemplazar")
-            error_dialog.set_body(f"Ocurrió un error:\n\n{str(e)}")
+            error_dialog.set_body(f"No se modificó ningún archivo:\n\n{str(error)}")
             error_dialog.add_response("ok", "OK")
             error_dialog.present()
+            return False
+
+        # Hooks en el hilo de la UI (HookIndexManager no tiene lock)
+        reindex_hooks(self.core, result.counts)
+        for href, n in result.counts.items():
+            print(f"[GlobalReplace] {href}: {n} reemplazos")
+        if result.snapshot.originals:
+            self._undo_snapshot = result.snapshot
+        self._reload_if_current(result.counts)
+
+        # Mostrar resultado con acceso directo a deshacer
+        toast = Adw.Toast()
+        toast.set_title(f"Se reemplazaron {result.total} coincidencia(s) en {len(result.counts)} archivo(s)")
+        toast.set_timeout(5)
+        if result.counts:
+            toast.set_button_label("Deshacer")
+            toast.connect('button-clicked', self._on_undo_replace)
+        self.toast_overlay.add_toast(toast)
+
+        # Limpiar resultados
+        self._clear_results()
+        self._set_busy(False)
+        return False
+
+    def _on_undo_replace(self, widget):
+        """Restaura los archivos del último reemplazo"""
+        snapshot = self._undo_snapshot
+        if snapshot is None:
+            return
+        self._undo_snapshot = None
+        self.main_window.central_editor.force_save()
+        self._set_busy(True)
+        self._run_in_background(lambda: undo_replace(self.core, snapshot, reindex_hooks=False),
+                                self._on_undo_finished)
+
+    def _on_undo_finished(self, result, error) -> bool:
+        self._set_busy(False)
+        if error is not None:
+            print(f"[GlobalReplace] Error deshaciendo: {error}")
+            self._show_toast(f"Error al deshacer: {error}")
+            return False
+        restored, skipped = result
+        reindex_hooks(self.core, restored)
+        self._reload_if_current(restored)
+        message = f"Restaurados {len(restored)} archivo(s)"
+        if skipped:
+            message += f"; {len(skipped)} con cambios posteriores no se tocaron"
+        self._show_toast(message)
+        if self.search_entry.get_text():
+            self._start_search()
+        return False
 
     def _show_toast(self, message: str):
         """Muestra un mensaje toast"""
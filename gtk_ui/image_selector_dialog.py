@@ -46,6 +46,7 @@ class ImageSelectorDialog:
         # Configuración de thumbnails
         self.THUMBNAIL_SIZE = 120
         self.THUMBNAIL_CACHE = {}
+        self.LOADER_CHUNK = 256 * 1024  # bytes por write() al PixbufLoader
         
         # Referencias de widgets
         self.dialog: Optional[Adw.Window] = None
@@ -437,21 +438,11 @@ class ImageSelectorDialog:
             
             # *** CARGAR CON MANEJO DE ERRORES MÁS ESPECÍFICO ***
             try:
-                # Intentar cargar con un tamaño máximo para evitar problemas de memoria
-                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(
-                    str(image_path), 
-                    self.THUMBNAIL_SIZE * 2,  # Cargar a resolución mayor para mejor calidad
-                    self.THUMBNAIL_SIZE * 2, 
-                    True  # Mantener aspecto
-                )
+                # Decodificar directamente a tamaño reducido (mejor calidad: x2)
+                pixbuf = self._load_pixbuf_scaled(image_path, self.THUMBNAIL_SIZE * 2)
             except Exception as pixbuf_error:
                 print(f"[ERROR] Cannot load image {image_path}: {pixbuf_error}")
-                try:
-                    # Fallback: intentar carga normal
-                    pixbuf = GdkPixbuf.Pixbuf.new_from_file(str(image_path))
-                except Exception as fallback_error:
-                    print(f"[ERROR] Fallback load also failed for {image_path}: {fallback_error}")
-                    return None
+                return None
             
             if not pixbuf:
                 print(f"[ERROR] Pixbuf is None for {image_path}")
@@ -490,6 +481,34 @@ class ImageSelectorDialog:
             traceback.print_exc()
             return None
     
+    def _load_pixbuf_scaled(self, image_path: Path, max_size: int) -> Optional[GdkPixbuf.Pixbuf]:
+        """
+        Decodifica la imagen al vuelo con un PixbufLoader alimentado desde el
+        mmap del core (open_resource), pidiendo el tamaño final en
+        'size-prepared': la imagen completa nunca se decodifica ni se lee
+        entera a memoria de Python.
+        """
+        core = self.main_window.core
+        href = image_path.relative_to(core.opf_dir).as_posix()
+
+        loader = GdkPixbuf.PixbufLoader()
+
+        def on_size_prepared(ldr, width, height):
+            if width <= max_size and height <= max_size:
+                return
+            scale = max_size / max(width, height)
+            ldr.set_size(max(1, int(width * scale)), max(1, int(height * scale)))
+
+        loader.connect("size-prepared", on_size_prepared)
+        try:
+            with core.open_resource(href) as view:
+                # PyGObject necesita bytes: se entregan trozos acotados del mapeo
+                for offset in range(0, len(view), self.LOADER_CHUNK):
+                    loader.write(view[offset:offset + self.LOADER_CHUNK].tobytes())
+        finally:
+            loader.close()
+        return loader.get_pixbuf()
+
     def _update_grid_item(self, index: int):
         """Actualiza un item específico del grid"""
         if 0 <= index < self.list_store.get_n_items():
@@ -281,6 +281,18 @@ class GutenAIWindow(Adw.ApplicationWindow):
     def refresh_structure(self):
         """Refresca la estructura del EPUB en el sidebar izquierdo"""
         self.sidebar_left.populate_tree()
+
+    def get_project_cache_dir(self, kind: str) -> Optional[Path]:
+        """
+        Carpeta de datos locales del proyecto (diario, índices...).
+        La clave es el EPUB original: la carpeta temporal cambia en cada apertura.
+        """
+        if not self.core:
+            return None
+        from core.edit_journal import journal_key
+        from .settings_manager import get_settings
+        source = Path(self.original_epub_path or self.core.workdir).resolve()
+        return get_settings().config_dir / kind / journal_key(str(source))
     
     # Toggle de sidebars
     def _on_left_sidebar_toggle(self, button):
@@ -308,6 +320,9 @@ class GutenAIWindow(Adw.ApplicationWindow):
     
     def _on_close_request(self, window):
         """Intercepta el cierre para preguntar si guardar cambios"""
+        # Completar los auto-guardados en cola antes de cerrar o limpiar
+        self.central_editor.flush_autosave()
+
         # Si no hay proyecto abierto, cerrar directamente
         if not self.core:
             self.sidebar_right.cleanup()
@@ -316,6 +331,8 @@ class GutenAIWindow(Adw.ApplicationWindow):
 
         # Si es un nuevo proyecto (persistente), solo cerrar
         if self.is_new_project:
+            self.central_editor.force_save()
+            self.central_editor.close_journal()
             self.sidebar_right.cleanup()
             return False  # Permitir cierre
 
@@ -359,6 +376,10 @@ class GutenAIWindow(Adw.ApplicationWindow):
         """Limpia el directorio temporal si existe"""
         import shutil
 
+        # Cierre ordenado: guardar lo pendiente antes de descartar el diario
+        self.central_editor.force_save()
+        self.central_editor.close_journal()
+
         if self.temp_workdir and self.temp_workdir.exists():
             try:
                 print(f"[Cleanup] Eliminando carpeta temporal: {self.temp_workdir}")
@@ -72,7 +72,11 @@ class SettingsManager:
                 "show_line_numbers": True,
                 "word_wrap": True,
                 "auto_save": True,
-                "auto_save_delay": 1500
+                "auto_save_delay": 1500,
+                "journal_auto_save_delay": 10000,
+                "search_time_budget_ms": 3000,
+                "large_file_threshold_mb": 2,
+                "edit_journal": True
             },
             "ui": {
                 "sidebar_left_visible": True,
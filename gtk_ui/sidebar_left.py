@@ -777,6 +777,8 @@ class SidebarLeft:
     def _do_delete_single_resource(self, href: str):
         """Ejecuta eliminación de recurso individual"""
         try:
+            # Escrituras del editor en cola: que no recreen el archivo borrado
+            self.main_window.central_editor.force_save()
             self.main_window.core.remove_from_manifest(href)
             self.main_window.refresh_structure()
             self.main_window.show_info(f"'{Path(href).name}' eliminado")
@@ -1277,7 +1279,10 @@ class SidebarLeft:
     def _do_delete_selected(self, selected_hrefs, category_type):
         """Realiza la eliminación de elementos seleccionados"""
         deleted_count = 0
-        
+
+        # Escrituras del editor en cola: que no recreen archivos borrados
+        self.main_window.central_editor.force_save()
+
         for href in selected_hrefs:
             try:
                 self.main_window.core.remove_from_manifest(href)
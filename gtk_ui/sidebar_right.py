@@ -3,25 +3,51 @@ ui/sidebar_right.py
 Sidebar derecho - Previsualización WebKit y ventana fullscreen
 """
 from . import *
-from gi.repository import Gtk, Adw, WebKit, GLib
+from gi.repository import Gtk, Adw, WebKit, GLib, Gio, Soup
 import os
-import tempfile
 import subprocess
 from pathlib import Path
 from typing import Optional, TYPE_CHECKING
 
+from core.instrumentation import span, count
+from core.preview_pipeline import (
+    split_preview_document, diff_blocks, build_patch_script,
+    source_markers, annotate_source_offsets, build_preview_html, marker_at_or_before,
+    SOURCE_ATTR,
+)
+from core.edit_journal import content_hash
+from core.preview_server import PreviewServer, SCHEME
+
 if TYPE_CHECKING:
     from .main_window import GutenAIWindow
 
 
 class SidebarRight:
     """Maneja el sidebar derecho con la previsualización"""
-    
+
+    # El esquema se registra una vez por WebContext (proceso); las peticiones
+    # se atienden con la instancia más reciente
+    _scheme_owner: Optional['SidebarRight'] = None
+    _scheme_registered = False
+
     def __init__(self, main_window: 'GutenAIWindow'):
         self.main_window = main_window
-        self.temp_preview_file: Optional[str] = None
         self.fullscreen_window: Optional[Adw.Window] = None
-        
+
+        # Documento en edición (memoria) y recursos del proyecto vía gutenai://
+        self._preview_server = PreviewServer(main_window.core)
+        self._register_uri_scheme()
+
+        # Último documento cargado en el preview: (href, PreviewDocument, fuente)
+        # Permite parchear solo los bloques editados sin recargar la página
+        self._preview_doc = None
+        # Fuente de la copia publicada en gutenai:// (los parches no la republican)
+        self._published_source: Optional[str] = None
+        # Offsets fuente de los bloques marcados en el preview (ordenados)
+        self._source_offsets = []
+        # Huella del último documento validado (no se revalida sin cambios)
+        self._validated_hash: Optional[bytes] = None
+
         self._setup_widget()
     
     def _setup_widget(self):
@@ -143,6 +169,53 @@ class SidebarRight:
         except Exception as e:
             print(f"[WebView] Error agregando WebView al contenedor: {e}")
 
+    def _register_uri_scheme(self):
+        """Registra gutenai:// en el WebContext por defecto"""
+        SidebarRight._scheme_owner = self
+        if SidebarRight._scheme_registered:
+            return
+        try:
+            context = WebKit.WebContext.get_default()
+            context.register_uri_scheme(SCHEME, SidebarRight._on_uri_scheme_request)
+            SidebarRight._scheme_registered = True
+        except Exception as e:
+            print(f"[Preview] Error registrando esquema {SCHEME}://: {e}")
+
+    @staticmethod
+    def _on_uri_scheme_request(request):
+        owner = SidebarRight._scheme_owner
+        if owner is not None:
+            owner._serve_request(request)
+
+    def _serve_request(self, request):
+        """Responde una petición gutenai:// desde PreviewServer"""
+        server = self._preview_server
+        if server.core is not self.main_window.core:
+            server.set_core(self.main_window.core)
+        try:
+            headers = request.get_http_headers()
+            if_none_match = headers.get_one("If-None-Match") if headers else None
+            with span("preview.serve", path=request.get_path()) as sp:
+                result = server.resolve(request.get_path(), if_none_match)
+                sp.set(status=result.status, size=len(result.data))
+
+            stream = Gio.MemoryInputStream.new_from_bytes(GLib.Bytes.new(result.data))
+            response = WebKit.URISchemeResponse.new(stream, len(result.data))
+            response.set_status(result.status, None)
+            response.set_content_type(result.content_type)
+            response_headers = Soup.MessageHeaders.new(Soup.MessageHeadersType.RESPONSE)
+            response_headers.append("ETag", result.etag)
+            response_headers.append("Cache-Control", result.cache_control)
+            response.set_http_headers(response_headers)
+            request.finish_with_response(response)
+        except (FileNotFoundError, PermissionError) as e:
+            request.finish_error(GLib.Error.new_literal(
+                Gio.io_error_quark(), str(e), Gio.IOErrorEnum.NOT_FOUND))
+        except Exception as e:
+            print(f"[Preview] Error sirviendo {request.get_uri()}: {e}")
+            request.finish_error(GLib.Error.new_literal(
+                Gio.io_error_quark(), str(e), Gio.IOErrorEnum.FAILED))
+
     def _on_script_message(self, content_manager, js_result):
         """Maneja mensajes recibidos desde JavaScript"""
         try:
@@ -177,8 +250,11 @@ class SidebarRight:
             if isinstance(data, dict) and data.get('type') == 'click_sync':
                 element_id = data.get('id')
                 text_snippet = data.get('text')
-                
-                if element_id:
+                source_offset = data.get('offset')
+
+                if isinstance(source_offset, int):
+                    self.main_window.central_editor.scroll_to_source_offset(source_offset)
+                elif element_id:
                     print(f"[ReverseSync] Sincronizando por ID: {element_id}")
                     self.main_window.central_editor.scroll_to_element_by_id(element_id)
                 elif text_snippet:
@@ -266,25 +342,26 @@ class SidebarRight:
     
     def update_preview(self):
         """Actualiza la previsualización con el recurso actual"""
-        print(f"[Preview] update_preview() llamado")
-        print(f"[Preview] core: {self.main_window.core is not None}")
-        print(f"[Preview] current_resource: {self.main_window.current_resource}")
-
         if not self.main_window.core or not self.main_window.current_resource:
-            print("[Preview] No hay core o recurso, mostrando vacío")
             self.web_view.load_html("<p>Selecciona un documento HTML para previsualizar.</p>", None)
             return
 
         # Solo previsualizar documentos HTML
         if not self.main_window.current_resource.endswith(('.html', '.xhtml', '.htm')):
-            print(f"[Preview] Tipo no soportado: {self.main_window.current_resource}")
             self.web_view.load_html("<p>Este tipo de archivo no se puede previsualizar.</p>", None)
             return
 
+        if getattr(self.main_window.central_editor, 'large_file_mode', False):
+            self._preview_doc = None
+            self.web_view.load_html(
+                "<p>Previsualización desactivada: el documento supera el tamaño de "
+                "archivo grande. Divídelo en capítulos para volver a verla.</p>", None)
+            return
+
         try:
-            print(f"[Preview] Leyendo contenido de: {self.main_window.current_resource}")
             content = self.main_window.core.read_text(self.main_window.current_resource)
-            print(f"[Preview] Contenido leído: {len(content)} caracteres")
+            # Actualización explícita (cambio de recurso, CSS, recarga): siempre completa
+            self._preview_doc = None
             self._update_preview_content(content, self.main_window.current_resource)
         except Exception as e:
             print(f"[Preview] Error cargando: {e}")
@@ -294,206 +371,167 @@ class SidebarRight:
             self.web_view.load_html(error_html, None)
     
     def _update_preview_content(self, html_content: str, href: str):
-        """Preview seguro usando archivo dedicado SOLO para preview"""
-        print(f"[Preview] _update_preview_content llamado para: {href}")
-        try:
-            # Validación básica del HTML
-            validation_result = self._validate_html_basic(html_content)
-            if not validation_result['valid']:
-                # Mostrar advertencia pero intentar cargar de todos modos
-                print(f"[Preview] Advertencia HTML: {validation_result['error']}")
-
-            # INYECTAR CSS DE MARCADORES DE ANCLAJE (hooks)
-            html_content = self._inject_hook_markers_css(html_content)
-
-            # ANTI-CACHE: Agregar timestamp a los archivos CSS para forzar recarga
-            html_content = self._bust_css_cache(html_content)
-            
-            # INYECTAR JS DE SINCRONIZACIÓN INVERSA
-            html_content = self._inject_reverse_sync_js(html_content)
-
-            # Crear archivo de preview dedicado (no sobreescribir el original)
-            preview_file_path = self._get_preview_file_path(href)
-            print(f"[Preview] Ruta de preview: {preview_file_path}")
-
-            # Escribir contenido al archivo de preview
-            preview_file_path.write_text(html_content, encoding='utf-8')
-            print(f"[Preview] Archivo de preview escrito: {preview_file_path.exists()}")
-
-            # Cargar desde archivo de preview
-            file_uri = preview_file_path.as_uri()
-            print(f"[Preview] URI a cargar: {file_uri}")
-
-            # Verificar que el WebView existe y está visible
-            print(f"[Preview] WebView existe: {self.web_view is not None}")
-            print(f"[Preview] WebView visible: {self.web_view.get_visible() if self.web_view else 'N/A'}")
+        """
+        Actualiza el preview con el texto del editor.
 
-            self.web_view.load_uri(file_uri)
-            print(f"[Preview] load_uri() ejecutado")
+        Si solo cambiaron bloques del <body>, los reemplaza en el DOM vía
+        JavaScript; si cambió el <head> (estilos, título) o el documento no se
+        puede dividir en bloques, hace la recarga completa.
+        """
+        previous = self._preview_doc
+        doc = split_preview_document(html_content)
+        self._preview_doc = (href, doc, html_content)
 
-            # Sincronizar con fullscreen si está activo
+        if previous is not None and self._try_patch_preview(previous, href, doc, html_content):
+            return
+        self._load_preview_full(html_content, href)
+
+    def _try_patch_preview(self, previous, href: str, doc, html_content: str) -> bool:
+        """Intenta parchear el DOM; retorna False si hace falta recarga completa"""
+        prev_href, prev_doc, _ = previous
+        if (prev_href != href or doc is None or prev_doc is None or
+                not (doc.patchable and prev_doc.patchable) or
+                doc.head != prev_doc.head or doc.body_open != prev_doc.body_open):
+            return False
+
+        changed = diff_blocks(prev_doc.blocks, doc.blocks)
+        if changed is None:
+            count("preview.unchanged")
+            return True
+
+        start, old_end, new_end = changed
+        with span("preview.patch", href=href, blocks=new_end - start):
+            # Marcadores fuente: bloques nuevos con sus offsets y corrimiento
+            # de los posteriores (mismo contenido, otra posición)
+            markers = source_markers(html_content, doc.body_start, doc.body_end)
+            self._source_offsets = [m[0] for m in markers]
+            new_blocks = [
+                annotate_source_offsets(html_content, markers, doc.offsets[j],
+                                        doc.offsets[j] + len(doc.blocks[j]))
+                for j in range(start, new_end)
+            ]
+            shift = 0
+            if new_end < len(doc.offsets):
+                shift = doc.offsets[new_end] - prev_doc.offsets[old_end]
+            script = build_patch_script(start, old_end, len(prev_doc.blocks), new_blocks, shift)
+            views = [self.web_view]
             if self._is_fullscreen_active():
-                print(f"[Preview] Sincronizando con fullscreen")
-                self.fullscreen_web_view.load_uri(file_uri)
+                views.append(self.fullscreen_web_view)
+            for view in views:
+                view.evaluate_javascript(script, -1, None, None, None,
+                                         self._on_patch_finished, href)
+        return True
+
+    def _on_patch_finished(self, web_view, result, href):
+        """Si el parche no se pudo aplicar, recarga completa con el texto más reciente"""
+        try:
+            ok = web_view.evaluate_javascript_finish(result).to_string() == "ok"
+        except Exception as e:
+            print(f"[Preview] Error aplicando parche: {e}")
+            ok = False
+        if ok or self._preview_doc is None:
+            return
+        current_href, _, source = self._preview_doc
+        if current_href == href:
+            count("preview.patch_fallback")
+            self._load_preview_full(source, href)
+
+    def _load_preview_full(self, html_content: str, href: str):
+        """Recarga completa: publica la copia de preview en memoria (gutenai://)"""
+        try:
+            with span("preview.update", href=href, chars=len(html_content)):
+                # Validación básica del HTML (solo si cambió el contenido)
+                digest = content_hash(html_content)
+                if digest != self._validated_hash:
+                    self._validated_hash = digest
+                    with span("preview.validate", chars=len(html_content)):
+                        validation_result = self._validate_html_basic(html_content)
+                    if not validation_result['valid']:
+                        # Mostrar advertencia pero intentar cargar de todos modos
+                        print(f"[Preview] Advertencia HTML: {validation_result['error']}")
+                else:
+                    count("preview.validate_skipped")
+
+                # Marcadores de posición fuente, CSS de anclajes y JS de
+                # sincronización inversa en una sola pasada (solo en la copia)
+                doc = self._preview_doc[1] if self._preview_doc else None
+                if doc is None or self._preview_doc[2] is not html_content:
+                    doc = split_preview_document(html_content)
+                with span("preview.inject", chars=len(html_content)) as sp:
+                    preview_bytes, self._source_offsets = build_preview_html(html_content, doc)
+                    sp.set(bytes=len(preview_bytes))
+
+                # Publicar en memoria con el href real: las rutas relativas
+                # (CSS, imágenes) resuelven contra gutenai:// con ETag propio,
+                # así WebKit conserva en caché los recursos sin cambios
+                if self._preview_server.core is not self.main_window.core:
+                    self._preview_server.set_core(self.main_window.core)
+                uri = self._preview_server.publish(href, preview_bytes)
+                self._published_source = html_content
+                self.web_view.load_uri(uri)
+
+                # Sincronizar con fullscreen si está activo
+                if self._is_fullscreen_active():
+                    self.fullscreen_web_view.load_uri(uri)
 
         except Exception as e:
-            print(f"[Preview] Error en _update_preview_content: {e}")
+            print(f"[Preview] Error en _load_preview_full: {e}")
             import traceback
             traceback.print_exc()
             # Fallback: HTML inline
             error_msg = f"<p>Error en preview: {e}</p>"
             self.web_view.load_html(error_msg, None)
 
-    def _inject_hook_markers_css(self, html_content: str) -> str:
+    def _current_preview_uri(self, href: str) -> str:
+        """URI de la copia publicada, republicada si los parches de bloques la dejaron atrás"""
+        if self._preview_doc is not None:
+            current_href, doc, source = self._preview_doc
+            if current_href == href and source is not self._published_source:
+                with span("preview.republish", href=href, chars=len(source)):
+                    preview_bytes, self._source_offsets = build_preview_html(source, doc)
+                self._preview_server.publish(href, preview_bytes)
+                self._published_source = source
+        return self._preview_server.uri_for(href)
+
+    def scroll_to_source_offset(self, offset: int, line_number: int):
         """
-        Inyecta CSS para mostrar marcadores visuales (⚓) en elementos con id
+        Sincroniza el preview con el cursor del editor.
 
-        Los marcadores son sutiles y no afectan el layout:
-        - Aparecen como ::before pseudo-element
-        - Solo visibles en hover
-        - Color gris claro
-        - No se imprimen
-        """
-        hook_marker_css = """
-<style id="gutenai-hook-markers">
-/* GutenAI: Marcadores visuales de anclajes (hooks) */
-*[id]::before {
-    content: "⚓";
-    position: absolute;
-    left: -20px;
-    opacity: 0;
-    color: #999;
-    font-size: 0.8em;
-    transition: opacity 0.2s ease;
-    pointer-events: none;
-}
-
-*[id]:hover::before {
-    opacity: 0.6;
-}
-
-/* Asegurar que elementos con id tengan position relative */
-*[id] {
-    position: relative;
-}
-
-/* Ocultar en impresión */
-@media print {
-    *[id]::before {
-        display: none !important;
-    }
-}
-</style>
-"""
-        # Inyectar antes de </head> si existe, sino antes de <body>
-        if '</head>' in html_content:
-            html_content = html_content.replace('</head>', f'{hook_marker_css}\n</head>')
-        elif '<body' in html_content:
-            html_content = html_content.replace('<body', f'{hook_marker_css}\n<body')
-        else:
-            # Fallback: agregar al inicio
-            html_content = hook_marker_css + '\n' + html_content
-
-        return html_content
-
-    def _bust_css_cache(self, html_content: str) -> str:
+        Búsqueda binaria en la tabla de marcadores; el JS solo localiza el
+        elemento marcado (sin recorrer el texto del DOM).
         """
-        Agrega un timestamp a todas las referencias CSS para evitar caché de WebKit.
-        Transforma: <link href="style.css" ...>
-        En: <link href="style.css?v=12345678" ...>
-        """
-        import time
-        import re
-        
-        timestamp = int(time.time())
-        
-        # Regex para encontrar tags link de stylesheet
-        # Captura 1: todo lo anterior al href
-        # Captura 2: la comilla de apertura del href
-        # Captura 3: la URL del CSS
-        # Captura 4: la comilla de cierre
-        # Captura 5: el resto del tag
-        pattern = r'(<link\s+[^>]*rel=["\']stylesheet["\'][^>]*href=)(["\'])([^"\']+)(["\'])([^>]*>)'
-        
-        def replacer(match):
-            prefix = match.group(1)
-            quote1 = match.group(2)
-            url = match.group(3)
-            quote2 = match.group(4)
-            suffix = match.group(5)
-            
-            # Si ya tiene una query string, usamos &
-            separator = "&" if "?" in url else "?"
-            new_url = f"{url}{separator}v={timestamp}"
-            
-            # Debug
-            # print(f"[Preview] Cache busting: {url} -> {new_url}")
-            
-            return f"{prefix}{quote1}{new_url}{quote2}{suffix}"
-            
-        return re.sub(pattern, replacer, html_content, flags=re.IGNORECASE)
-
-    def _inject_reverse_sync_js(self, html_content: str) -> str:
-        """Inyecta JavaScript para detectar clics y enviarlos a Python"""
-        print("[ReverseSync] Inyectando JS en el HTML...")
-        # Nota: Usamos CDATA para evitar errores de parseo XML con caracteres como '&' (&&)
-        sync_js = """
-<script type="text/javascript" id="gutenai-reverse-sync">
-//<![CDATA[
-(function() {
-    // Evitar múltiples inyecciones
-    if (window.gutenaiSyncInjected) return;
-    window.gutenaiSyncInjected = true;
-    console.log("[GutenAI] JS Injected and Ready");
-
-    document.addEventListener('click', function(e) {
-        // console.log("[GutenAI] Click detected on", e.target.tagName);
-        
-        let target = e.target;
-        
-        // Removed visual feedback
-        let foundId = null;
-        let foundText = target.innerText ? target.innerText.substring(0, 100) : "";
-
-        // Buscar ID en el elemento o sus padres
-        while (target && target !== document.body) {
-            if (target.id && !target.id.startsWith('gutenai-')) {
-                foundId = target.id;
-                break;
-            }
-            target = target.parentElement;
-        }
-        
-        console.log("[GutenAI] Sending message. ID:", foundId, "Text:", foundText.substring(0, 20));
-        
-        // Enviar mensaje a Python
-        if (window.webkit && window.webkit.messageHandlers && window.webkit.messageHandlers.gutenai) {
-            try {
-                window.webkit.messageHandlers.gutenai.postMessage(JSON.stringify({
-                    type: 'click_sync',
-                    id: foundId,
-                    tag: target ? target.tagName : null,
-                    text: foundText
-                }));
-            } catch(err) {
-                console.error("[GutenAI] Error sending message:", err);
-            }
-        } else {
-            console.error("[GutenAI] WebKit message handler not found!");
-            alert("Error: WebKit bridge broken");
-        }
-    });
-})();
-//]]>
-</script>
-"""
-        # Inyectar antes de </body>
-        if '</body>' in html_content:
-            html_content = html_content.replace('</body>', f'{sync_js}\n</body>')
-        else:
-            html_content += sync_js
-            
-        return html_content
+        marker = marker_at_or_before(self._source_offsets, offset)
+        if marker is None:
+            return
+        script = f"""(function() {{
+    var el = document.querySelector('[{SOURCE_ATTR}="{marker}"]');
+    if (!el) return;
+    el.scrollIntoView({{behavior: 'smooth', block: 'center', inline: 'nearest'}});
+
+    // Resaltar temporalmente el elemento
+    el.style.transition = 'background-color 0.5s';
+    el.style.backgroundColor = 'rgba(255, 165, 0, 0.3)';
+    setTimeout(function() {{ el.style.backgroundColor = ''; }}, 1000);
+
+    // Indicador de línea
+    var indicator = document.getElementById('gutenai-cursor-indicator');
+    if (!indicator) {{
+        indicator = document.createElement('div');
+        indicator.id = 'gutenai-cursor-indicator';
+        indicator.style.cssText = 'position: fixed; right: 20px; top: 50%; transform: translateY(-50%);' +
+            'background: rgba(255, 165, 0, 0.9); color: white; padding: 8px 12px; border-radius: 6px;' +
+            'font-size: 11px; font-family: monospace; z-index: 9999; pointer-events: none;' +
+            'transition: opacity 0.3s ease; box-shadow: 0 2px 8px rgba(0,0,0,0.3);';
+        document.body.appendChild(indicator);
+    }}
+    indicator.textContent = 'Línea {line_number} ✓';
+    indicator.style.opacity = '1';
+    clearTimeout(window.gutenaiIndicatorTimer);
+    window.gutenaiIndicatorTimer = setTimeout(function() {{ indicator.style.opacity = '0'; }}, 1500);
+}})();"""
+        self.web_view.evaluate_javascript(script, -1, None, None, None, None, None)
+        if self._is_fullscreen_active():
+            self.fullscreen_web_view.evaluate_javascript(script, -1, None, None, None, None, None)
 
     def _validate_html_basic(self, html: str) -> dict:
         """Validación básica de HTML para detectar problemas graves"""
@@ -533,47 +571,6 @@ class SidebarRight:
         except Exception as e:
             return {'valid': False, 'error': f'Error validando: {str(e)}'}
 
-    def _get_preview_file_path(self, href: str) -> Path:
-        """Genera ruta para archivo de preview dedicado"""
-        
-        # Crear archivo paralelo con sufijo _preview
-        original_path = Path(href)
-        preview_name = f"{original_path.stem}_preview{original_path.suffix}"
-        
-        # Mismo directorio que el original para que las rutas relativas funcionen
-        preview_path = (self.main_window.core.opf_dir / original_path.parent / preview_name).resolve()
-        
-        # Asegurar que el directorio existe
-        preview_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        return preview_path
-    
-    def _update_preview_fallback(self, html_content: str, original_error: Exception):
-        """Método fallback usando archivo temporal"""
-        try:
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-                f.write(html_content)
-                temp_path = f.name
-            
-            # Limpiar archivo temporal anterior
-            if self.temp_preview_file and os.path.exists(self.temp_preview_file):
-                os.unlink(self.temp_preview_file)
-            
-            self.temp_preview_file = temp_path
-            file_uri = Path(temp_path).as_uri()
-            self.web_view.load_uri(file_uri)
-            
-            # Sincronizar con pantalla completa
-            if self._is_fullscreen_active():
-                self.fullscreen_web_view.load_uri(file_uri)
-                
-        except Exception as e2:
-            error_msg = f"<p>Error en preview: {original_error}<br>Fallback error: {e2}</p>"
-            self.web_view.load_html(error_msg, None)
-            
-            if self._is_fullscreen_active():
-                self.fullscreen_web_view.load_uri(file_uri)
-    
     def _on_fullscreen_preview(self, button):
         """Abre la previsualización en una ventana independiente"""
         if not self.main_window.core or not self.main_window.current_resource:
@@ -708,17 +705,13 @@ class SidebarRight:
                 self.fullscreen_web_view.load_html("<p>Este tipo de archivo no se puede previsualizar.</p>", None)
                 return
 
-            # Leer el contenido del recurso actual
-            content = self.main_window.core.read_text(self.main_window.current_resource)
-            print(f"[Fullscreen] Contenido leído: {len(content)} caracteres")
-
-            # Crear archivo de preview y cargarlo
-            preview_file_path = self._get_preview_file_path(self.main_window.current_resource)
-            preview_file_path.write_text(content, encoding='utf-8')
-
-            file_uri = preview_file_path.as_uri()
-            print(f"[Fullscreen] Cargando URI: {file_uri}")
-            self.fullscreen_web_view.load_uri(file_uri)
+            # Reutilizar la copia publicada (al día con los parches); si no
+            # hay, recarga completa (update_preview también carga el fullscreen)
+            href = self.main_window.current_resource
+            if self._preview_server.is_published(href):
+                self.fullscreen_web_view.load_uri(self._current_preview_uri(href))
+            else:
+                self.update_preview()
 
         except Exception as e:
             print(f"[Fullscreen] Error sincronizando: {e}")
@@ -727,44 +720,6 @@ class SidebarRight:
             error_html = f"<h1>Error</h1><p>No se pudo cargar el contenido: {e}</p>"
             self.fullscreen_web_view.load_html(error_html, None)
     
-    def _update_fullscreen_content(self, html_content: str):
-        """Actualiza fullscreen usando archivo de preview dedicado"""
-        if not self._is_fullscreen_active() or not self.main_window.current_resource:
-            return
-        
-        try:
-            preview_file_path = self._get_preview_file_path(self.main_window.current_resource)
-            preview_file_path.write_text(html_content, encoding='utf-8')
-            
-            file_uri = preview_file_path.as_uri()
-            self.fullscreen_web_view.load_uri(file_uri)
-            
-        except Exception as e:
-            self.fullscreen_web_view.load_html(f"<h1>Error en fullscreen</h1><p>{e}</p>", None)
-    
-    def cleanup(self):
-        """Limpia recursos incluyendo archivos de preview"""
-        
-        # Limpiar archivos temporales normales
-        if self.temp_preview_file and os.path.exists(self.temp_preview_file):
-            os.unlink(self.temp_preview_file)
-        
-        # Limpiar archivos de preview dedicados
-        if self.main_window.core:
-            try:
-                # Buscar archivos *_preview.* en todo el proyecto
-                for preview_file in self.main_window.core.opf_dir.rglob("*_preview.*"):
-                    if preview_file.is_file():
-                        try:
-                            preview_file.unlink()
-                            print(f"[CLEANUP] Removed preview file: {preview_file}")
-                        except:
-                            pass
-            except:
-                pass
-        
-        if self.fullscreen_window:
-            self.fullscreen_window.destroy()
     def _on_close_fullscreen(self, button):
         """Cierra la ventana fullscreen de forma segura"""
         print("[Fullscreen] Botón cerrar presionado")
@@ -909,8 +864,7 @@ class SidebarRight:
     
     def cleanup(self):
         """Limpia recursos al cerrar la aplicación"""
-        if self.temp_preview_file and os.path.exists(self.temp_preview_file):
-            os.unlink(self.temp_preview_file)
-        
+        self._preview_server.set_core(None)
+
         if self.fullscreen_window:
             self.fullscreen_window.destroy()
\ No newline at end of file
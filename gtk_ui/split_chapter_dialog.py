@@ -296,6 +296,9 @@ class SplitChapterDialog(Adw.Window):
             if not current_idref:
                 raise Exception("No se pudo encontrar el documento en el spine")
 
+            # Escrituras del editor en cola: a disco antes de renombrar
+            self.main_window.central_editor.force_save()
+
             # Renombrar el archivo actual al primer nombre
             print(f"[SplitChapter] Renombrando archivo actual a: {name1}")
             self.core.rename_item(self.current_href, name1, update_references=False)
@@ -6,7 +6,10 @@ from . import *
 from gi.repository import Gtk, Adw, GLib
 from pathlib import Path
 from typing import TYPE_CHECKING
-import re
+import threading
+
+from core.book_stats import spine_documents
+from core.instrumentation import span
 
 if TYPE_CHECKING:
     from .main_window import GutenAIWindow
@@ -36,8 +39,12 @@ class StatisticsDialog(Adw.Window):
         self.set_modal(True)
         self.set_transient_for(main_window)
 
+        # Se activa al cerrar: el cálculo en curso se abandona
+        self._cancel = threading.Event()
+
         # Crear interfaz
         self._setup_ui()
+        self.connect('close-request', self._on_close_request)
 
         # Calcular estadísticas en segundo plano
         self._calculate_statistics()
@@ -85,8 +92,16 @@ class StatisticsDialog(Adw.Window):
         spinner_label = Gtk.Label(label="Calculando estadísticas...")
         spinner_label.add_css_class("title-2")
 
+        # Progreso: capítulos analizados / total
+        self.progress_bar = Gtk.ProgressBar()
+        self.progress_bar.set_show_text(True)
+        self.progress_bar.set_size_request(300, -1)
+        self.progress_bar.set_halign(Gtk.Align.CENTER)
+        self.progress_bar.set_visible(False)
+
         self.spinner_box.append(self.spinner)
         self.spinner_box.append(spinner_label)
+        self.spinner_box.append(self.progress_bar)
         main_box.append(self.spinner_box)
 
         # Contenedor para las estadísticas (oculto inicialmente)
@@ -125,208 +140,53 @@ class StatisticsDialog(Adw.Window):
 
     def _calculate_statistics(self):
         """Calcula las estadísticas en segundo plano"""
-        import threading
-
         def calculate_thread():
             try:
                 stats = self._compute_book_statistics()
-                GLib.idle_add(self._show_statistics, stats)
+                if stats is not None:
+                    GLib.idle_add(self._show_statistics, stats)
             except Exception as e:
                 GLib.idle_add(self._show_error, str(e))
 
         threading.Thread(target=calculate_thread, daemon=True).start()
 
     def _compute_book_statistics(self) -> dict:
-        """Calcula todas las estadísticas del libro"""
-        print("[Statistics] Iniciando cálculo de estadísticas...")
+        """Calcula las estadísticas (solo se re-analizan los capítulos que cambiaron)"""
+        with span("statistics.dialog", current_chapter_only=self.current_chapter_only) as sp:
+            result = self.core.book_stats.compute(
+                self._chapter_hrefs(), cancel=self._cancel,
+                on_progress=lambda done, total: GLib.idle_add(self._on_progress, done, total),
+            )
+            if result is not None:
+                sp.set(chapters=len(result['chapters']), words=result['total_words'])
+        return result
 
-        # Obtener documentos del spine
-        spine = self.core.get_spine()
-        print(f"[Statistics] Spine tiene {len(spine)} documentos: {spine}")
+    def _on_progress(self, done: int, total: int) -> bool:
+        if total:
+            self.progress_bar.set_visible(True)
+            self.progress_bar.set_fraction(done / total)
+            self.progress_bar.set_text(f"{done} de {total} capítulos")
+        return False
+
+    def _on_close_request(self, window):
+        """Cancela el cálculo en curso al cerrar"""
+        self._cancel.set()
+        return False
+
+    def _chapter_hrefs(self) -> list:
+        """Documentos del spine a contar (o solo el capítulo actual)"""
+        hrefs = spine_documents(self.core)
 
         # Si solo queremos el capítulo actual, filtrar el spine
         if self.current_chapter_only:
             current_resource = self.main_window.current_resource
             if not current_resource:
-                print("[Statistics] No hay capítulo actual seleccionado")
                 raise Exception("No hay ningún capítulo abierto actualmente")
-
-            # Buscar el idref del capítulo actual
-            current_idref = None
-            for idref in spine:
-                item = self.core._get_item(idref)
-                if item.href == current_resource:
-                    current_idref = idref
-                    break
-
-            if current_idref:
-                spine = [current_idref]
-                print(f"[Statistics] Mostrando solo capítulo actual: {current_resource}")
-            else:
-                print(f"[Statistics] El archivo actual no está en el spine: {current_resource}")
+            if current_resource not in hrefs:
                 raise Exception("El archivo actual no es un capítulo del libro")
+            return [current_resource]
 
-        # Estadísticas globales
-        total_words = 0
-        total_paragraphs = 0
-        total_characters = 0
-        total_characters_no_spaces = 0
-        total_chapters = len(spine)
-
-        # Estadísticas por capítulo
-        chapters_stats = []
-
-        for i, idref in enumerate(spine, 1):
-            try:
-                print(f"\n[Statistics] Procesando {i}/{len(spine)}: idref={idref}")
-
-                # Convertir idref a href
-                item = self.core._get_item(idref)
-                href = item.href
-                print(f"[Statistics] href={href}")
-
-                # Leer contenido HTML
-                html_content = self.core.read_text(href)
-                print(f"[Statistics] HTML leído: {len(html_content)} caracteres")
-
-                if not html_content or not html_content.strip():
-                    print(f"[Statistics] ADVERTENCIA: HTML vacío para {href}")
-                    continue
-
-                # Extraer texto limpio
-                text = self._extract_text_from_html(html_content)
-                print(f"[Statistics] Texto extraído: {len(text)} caracteres")
-                print(f"[Statistics] Primeros 200 chars: {text[:200]!r}")
-
-                # Calcular estadísticas
-                words = self._count_words(text)
-                paragraphs = self._count_paragraphs(html_content)
-                chars = len(text)
-                chars_no_spaces = len(text.replace(' ', '').replace('\n', '').replace('\t', ''))
-
-                print(f"[Statistics] Palabras: {words}, Párrafos: {paragraphs}")
-
-                # Actualizar totales
-                total_words += words
-                total_paragraphs += paragraphs
-                total_characters += chars
-                total_characters_no_spaces += chars_no_spaces
-
-                # Guardar estadísticas del capítulo
-                chapter_name = Path(href).name
-                chapters_stats.append({
-                    'name': chapter_name,
-                    'idref': idref,
-                    'href': href,
-                    'words': words,
-                    'paragraphs': paragraphs,
-                    'characters': chars,
-                    'characters_no_spaces': chars_no_spaces
-                })
-
-            except Exception as e:
-                print(f"[Statistics] ERROR procesando idref={idref}: {e}")
-                import traceback
-                traceback.print_exc()
-                continue
-
-        # Tiempo de lectura estimado (promedio 200-250 palabras por minuto)
-        reading_time_minutes = total_words / 225 if total_words > 0 else 0
-        reading_hours = int(reading_time_minutes / 60)
-        reading_minutes = int(reading_time_minutes % 60)
-
-        result = {
-            'total_words': total_words,
-            'total_paragraphs': total_paragraphs,
-            'total_characters': total_characters,
-            'total_characters_no_spaces': total_characters_no_spaces,
-            'total_chapters': total_chapters,
-            'reading_time_hours': reading_hours,
-            'reading_time_minutes': reading_minutes,
-            'chapters': chapters_stats
-        }
-
-        print(f"\n[Statistics] ===== RESUMEN FINAL =====")
-        print(f"[Statistics] Total capítulos: {total_chapters}")
-        print(f"[Statistics] Total palabras: {total_words}")
-        print(f"[Statistics] Total párrafos: {total_paragraphs}")
-        print(f"[Statistics] Total caracteres: {total_characters}")
-        print(f"[Statistics] Capítulos procesados: {len(chapters_stats)}")
-        print(f"[Statistics] ========================\n")
-
-        return result
-
-    def _extract_text_from_html(self, html_content: str) -> str:
-        """Extrae texto limpio del HTML"""
-        try:
-            from bs4 import BeautifulSoup
-
-            soup = BeautifulSoup(html_content, 'html.parser')
-
-            # Buscar solo el contenido del body
-            body = soup.find('body')
-            if body is None:
-                body = soup
-
-            # Remover elementos no-texto
-            for elemento in body(['script', 'style', 'meta', 'link', 'title', 'head']):
-                elemento.decompose()
-
-            # Extraer texto
-            texto = body.get_text(separator=' ', strip=True)
-
-            # Limpiar espacios múltiples
-            texto = re.sub(r'\s+', ' ', texto)
-
-            return texto.strip()
-
-        except ImportError:
-            print(f"[Statistics] BeautifulSoup no disponible, usando fallback")
-            # Fallback sin BeautifulSoup (re ya está importado al inicio del archivo)
-
-            # Buscar body
-            body_match = re.search(r'<body[^>]*>(.*?)</body>', html_content, re.DOTALL | re.IGNORECASE)
-            if body_match:
-                contenido = body_match.group(1)
-            else:
-                contenido = html_content
-
-            # Remover tags HTML
-            texto = re.sub(r'<[^>]+>', ' ', contenido)
-            # Limpiar espacios
-            texto = re.sub(r'\s+', ' ', texto)
-            return texto.strip()
-
-    def _count_words(self, text: str) -> int:
-        """Cuenta palabras en el texto"""
-        if not text or not text.strip():
-            return 0
-
-        # Dividir por espacios y filtrar vacíos
-        words = [w for w in text.split() if w.strip()]
-        return len(words)
-
-    def _count_paragraphs(self, html_content: str) -> int:
-        """Cuenta párrafos en el HTML"""
-        try:
-            from bs4 import BeautifulSoup
-
-            soup = BeautifulSoup(html_content, 'html.parser')
-
-            # Contar elementos que representan párrafos
-            paragraphs = soup.find_all(['p', 'div'])
-
-            # Filtrar solo los que tienen texto
-            paragraphs_with_text = [p for p in paragraphs if p.get_text(strip=True)]
-
-            return len(paragraphs_with_text)
-
-        except ImportError:
-            # Fallback sin BeautifulSoup
-            import re
-            # Contar tags <p>
-            p_tags = re.findall(r'<p[^>]*>.*?</p>', html_content, re.DOTALL | re.IGNORECASE)
-            return len(p_tags)
+        return hrefs
 
     def _show_statistics(self, stats: dict):
         """Muestra las estadísticas en la interfaz"""
@@ -356,6 +216,30 @@ class StatisticsDialog(Adw.Window):
 
         self._add_stat_row(self.global_group, "Tiempo de lectura estimado", reading_time)
 
+        # Estadísticas lingüísticas
+        self._add_stat_row(self.global_group, "Oraciones", f"{stats['total_sentences']:,}")
+        self._add_stat_row(self.global_group, "Palabras por oración (promedio)",
+                           f"{stats['average_sentence_length']:.1f}")
+        self._add_stat_row(self.global_group, "Riqueza léxica (tipos/palabras)",
+                           f"{stats['type_token_ratio']:.3f}")
+        self._add_stat_row(self.global_group, "Proporción de diálogo",
+                           f"{stats['dialogue_ratio']:.0%}")
+        self._add_stat_row(self.global_group, "Legibilidad", self._format_readability(stats))
+
+        if stats['top_words']:
+            top_row = Adw.ExpanderRow()
+            top_row.set_title("Palabras más repetidas")
+            top_row.set_subtitle(", ".join(word for word, _ in stats['top_words'][:5]))
+            top_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
+            top_box.set_margin_start(12)
+            top_box.set_margin_end(12)
+            top_box.set_margin_top(6)
+            top_box.set_margin_bottom(6)
+            for word, n in stats['top_words']:
+                self._add_detail_label(top_box, word, f"{n:,}")
+            top_row.add_row(Adw.PreferencesRow(child=top_box))
+            self.global_group.add(top_row)
+
         # Estadísticas por capítulo (solo para libro completo)
         if not self.current_chapter_only and self.chapters_group:
             for chapter in stats['chapters']:
@@ -374,10 +258,21 @@ class StatisticsDialog(Adw.Window):
                 self._add_detail_label(details_box, "Párrafos", f"{chapter['paragraphs']}")
                 self._add_detail_label(details_box, "Caracteres (con espacios)", f"{chapter['characters']:,}")
                 self._add_detail_label(details_box, "Caracteres (sin espacios)", f"{chapter['characters_no_spaces']:,}")
+                self._add_detail_label(details_box, "Oraciones", f"{chapter['sentences']:,}")
+                self._add_detail_label(details_box, "Palabras por oración", f"{chapter['average_sentence_length']:.1f}")
+                self._add_detail_label(details_box, "Diálogo", f"{chapter['dialogue_ratio']:.0%}")
+                self._add_detail_label(details_box, "Legibilidad", self._format_readability(chapter))
 
                 chapter_row.add_row(Adw.PreferencesRow(child=details_box))
                 self.chapters_group.add(chapter_row)
 
+    def _format_readability(self, stats: dict) -> str:
+        """'Fernández-Huerta 68.2 (Normal)' o aviso si el idioma no tiene fórmula"""
+        score = stats.get('readability')
+        if not score:
+            return "No disponible para este idioma"
+        return f"{score['formula']} {score['score']:.1f} ({score['label']})"
+
     def _add_stat_row(self, group, title: str, value: str):
         """Agrega una fila de estadística"""
         row = Adw.ActionRow()
@@ -455,7 +350,7 @@ class StatisticsDialog(Adw.Window):
 
     def _generate_text_report(self) -> str:
         """Genera un reporte de texto con las estadísticas"""
-        # Recalcular para tener los datos frescos
+        # Datos frescos: la caché solo re-analiza lo que cambió desde que se abrió
         stats = self._compute_book_statistics()
 
         metadata = self.core.get_metadata()
@@ -476,6 +371,15 @@ Caracteres (con espacios): {stats['total_characters']:,}
 Caracteres (sin espacios): {stats['total_characters_no_spaces']:,}
 Tiempo de lectura estimado: {stats['reading_time_hours']}h {stats['reading_time_minutes']}min
 
+ESTADÍSTICAS LINGÜÍSTICAS
+{'-' * 60}
+Oraciones: {stats['total_sentences']:,}
+Palabras por oración (promedio): {stats['average_sentence_length']:.1f}
+Riqueza léxica (tipos/palabras): {stats['type_token_ratio']:.3f}
+Proporción de diálogo: {stats['dialogue_ratio']:.0%}
+Legibilidad: {self._format_readability(stats)}
+Palabras más repetidas: {', '.join(f'{word} ({n})' for word, n in stats['top_words'])}
+
 ESTADÍSTICAS POR CAPÍTULO
 {'-' * 60}
 """
@@ -486,6 +390,10 @@ ESTADÍSTICAS POR CAPÍTULO
             report += f"   Párrafos: {chapter['paragraphs']}\n"
             report += f"   Caracteres (con espacios): {chapter['characters']:,}\n"
             report += f"   Caracteres (sin espacios): {chapter['characters_no_spaces']:,}\n"
+            report += f"   Oraciones: {chapter['sentences']:,}\n"
+            report += f"   Palabras por oración: {chapter['average_sentence_length']:.1f}\n"
+            report += f"   Diálogo: {chapter['dialogue_ratio']:.0%}\n"
+            report += f"   Legibilidad: {self._format_readability(chapter)}\n"
 
         report += f"\n{'=' * 60}\n"
         report += "Generado por GutenAI - Editor EPUB\n"
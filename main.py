@@ -4,12 +4,6 @@ Guten.AI - EPUB Editor
 Punto de entrada principal de la aplicación
 """
 
-import gi
-gi.require_version('Gtk', '4.0')
-gi.require_version('Adw', '1')
-gi.require_version('Gdk', '4.0')
-
-from gi.repository import Adw, Gtk, Gdk
 import os
 import sys
 from pathlib import Path
@@ -18,8 +12,16 @@ from pathlib import Path
 app_dir = Path(__file__).parent
 sys.path.insert(0, str(app_dir))
 
-# Importar la ventana principal
-from gtk_ui.main_window import GutenAIApplication 
+# GTK y la UI se importan en main(): los procesos de trabajo (spawn) de
+# core/book_stats re-importan este módulo y no deben cargar GTK ni WebKit
+
+
+def _load_gtk():
+    """Fija las versiones de GTK/Adwaita antes de importar la UI"""
+    import gi
+    gi.require_version('Gtk', '4.0')
+    gi.require_version('Adw', '1')
+    gi.require_version('Gdk', '4.0')
 
 
 def _check_display() -> bool:
@@ -27,6 +29,8 @@ def _check_display() -> bool:
     Verifica que exista un backend gráfico disponible antes de arrancar Adwaita.
     Retorna True si hay display válido; en caso contrario imprime una advertencia.
     """
+    from gi.repository import Gdk, Gtk
+
     # Gtk.init_check devuelve (bool, argv) en PyGObject >= 3.46 — mantenemos compatibilidad.
     init_ok = False
     try:
@@ -57,9 +61,12 @@ def _check_display() -> bool:
 
 def main():
     """Función principal de la aplicación"""
+    _load_gtk()
     if not _check_display():
         return 1
-    
+
+    # Importar la ventana principal
+    from gtk_ui.main_window import GutenAIApplication
     app = GutenAIApplication()
     return app.run(sys.argv)
 
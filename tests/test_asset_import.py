@@ -0,0 +1,61 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from core.guten_core import GutenCore, KIND_IMAGE, _copy_file_fast
+
+
+class TestBulkAssetImport(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        base = Path(self._tmp.name)
+        self.core = GutenCore.new_project(base / "libro")
+        self.src_dir = base / "fuentes"
+        self.src_dir.mkdir()
+        self.sources = []
+        for i in range(20):
+            src = self.src_dir / f"foto_{i:02d}.png"
+            src.write_bytes(bytes([i]) * (1000 + i))
+            self.sources.append(src)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_copies_all_and_saves_opf_once(self):
+        with mock.patch.object(self.core, "_save_opf", wraps=self.core._save_opf) as save:
+            items, errors = self.core.import_assets_from_disk(
+                self.sources, KIND_IMAGE, cover=self.sources[3])
+
+        self.assertEqual(errors, [])
+        self.assertEqual(save.call_count, 1)
+        self.assertEqual(len(items), 20)
+        for src, mi in zip(self.sources, items):
+            self.assertEqual(mi.media_type, "image/png")
+            self.assertEqual(self.core.read_bytes(mi.href), src.read_bytes())
+        self.assertEqual(items[3].properties, "cover-image")
+        self.assertEqual(items[4].properties, "")
+
+    def test_conflicts_are_reported_not_fatal(self):
+        self.core.import_assets_from_disk(self.sources[:2], KIND_IMAGE)
+        items, errors = self.core.import_assets_from_disk(
+            self.sources[:4] + [self.src_dir / "no_existe.png"], KIND_IMAGE)
+        self.assertEqual([Path(mi.href).name for mi in items], ["foto_02.png", "foto_03.png"])
+        self.assertEqual(len(errors), 3)
+
+    def test_copy_file_fast_falls_back(self):
+        dst = self.src_dir / "copia" / "x.png"
+        # Sin soporte (OSError) o copia corta (0 bytes con datos pendientes)
+        for effect in (OSError, lambda *args: 0):
+            with self.subTest(effect=effect):
+                dst.unlink(missing_ok=True)
+                with mock.patch("core.guten_core.os.copy_file_range", side_effect=effect,
+                                create=True), mock.patch("core.guten_core.fcntl", None):
+                    method = _copy_file_fast(self.sources[5], dst)
+                self.assertEqual(method, "copyfile")
+                self.assertEqual(dst.read_bytes(), self.sources[5].read_bytes())
+                self.assertFalse(dst.with_suffix(".png.tmp").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
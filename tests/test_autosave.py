@@ -0,0 +1,72 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from core.autosave import AutosaveWorker
+from core.guten_core import GutenCore
+
+
+class TestAutosaveWorker(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.core = GutenCore.new_project(Path(self._tmp.name) / "libro")
+        self.href = "Text/chap1.xhtml"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_write_and_callback_leave_hooks_to_ui_thread(self):
+        done = []
+        worker = AutosaveWorker(self.core)
+        text = self.core.read_text(self.href).replace("<body>", '<body><p id="nuevo">x</p>', 1)
+        with mock.patch.object(self.core.hook_index, "update_file_index") as update:
+            worker.submit(self.href, text, reindex=True, token=7,
+                          on_done=lambda job, error: done.append((job.token, job.reindex, error)))
+            self.assertTrue(worker.flush(5))
+        self.assertEqual(self.core.read_text(self.href), text)
+        # HookIndexManager no tiene lock: el hilo escritor no lo toca
+        update.assert_not_called()
+        self.assertEqual(done, [(7, True, None)])
+        self.assertFalse((self.core.opf_dir / (self.href + ".tmp")).exists())
+
+    def test_newer_snapshot_supersedes_queued(self):
+        worker = AutosaveWorker(self.core)
+        gate = threading.Event()
+        original = self.core.write_text
+        written = []
+
+        def slow_write(href, text):
+            gate.wait(5)
+            written.append(text)
+            original(href, text)
+
+        with mock.patch.object(self.core, "write_text", side_effect=slow_write):
+            worker.submit("Text/otro.xhtml", "primero")
+            # Mientras el primero se escribe, dos versiones del mismo href: solo la última
+            worker.submit(self.href, "v1")
+            worker.submit(self.href, "v2")
+            self.assertTrue(worker.is_pending(self.href))
+            gate.set()
+            self.assertTrue(worker.flush(5))
+        self.assertEqual(written, ["primero", "v2"])
+        self.assertEqual(self.core.read_text(self.href), "v2")
+
+    def test_errors_reported(self):
+        errors = []
+        worker = AutosaveWorker(self.core)
+        with mock.patch.object(self.core, "write_text", side_effect=OSError("disco lleno")):
+            worker.submit(self.href, "x", on_done=lambda job, error: errors.append(error))
+            self.assertTrue(worker.flush(5))
+        self.assertIsInstance(errors[0], OSError)
+        # Visible sin esperar al callback (p. ej. antes de descartar el diario)
+        self.assertIs(worker.error_for(self.href), errors[0])
+        worker.submit(self.href, "y")
+        self.assertTrue(worker.flush(5))
+        self.assertIsNone(worker.error_for(self.href))
+        worker.shutdown(5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import io
+import json
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest import mock
+
+from core import book_stats
+from core.book_stats import BookStatistics, chapter_statistics, main
+from core.guten_core import GutenCore
+
+CHAPTER = ('<html><head><title>Título</title><style>p { color: red; }</style></head>\n'
+           '<body>\n<div class="cap">\n  <h1>Capítulo uno</h1>\n'
+           '  <p>Una pala<em>bra</em> y   otra.</p>\n  <p>Caf&eacute;<br/>solo</p>\n'
+           '  <p>   </p>\n  <script>var x = "no cuenta";</script>\n</div>\n</body></html>')
+
+
+class _FakeCore:
+    def __init__(self, docs):
+        self.docs = dict(docs)
+
+    def read_text(self, href):
+        return self.docs[href]
+
+
+class TestChapterStatistics(unittest.TestCase):
+    def test_single_pass_counts(self):
+        stats = chapter_statistics("Text/cap1.xhtml", CHAPTER)
+        # "Capítulo uno Una palabra y otra. Café solo"
+        self.assertEqual(stats.name, "cap1.xhtml")
+        self.assertEqual(stats.words, 8)
+        self.assertEqual(stats.characters, len("Capítulo uno Una palabra y otra. Café solo"))
+        self.assertEqual(stats.characters_no_spaces, len("CapítulounoUnapalabrayotra.Cafésolo"))
+        # div + 2 <p> con texto (el <p> vacío no cuenta)
+        self.assertEqual(stats.paragraphs, 3)
+
+    def test_only_changed_chapters_are_recomputed(self):
+        core = _FakeCore({"a.xhtml": CHAPTER, "b.xhtml": "<body><p>dos palabras</p></body>"})
+        with tempfile.TemporaryDirectory() as tmp:
+            stats = BookStatistics(core, Path(tmp))
+            first = stats.compute(["a.xhtml", "b.xhtml"])
+            self.assertEqual(first['total_words'], 10)
+
+            core.docs["b.xhtml"] = "<body><p>ahora tres palabras</p></body>"
+            reopened = BookStatistics(core, Path(tmp))  # caché persistida
+            with mock.patch.object(book_stats, "chapter_statistics",
+                                   wraps=chapter_statistics) as parse:
+                second = reopened.compute(["a.xhtml", "b.xhtml"])
+            self.assertEqual([call.args[0] for call in parse.call_args_list], ["b.xhtml"])
+            self.assertEqual(second['total_words'], 11)
+            self.assertEqual(second['total_paragraphs'], 4)
+
+
+class TestParallelStatistics(unittest.TestCase):
+    DOCS = {f"c{i:02}.xhtml": "<body>" + "<p>uno dos tres</p>" * (i + 1) + "</body>"
+            for i in range(10)}
+
+    def test_process_pool_matches_serial_and_reports_progress(self):
+        hrefs = sorted(self.DOCS)
+        serial = BookStatistics(_FakeCore(self.DOCS)).compute(hrefs, max_workers=1)
+        progress = []
+        with mock.patch.object(book_stats, "MIN_PARALLEL_CHARS", 0):
+            parallel = BookStatistics(_FakeCore(self.DOCS)).compute(
+                hrefs, max_workers=2, on_progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual(parallel, serial)
+        self.assertEqual(serial['total_words'], 3 * 55)
+        self.assertEqual(progress[0], (0, 10))
+        self.assertEqual(progress[-1], (10, 10))
+
+    def test_small_books_stay_serial(self):
+        with mock.patch.object(book_stats, "ProcessPoolExecutor") as pool:
+            result = BookStatistics(_FakeCore(self.DOCS)).compute(sorted(self.DOCS), max_workers=4)
+        pool.assert_not_called()
+        self.assertEqual(result['total_words'], 3 * 55)
+
+    def test_cancel_keeps_partial_results_cached(self):
+        cancel = threading.Event()
+        stats = BookStatistics(_FakeCore(self.DOCS))
+
+        def on_progress(done, total):
+            if done == 3:
+                cancel.set()
+
+        self.assertIsNone(stats.compute(sorted(self.DOCS), max_workers=1,
+                                        on_progress=on_progress, cancel=cancel))
+        self.assertEqual(sum(stats.cached(h) is not None for h in self.DOCS), 3)
+
+    def test_headless_json_for_catalogue(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            GutenCore.new_project(Path(tmp) / "libro", lang="es")
+            out = io.StringIO()
+            with redirect_stdout(out):
+                status = main([str(Path(tmp) / "libro")])
+            self.assertEqual(status, 0)
+            (book,) = json.loads(out.getvalue())["books"]
+            self.assertEqual(book['language'], "es")
+            self.assertEqual(book['total_chapters'], len(book['chapters']))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from core.edit_journal import EditJournal, content_hash, recover_journals, replay
+
+
+class _FakeCore:
+    def __init__(self, opf_dir: Path):
+        self.opf_dir = opf_dir
+        self.hook_index = None
+
+    def write_text(self, href, text):
+        (self.opf_dir / href).write_text(text, encoding="utf-8")
+
+
+class TestReplay(unittest.TestCase):
+    def test_typing_bursts_and_backspace(self):
+        edits = [(5, 0, "a"), (6, 0, "b"), (7, 0, "c"), (7, 1, ""),  # "ab"
+                 (0, 5, ""), (0, 0, "Hola")]
+        self.assertEqual(replay("hello world", edits), "Holaab world")
+
+    def test_matches_sequential_application(self):
+        text = "<p>uno dos tres</p>"
+        edits = [(3, 3, ""), (3, 0, "UNO"), (10, 0, " y"), (0, 0, "<!-- x -->"), (12, 2, "")]
+        expected = text
+        for offset, deleted, inserted in edits:
+            expected = expected[:offset] + inserted + expected[offset + deleted:]
+        self.assertEqual(replay(text, edits), expected)
+
+
+class TestEditJournal(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        root = Path(self._tmp.name)
+        self.project = root / "OEBPS"
+        self.project.mkdir()
+        self.journal_dir = root / "journal"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _crash(self, journal):
+        # Sin close(): el archivo queda como tras un cierre inesperado
+        journal.shutdown()
+        self.assertTrue(journal.flush(5))
+
+    def test_recover_after_crash(self):
+        base = "<p>hola</p>"
+        (self.project / "cap.xhtml").write_text(base, encoding="utf-8")
+        journal = EditJournal(self.journal_dir)
+        journal.begin("cap.xhtml", content_hash(base))
+        journal.record(7, 0, " mundo")
+        self._crash(journal)
+
+        fresh = EditJournal(self.journal_dir)
+        recovered, stale = recover_journals(_FakeCore(self.project), fresh)
+        self.assertEqual((recovered, stale), (["cap.xhtml"], []))
+        self.assertEqual((self.project / "cap.xhtml").read_text(encoding="utf-8"),
+                         "<p>hola mundo</p>")
+        self.assertEqual(fresh.pending(), [])
+
+    def test_checkpoint_keeps_only_later_edits(self):
+        base = "abc"
+        journal = EditJournal(self.journal_dir)
+        journal.begin("a.css", content_hash(base))
+        journal.record(3, 0, "d")
+        saved, seq = "abcd", journal.seq
+        journal.record(4, 0, "e")
+        journal.checkpoint(journal.session, seq, content_hash(saved))
+        self._crash(journal)
+
+        (entry,) = EditJournal(self.journal_dir).pending()
+        self.assertEqual(entry.base, content_hash(saved).hex())
+        self.assertEqual(replay(saved, entry.edits), "abcde")
+
+    def test_stale_base_and_clean_close(self):
+        (self.project / "cap.xhtml").write_text("otro contenido", encoding="utf-8")
+        journal = EditJournal(self.journal_dir)
+        journal.begin("cap.xhtml", content_hash("original"))
+        journal.record(0, 0, "x")
+        self._crash(journal)
+        recovered, stale = recover_journals(_FakeCore(self.project), EditJournal(self.journal_dir))
+        self.assertEqual((recovered, stale), ([], ["cap.xhtml"]))
+
+        journal = EditJournal(self.journal_dir)
+        journal.begin("cap.xhtml", content_hash("otro contenido"))
+        journal.record(0, 0, "x")
+        journal.close()
+        self.assertTrue(journal.flush(5))
+        self.assertEqual(list(self.journal_dir.glob("*.journal")), [])
+
+    def test_writes_happen_off_the_calling_thread(self):
+        journal = EditJournal(self.journal_dir)
+        journal.begin("cap.xhtml", content_hash("abc"))
+        self.assertTrue(journal.flush(5))
+        fsync_threads = []
+        real_fsync = os.fsync
+
+        def fsync(fd):
+            fsync_threads.append(threading.current_thread())
+            real_fsync(fd)
+
+        with mock.patch("core.edit_journal.os.fsync", side_effect=fsync):
+            for i in range(50):
+                journal.record(3 + i, 0, "x")
+            self.assertTrue(journal.flush(5))
+        # Las teclas se agrupan: pocos fsync y ninguno en el hilo que edita
+        self.assertTrue(1 <= len(fsync_threads) <= 2)
+        self.assertNotIn(threading.current_thread(), fsync_threads)
+        entry = EditJournal._read_entry(journal._journal_path("cap.xhtml"))
+        self.assertEqual(len(entry.edits), 50)
+
+    def test_close_without_discard_keeps_journal(self):
+        journal = EditJournal(self.journal_dir)
+        journal.begin("cap.xhtml", content_hash("abc"))
+        journal.record(3, 0, "d")
+        journal.close(discard=False)
+        self.assertTrue(journal.flush(5))
+        (entry,) = EditJournal(self.journal_dir).pending()
+        self.assertEqual(replay("abc", entry.edits), "abcd")
+
+
+if __name__ == "__main__":
+    unittest.main()
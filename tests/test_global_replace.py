@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from core.global_replace import reindex_hooks, replace_all, undo_replace
+from core.guten_core import KIND_DOCUMENT, GutenCore
+
+
+class TestGlobalReplace(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.core = GutenCore.new_project(Path(self._tmp.name) / "libro", lang="es")
+        for i in range(2, 5):
+            self.core.create_document(f"chap{i}.xhtml", title=f"Capítulo {i}")
+        self.docs = [mi.href for mi in self.core.find_items(ext=(".xhtml",), in_spine=True)]
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_replace_reindexes_and_undo_restores(self):
+        before = {href: self.core.read_text(href) for href in self.docs}
+        result = replace_all(self.core, "capítulo", "Parte", hrefs=self.docs)
+
+        changed = [href for href in self.docs if "Capítulo" in before[href]]
+        self.assertTrue(changed)
+        self.assertEqual(sorted(result.counts), sorted(changed))
+        self.assertEqual(result.total, sum(before[h].count("Capítulo") for h in changed))
+        for href in changed:
+            self.assertEqual(self.core.read_text(href), before[href].replace("Capítulo", "Parte"))
+        # El índice ya refleja lo escrito
+        self.assertEqual(self.core.search_index.find("capítulo", hrefs=self.docs), [])
+
+        restored, skipped = undo_replace(self.core, result.snapshot)
+        self.assertEqual((sorted(restored), skipped), (sorted(changed), []))
+        for href in self.docs:
+            self.assertEqual(self.core.read_text(href), before[href])
+
+    def test_hooks_left_to_caller_when_requested(self):
+        with mock.patch.object(self.core.hook_index, "update_file_index") as update:
+            result = replace_all(self.core, "capítulo", "Parte", hrefs=self.docs,
+                                 reindex_hooks=False)
+            undo_replace(self.core, result.snapshot, reindex_hooks=False)
+            update.assert_not_called()
+            reindex_hooks(self.core, result.counts)
+        self.assertEqual(sorted(c.args[0] for c in update.call_args_list), sorted(result.counts))
+
+    def test_undo_skips_files_edited_afterwards(self):
+        result = replace_all(self.core, "Capítulo 2", "Prólogo", hrefs=self.docs)
+        (href,) = result.counts
+        self.core.write_text(href, self.core.read_text(href) + "\n<!-- editado -->")
+        self.assertEqual(undo_replace(self.core, result.snapshot), ([], [href]))
+
+    def test_deleted_and_reimported_document_is_read_from_disk(self):
+        href = next(h for h in self.docs if h.endswith("chap2.xhtml"))
+        self.core.write_text(href, "<html><body><p>viejo texto borrado</p></body></html>")
+        self.assertTrue(self.core.search_index.find("viejo", hrefs=self.docs))
+        self.core.delete_item(href)
+        src = Path(self._tmp.name) / "chap2.xhtml"
+        src.write_text("<html><body><p>otro viejo capítulo</p></body></html>", encoding="utf-8")
+        self.core.import_assets_from_disk([src], KIND_DOCUMENT)
+
+        replace_all(self.core, "viejo", "X")
+        self.assertEqual(self.core.read_text(href), "<html><body><p>otro X capítulo</p></body></html>")
+
+    def test_original_checked_against_disk_before_writing(self):
+        href = self.docs[0]
+        self.core.write_text(href, "<p>viejo uno</p>")
+        self.core.search_index.find("viejo", hrefs=self.docs)
+        # Cambio externo con el mismo tamaño y mtime: el índice no lo detecta
+        path = self.core.opf_dir / href
+        st = path.stat()
+        path.write_text("<p>viejo dos</p>", encoding="utf-8")
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+        result = replace_all(self.core, "viejo", "X", hrefs=self.docs)
+        self.assertEqual(self.core.read_text(href), "<p>X dos</p>")
+        self.assertEqual(result.snapshot.original(href), "<p>viejo dos</p>")
+
+    def test_failed_commit_leaves_files_untouched(self):
+        before = {href: self.core.read_text(href) for href in self.docs}
+        real_write_text = Path.write_text
+        calls = []
+
+        def failing_write_text(path, *args, **kwargs):
+            calls.append(path)
+            if len(calls) == 2:
+                raise OSError("disco lleno")
+            return real_write_text(path, *args, **kwargs)
+
+        with mock.patch.object(Path, "write_text", failing_write_text):
+            with self.assertRaises(OSError):
+                replace_all(self.core, "Capítulo", "Parte", hrefs=self.docs)
+        for href in self.docs:
+            self.assertEqual(self.core.read_text(href), before[href])
+        self.assertEqual(list(self.core.opf_dir.rglob("*.tmp")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from core import instrumentation as instr
+
+
+class TestInstrumentation(unittest.TestCase):
+    def tearDown(self):
+        instr.disable()
+        instr.reset()
+
+    def test_disabled_is_inert(self):
+        instr.disable()
+        with instr.span("x") as sp:
+            sp.set(a=1)
+        instr.count("c")
+        self.assertEqual(instr.summary(), {})
+        self.assertEqual(instr.counters(), {})
+
+    def test_spans_counters_and_chrome_trace(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            trace = Path(tmp) / "trace.json"
+            instr.enable(trace_path=trace)
+
+            @instr.traced("op.outer")
+            def outer():
+                with instr.span("op.inner", n=3) as sp:
+                    sp.set(done=True)
+                instr.count("op.items", 5)
+
+            outer()
+            outer()
+
+            summary = instr.summary()
+            self.assertEqual(summary["op.outer"]["calls"], 2)
+            self.assertEqual(summary["op.inner"]["calls"], 2)
+            self.assertEqual(instr.counters()["op.items"], 10)
+
+            instr.write_chrome_trace(trace)
+            events = json.loads(trace.read_text())["traceEvents"]
+            inner = [e for e in events if e["name"] == "op.inner"]
+            self.assertEqual(inner[0]["ph"], "X")
+            self.assertEqual(inner[0]["args"], {"n": 3, "done": True})
+
+    def test_profile_dump_per_top_level_span(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            instr.enable(profile_dir=Path(tmp))
+            with instr.span("perfilado"):
+                with instr.span("anidado"):
+                    sum(range(1000))
+            dumps = list(Path(tmp).glob("*.prof"))
+            self.assertEqual(len(dumps), 1)
+            self.assertIn("perfilado", dumps[0].name)
+
+
+if __name__ == "__main__":
+    unittest.main()
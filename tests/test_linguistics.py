@@ -0,0 +1,42 @@
+import unittest
+
+from core.book_stats import aggregate, chapter_statistics
+from core.linguistics import _syllables_en, _syllables_es, readability
+
+CHAPTER = ('<body><h1>Capítulo</h1>\n'
+           '<p>La casa era grande. ¿Quién vivía en la casa? Nadie lo sabía…</p>\n'
+           '<p>—No lo sé —dijo María.</p>\n'
+           '<p>La casa, la casa y otra vez la casa</p></body>')
+
+
+class TestLinguistics(unittest.TestCase):
+    def test_sentences_vocabulary_and_dialogue_in_one_pass(self):
+        stats = chapter_statistics("cap.xhtml", CHAPTER, "es-AR")
+        # Capítulo | 3 del primer párrafo | diálogo | último párrafo sin punto
+        self.assertEqual(stats.sentences, 6)
+        self.assertEqual(stats.language, "es")
+        self.assertEqual(stats.vocabulary["casa"], 5)
+        self.assertEqual(stats.dialogue_words, 5)
+        self.assertEqual(stats.tokens, stats.words)
+
+        book = aggregate([stats], language="es")
+        self.assertEqual(book['top_words'][0], ("casa", 5))
+        self.assertNotIn("la", dict(book['top_words']))
+        self.assertEqual(book['readability']['formula'], "Fernández-Huerta")
+        self.assertAlmostEqual(book['dialogue_ratio'], 5 / stats.tokens, places=3)
+        self.assertAlmostEqual(book['type_token_ratio'],
+                               len(stats.vocabulary) / stats.tokens, places=3)
+
+    def test_syllables_and_formulas(self):
+        self.assertEqual([_syllables_es(w) for w in ("murciélago", "poesía", "canción", "aéreo")],
+                         [4, 4, 2, 4])
+        self.assertEqual([_syllables_en(w) for w in ("table", "make", "beautiful")], [2, 1, 3])
+        self.assertEqual(readability("en", 100, 5, 150), ("Flesch", 59.6))
+        self.assertEqual(readability("es", 100, 5, 200), ("Fernández-Huerta", 66.4))
+        # Oraciones más largas: más difícil
+        self.assertLess(readability("es", 100, 2, 200)[1], readability("es", 100, 20, 200)[1])
+        self.assertIsNone(readability("fr", 100, 5, 150))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+from core.guten_core import GutenCore, KIND_IMAGE
+
+
+class TestOpenResource(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        base = Path(self._tmp.name)
+        self.core = GutenCore.new_project(base / "libro")
+        src = base / "foto.jpg"
+        src.write_bytes(b"\xff\xd8\xff" + bytes(range(256)) * 40)
+        self.image = self.core.create_asset_from_disk(src, KIND_IMAGE)
+        self.base = base
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_memoryview_and_stream(self):
+        expected = self.core.read_bytes(self.image.href)
+        with self.core.open_resource(self.image.href) as view:
+            self.assertIsInstance(view, memoryview)
+            self.assertEqual(view.tobytes(), expected)
+        with self.core.open_resource(self.image.href, stream=True) as f:
+            self.assertEqual(f.read(3), b"\xff\xd8\xff")
+
+    def test_empty_file(self):
+        self.core.write_bytes("Styles/vacio.css", b"")
+        with self.core.open_resource("Styles/vacio.css") as view:
+            self.assertEqual(len(view), 0)
+
+    def test_export_stores_precompressed_media(self):
+        out = self.base / "libro.epub"
+        self.core.export_epub(out)
+        with zipfile.ZipFile(out) as z:
+            self.assertIsNone(z.testzip())
+            infos = {i.filename: i for i in z.infolist()}
+            self.assertEqual(z.infolist()[0].filename, "mimetype")
+            self.assertEqual(infos["mimetype"].compress_type, zipfile.ZIP_STORED)
+            image = infos[f"OEBPS/{self.image.href}"]
+            self.assertEqual(image.compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(z.read(image), self.core.read_bytes(self.image.href))
+            self.assertEqual(infos["OEBPS/Text/chap1.xhtml"].compress_type, zipfile.ZIP_DEFLATED)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import re
+import unittest
+
+from core.preview_pipeline import (
+    HOOK_MARKER_CSS, REVERSE_SYNC_JS, SOURCE_ATTR, annotate_preview_html, build_patch_script,
+    build_preview_html, diff_blocks, marker_at_or_before, split_preview_document,
+)
+
+DOC = """<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head><title>Cap</title></head>
+<body class="cuerpo">
+  <h1 id="t">Título</h1>
+  <!-- nota -->
+  <p>Uno <b>dos</b><br/></p>
+  <hr/>
+  <div><div>anidado</div></div>
+  <script>if (a < b) { x = "</p>"; }</script>
+  <img src="../Images/x.png" alt="x">
+</body>
+</html>"""
+
+
+class TestSplitPreviewDocument(unittest.TestCase):
+    def test_top_level_blocks_and_offsets(self):
+        doc = split_preview_document(DOC)
+        self.assertTrue(doc.patchable)
+        self.assertEqual(doc.head, "<title>Cap</title>")
+        self.assertEqual(doc.body_open, '<body class="cuerpo">')
+        self.assertEqual(doc.blocks, [
+            '<h1 id="t">Título</h1>',
+            "<p>Uno <b>dos</b><br/></p>",
+            "<hr/>",
+            "<div><div>anidado</div></div>",
+            '<script>if (a < b) { x = "</p>"; }</script>',
+            '<img src="../Images/x.png" alt="x">',
+        ])
+        for block, offset in zip(doc.blocks, doc.offsets):
+            self.assertEqual(DOC[offset:offset + len(block)], block)
+
+    def test_loose_text_or_unbalanced_not_patchable(self):
+        self.assertFalse(split_preview_document("<body>hola<p>x</p></body>").patchable)
+        self.assertFalse(split_preview_document("<body><div><p>x</p></body>").patchable)
+        self.assertIsNone(split_preview_document("<p>sin body</p>"))
+
+
+class TestDiffBlocks(unittest.TestCase):
+    def test_ranges(self):
+        self.assertIsNone(diff_blocks(["a", "b"], ["a", "b"]))
+        self.assertEqual(diff_blocks(["a", "b", "c"], ["a", "x", "c"]), (1, 2, 2))
+        self.assertEqual(diff_blocks(["a", "b"], ["a", "b", "c"]), (2, 2, 3))
+        self.assertEqual(diff_blocks(["a", "b", "c"], ["a", "c"]), (1, 2, 1))
+        self.assertEqual(diff_blocks(["a", "a"], ["a"]), (1, 2, 1))
+
+    def test_single_paragraph_edit_patches_one_block(self):
+        old = split_preview_document(DOC)
+        new = split_preview_document(DOC.replace("Uno", "Uno y medio"))
+        self.assertEqual(old.head, new.head)
+        self.assertEqual(diff_blocks(old.blocks, new.blocks), (1, 2, 2))
+
+    def test_patch_script_escapes_payload(self):
+        script = build_patch_script(1, 2, 6, ['<p>"comillas"</script></p>'])
+        self.assertIn('kids.length !== 6', script)
+        self.assertIn('\\"comillas\\"', script)
+
+
+class TestSourceMarkers(unittest.TestCase):
+    def test_annotates_preview_copy_with_source_offsets(self):
+        doc = split_preview_document(DOC)
+        annotated, offsets = annotate_preview_html(DOC, doc)
+        # h1, p, hr, div, div anidado (script e img no son bloques)
+        self.assertEqual(len(offsets), 5)
+        self.assertEqual(offsets, sorted(offsets))
+        for offset in offsets:
+            self.assertIn(f'{SOURCE_ATTR}="{offset}"', annotated)
+            self.assertEqual(DOC[offset], "<")
+        # Quitando los marcadores se recupera la fuente exacta
+        self.assertEqual(re.sub(f' {SOURCE_ATTR}="\\d+"', "", annotated), DOC)
+        self.assertNotIn(SOURCE_ATTR, annotated.split("<body")[0])
+
+    def test_single_pass_injection_matches_step_by_step(self):
+        doc = split_preview_document(DOC)
+        annotated, offsets = annotate_preview_html(DOC, doc)
+        expected = (annotated.replace("</head>", HOOK_MARKER_CSS + "</head>")
+                    .replace("</body>", REVERSE_SYNC_JS + "</body>"))
+        self.assertEqual(build_preview_html(DOC, doc), (expected.encode("utf-8"), offsets))
+
+        no_head = "<body><p>x</p></body>"
+        html, _ = build_preview_html(no_head, split_preview_document(no_head))
+        self.assertTrue(html.decode("utf-8").startswith(HOOK_MARKER_CSS + "<body>"))
+        html, offsets = build_preview_html("<p>sin body</p>", None)
+        self.assertEqual(html.decode("utf-8"), HOOK_MARKER_CSS + "<p>sin body</p>" + REVERSE_SYNC_JS)
+        self.assertEqual(offsets, [])
+
+    def test_binary_search_lookup(self):
+        offsets = [10, 50, 90]
+        self.assertEqual(marker_at_or_before(offsets, 60), 50)
+        self.assertEqual(marker_at_or_before(offsets, 90), 90)
+        self.assertEqual(marker_at_or_before(offsets, 3), 10)
+        self.assertIsNone(marker_at_or_before([], 3))
+
+    def test_patch_script_shifts_following_markers(self):
+        script = build_patch_script(0, 1, 3, ["<p>x</p>"], shift=7)
+        self.assertIn("var shift = 7;", script)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from core.preview_server import PreviewServer
+
+
+class TestPreviewServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name) / "OEBPS"
+        (self.root / "Styles").mkdir(parents=True)
+        (self.root / "Text").mkdir()
+        self.css = self.root / "Styles" / "a.css"
+        self.css.write_text("p { color: red; }", encoding="utf-8")
+        (self.root / "Text" / "cap1.xhtml").write_text("<p>disco</p>", encoding="utf-8")
+        core = SimpleNamespace(opf_dir=self.root, items_by_href={
+            "Text/cap1.xhtml": SimpleNamespace(media_type="application/xhtml+xml")})
+        self.server = PreviewServer(core)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_published_document_is_served_from_memory(self):
+        uri = self.server.publish("Text/cap1.xhtml", "<p>memoria ñ</p>")
+        self.assertEqual(uri, "gutenai://book/Text/cap1.xhtml")
+        response = self.server.resolve("/Text/cap1.xhtml")
+        self.assertEqual(response.data, "<p>memoria ñ</p>".encode("utf-8"))
+        self.assertEqual(response.content_type, "application/xhtml+xml")
+        self.assertEqual(response.cache_control, "no-store")
+        self.server.publish("Text/cap1.xhtml", "<p>otra</p>")
+        self.assertNotEqual(self.server.resolve("/Text/cap1.xhtml").etag, response.etag)
+
+    def test_resource_etag_and_not_modified(self):
+        first = self.server.resolve("/Styles/a.css")
+        self.assertEqual((first.status, first.content_type), (200, "text/css"))
+        again = self.server.resolve("/Styles/a.css", if_none_match=first.etag)
+        self.assertEqual((again.status, again.data), (304, b""))
+
+        self.css.write_text("p { color: blue; }", encoding="utf-8")
+        st = self.css.stat()
+        os.utime(self.css, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        changed = self.server.resolve("/Styles/a.css", if_none_match=first.etag)
+        self.assertEqual(changed.status, 200)
+        self.assertNotEqual(changed.etag, first.etag)
+        self.assertEqual(changed.data, b"p { color: blue; }")
+
+    def test_rejects_paths_outside_project(self):
+        with self.assertRaises(PermissionError):
+            self.server.resolve("/../secreto.txt")
+        with self.assertRaises(PermissionError):
+            self.server.resolve("/Styles/%2E%2E/%2E%2E/secreto.txt")
+        with self.assertRaises(FileNotFoundError):
+            self.server.resolve("/Styles/falta.css")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import re
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from core.search_index import ParallelSearch, SearchIndex, required_literals
+from core.text_search import build_search_pattern
+
+DOCS = {
+    "Text/cap1.xhtml": '<html><body>\n<p class="intro">La casa de Casandra.</p>\n'
+                       '<p>casas y mas casas, <em>caserío</em></p>\n</body></html>',
+    "Text/cap2.xhtml": '<html><body>\n<p>El perro ladra.</p>\n<p>aaaa</p>\n</body></html>',
+    "Styles/a.css": "p { color: red; }",
+}
+
+
+class _FakeCore:
+    def __init__(self, docs):
+        self.docs = dict(docs)
+        self.reads = 0
+        self.items_by_id = {
+            href: SimpleNamespace(href=href, media_type="text/css" if href.endswith(".css")
+                                  else "application/xhtml+xml")
+            for href in docs
+        }
+
+    def read_text(self, href):
+        self.reads += 1
+        return self.docs[href]
+
+
+def _brute_force(docs, hrefs, query, **options):
+    pattern = build_search_pattern(query, **options)
+    return [(href, m.start(), m.end()) for href in hrefs for m in pattern.finditer(docs[href])]
+
+
+class TestSearchIndex(unittest.TestCase):
+    HREFS = ["Text/cap1.xhtml", "Text/cap2.xhtml"]
+
+    def _find(self, index, query, **options):
+        return [(h.href, h.start, h.end) for h in index.find(query, hrefs=self.HREFS, **options)]
+
+    def test_same_results_as_full_scan(self):
+        core = _FakeCore(DOCS)
+        index = SearchIndex(core)
+        cases = [
+            ("casa", {}), ("Casa", {"case_sensitive": True}), ("casa", {"whole_words": True}),
+            ("sa de Ca", {}), ("class=", {}), ("aa", {}), ("</p>", {}), (".", {}),
+            (r"cas\w+", {"regex": True}), (r"(?:perro|gato) ladra", {"regex": True}),
+        ]
+        for query, options in cases:
+            with self.subTest(query=query, **options):
+                self.assertEqual(self._find(index, query, **options),
+                                 _brute_force(DOCS, self.HREFS, query, **options))
+        self.assertEqual(core.reads, 2)  # solo la construcción inicial lee disco (sin CSS)
+
+    def test_hits_carry_line_and_column(self):
+        index = SearchIndex(_FakeCore(DOCS))
+        (hit,) = index.find("ladra", hrefs=self.HREFS)
+        self.assertEqual((hit.line, hit.line_text), (2, "<p>El perro ladra.</p>"))
+        self.assertEqual(hit.line_text[hit.column:hit.column + 5], "ladra")
+        self.assertEqual(hit.context(6), ("perro ", "ladra", ".</p>"))
+        self.assertIs(hit.source, index.text_of("Text/cap2.xhtml"))  # sin copia por resultado
+
+    def test_incremental_update_and_regex_prefilter(self):
+        core = _FakeCore(DOCS)
+        index = SearchIndex(core)
+        self.assertEqual(index.plan(r"perro\s+\w+", regex=True).documents, ["Text/cap2.xhtml"])
+        index.file_written("Text/cap1.xhtml", "<p>otro perro</p>")
+        self.assertEqual(self._find(index, "perro"),
+                         [("Text/cap1.xhtml", 8, 13), ("Text/cap2.xhtml", 19, 24)])
+        self.assertEqual(self._find(index, "casa"), [])
+
+    def test_rereads_documents_changed_on_disk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            core = _FakeCore(DOCS)
+            core.opf_dir = Path(tmp)
+            (core.opf_dir / "Text").mkdir()
+            for href in self.HREFS:
+                (core.opf_dir / href).write_text(DOCS[href], encoding="utf-8")
+            index = SearchIndex(core)
+            self.assertEqual(self._find(index, "gato"), [])
+            # Cambio sin aviso (p. ej. archivo reemplazado por otro)
+            core.docs["Text/cap2.xhtml"] = "<p>un gato</p>"
+            (core.opf_dir / "Text/cap2.xhtml").write_text("<p>un gato</p>", encoding="utf-8")
+            self.assertEqual(self._find(index, "gato"), [("Text/cap2.xhtml", 6, 10)])
+            self.assertEqual(index.text_of("Text/cap2.xhtml"), "<p>un gato</p>")
+
+    def test_shards_reused_by_content_hash(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            first = SearchIndex(_FakeCore(DOCS), Path(tmp))
+            self.assertEqual(first.ensure_built(), 2)
+            second = SearchIndex(_FakeCore(DOCS), Path(tmp))
+            self.assertEqual(second.ensure_built(), 0)
+            self.assertEqual(self._find(second, "casas"), self._find(first, "casas"))
+
+    def test_required_literals(self):
+        self.assertEqual(required_literals(r"hola\s+mundo"), ["hola", "mundo"])
+        self.assertEqual(required_literals(r"(?:a|b)c(de)+f?"), ["c", "de"])
+        self.assertEqual(required_literals(r"[a-z]+", re.I), [])
+
+
+class TestParallelSearch(unittest.TestCase):
+    def test_streams_in_document_order_and_ignores_stale_generations(self):
+        docs = {f"Text/c{i:02}.xhtml": "<p>palabra</p>\n" * 50 for i in range(12)}
+        hrefs = sorted(docs)
+        search = ParallelSearch(SearchIndex(_FakeCore(docs)))
+        search.BATCH_SIZE = 120
+        batches, done = [], []
+        stale = search.cancel()
+        search._run(stale - 1, "palabra", {}, hrefs, lambda g, b: batches.append(b), done.append)
+        self.assertEqual((batches, done), ([], []))
+
+        generation = search.generation
+        search._run(generation, "palabra", {"whole_words": True}, hrefs,
+                    lambda g, b: batches.append(b), lambda g, status: done.append(status))
+        hits = [hit for batch in batches for hit in batch]
+        self.assertEqual(len(hits), 600)
+        self.assertEqual([h.href for h in hits], sorted(h.href for h in hits))
+        self.assertTrue(all(len(batch) <= 150 for batch in batches[:-1]))
+        self.assertEqual(done, ["done"])
+
+    def test_invalid_regex_reports_error(self):
+        search = ParallelSearch(SearchIndex(_FakeCore(DOCS)))
+        done = []
+        search._run(search.generation, "(", {"regex": True}, None, None,
+                    lambda g, status: done.append(status))
+        self.assertTrue(done[0].startswith("error"))
+
+
+if __name__ == "__main__":
+    unittest.main()
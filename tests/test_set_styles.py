@@ -0,0 +1,68 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from core.guten_core import GutenCore
+
+
+class TestSetStylesForDocuments(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.core = GutenCore.new_project(Path(self._tmp.name) / "libro", lang="es")
+        for i in range(2, 6):
+            self.core.create_document(f"chap{i}.xhtml", title=f"Capítulo {i}")
+        self.docs = [mi.href for mi in self.core.find_items(ext=(".xhtml",), in_spine=True)]
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_rewrites_head_only_and_keeps_doctype(self):
+        before = self.core.read_text(self.docs[0])
+        result = self.core.set_styles_for_documents(self.docs, ["style.css", "Styles/extra.css"],
+                                                    add_to_manifest_if_missing=False)
+        after = self.core.read_text(self.docs[0])
+
+        self.assertEqual(result[self.docs[0]], ["../Styles/style.css", "../Styles/extra.css"])
+        self.assertIn("<!DOCTYPE html>", after)
+        self.assertTrue(after.startswith("<?xml"))
+        self.assertEqual(after.count('rel="stylesheet"'), 2)
+        # Todo lo que está fuera del <head> queda idéntico
+        self.assertEqual(before.split("</head>")[1], after.split("</head>")[1])
+        self.assertEqual(before.split("<head>")[0], after.split("<head>")[0])
+
+    def test_keeps_existing_links_when_not_clearing(self):
+        self.core.set_styles_for_documents(self.docs, ["style.css", "extra.css"],
+                                           clear_existing=False, add_to_manifest_if_missing=False)
+        text = self.core.read_text(self.docs[1])
+        self.assertEqual(text.count('href="../Styles/style.css"'), 1)
+        self.assertEqual(text.count('href="../Styles/extra.css"'), 1)
+
+    def test_missing_css_registered_in_single_opf_write(self):
+        for name in ("a.css", "b.css", "c.css"):
+            (self.core.opf_dir / "Styles" / name).write_text("p{}", encoding="utf-8")
+
+        with mock.patch.object(self.core, "_save_opf", wraps=self.core._save_opf) as save:
+            self.core.set_styles_for_documents(self.docs, ["a.css", "b.css", "c.css"])
+        self.assertEqual(save.call_count, 1)
+        for name in ("a.css", "b.css", "c.css"):
+            self.assertIn(f"Styles/{name}", self.core.items_by_href)
+
+    def test_non_document_rejected_before_any_write(self):
+        original = self.core.read_text(self.docs[0])
+        with self.assertRaises(ValueError):
+            self.core.set_styles_for_documents([self.docs[0], "style"], ["extra.css"])
+        self.assertEqual(self.core.read_text(self.docs[0]), original)
+
+    def test_unrewritable_document_leaves_manifest_untouched(self):
+        (self.core.opf_dir / "Styles" / "a.css").write_text("p{}", encoding="utf-8")
+        self.core.write_text(self.docs[1], "<p>sin html ni head</p>")
+        original = self.core.read_text(self.docs[0])
+        with self.assertRaises(RuntimeError):
+            self.core.set_styles_for_documents(self.docs, ["a.css"])
+        self.assertNotIn("Styles/a.css", self.core.items_by_href)
+        self.assertEqual(self.core.read_text(self.docs[0]), original)
+
+
+if __name__ == "__main__":
+    unittest.main()
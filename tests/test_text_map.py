@@ -0,0 +1,61 @@
+import re
+import unittest
+from types import SimpleNamespace
+
+from core.search_index import SearchIndex
+from core.text_map import (SCOPE_ATTRIBUTES, SCOPE_TEXT, build_text_map, find_in_scope,
+                           replace_in_scope)
+
+DOC = ('<html><head><title>pala</title><style>p { color: red; }</style></head>\n'
+       '<body>\n<p class="pala">Una pala<em>bra</em> suelta.</p>\n'
+       '<p title="a&amp;b">Caf&eacute; y palabra</p>\n</body></html>')
+
+
+class TestTextMap(unittest.TestCase):
+    def test_visible_text_skips_markup_and_decodes_entities(self):
+        tmap = build_text_map(DOC)
+        self.assertIn("Una palabra suelta.", tmap.text)
+        self.assertIn("Café y palabra", tmap.text)
+        self.assertNotIn("color", tmap.text)
+        # Los párrafos no se unen
+        self.assertNotIn("suelta.Café", tmap.text)
+
+    def test_word_split_by_tags_maps_to_exact_source(self):
+        spans = find_in_scope(DOC, re.compile("palabra"), SCOPE_TEXT)
+        self.assertEqual(len(spans), 2)
+        start, end = spans[0]
+        self.assertEqual(DOC[start:end], "pala<em>bra")
+        start, end = spans[1]
+        self.assertEqual(DOC[start:end], "palabra")
+        start, end = find_in_scope(DOC, re.compile("Café"), SCOPE_TEXT)[0]
+        self.assertEqual(DOC[start:end], "Caf&eacute;")
+
+    def test_text_replace_keeps_tags_and_escapes(self):
+        new, n = replace_in_scope(DOC, re.compile("palabra"), lambda m: "P&R", SCOPE_TEXT)
+        self.assertEqual(n, 2)
+        self.assertIn("Una P&amp;R<em></em> suelta.", new)
+        self.assertIn("Caf&eacute; y P&amp;R</p>", new)
+        self.assertIn('class="pala"', new)
+
+    def test_attribute_scope_only_matches_values(self):
+        spans = find_in_scope(DOC, re.compile("pala"), SCOPE_ATTRIBUTES)
+        self.assertEqual([DOC[a - 7:b + 1] for a, b in spans], ['class="pala"'])
+        new, n = replace_in_scope(DOC, re.compile("pala"), lambda m: 'x"y', SCOPE_ATTRIBUTES)
+        self.assertEqual(n, 1)
+        self.assertIn('class="x&quot;y"', new)
+        self.assertIn("Una pala<em>bra</em>", new)
+
+    def test_index_caches_text_map_per_version(self):
+        core = SimpleNamespace(
+            items_by_id={"c": SimpleNamespace(href="c.xhtml", media_type="application/xhtml+xml")},
+            read_text=lambda href: DOC)
+        index = SearchIndex(core)
+        hits = index.find("palabra", scope=SCOPE_TEXT)
+        self.assertEqual([DOC[h.start:h.end] for h in hits], ["pala<em>bra", "palabra"])
+        self.assertIs(index.text_map_of("c.xhtml"), index.text_map_of("c.xhtml"))
+        index.file_written("c.xhtml", "<body><p>otra pala<b>bra</b></p></body>")
+        self.assertEqual(len(index.find("palabra", scope=SCOPE_TEXT)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
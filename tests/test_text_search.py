@@ -0,0 +1,165 @@
+import re
+import threading
+import unittest
+
+from core.text_search import (
+    BackgroundSearch, ElementIdIndex, SearchMatches, build_search_pattern, replace_all_splice,
+)
+
+
+class TestBuildSearchPattern(unittest.TestCase):
+    def test_literal_options(self):
+        text = "Casa casa casamiento a.b"
+        self.assertEqual(len(build_search_pattern("casa").findall(text)), 3)
+        self.assertEqual(len(build_search_pattern("casa", case_sensitive=True).findall(text)), 2)
+        self.assertEqual(len(build_search_pattern("casa", whole_words=True).findall(text)), 2)
+        self.assertEqual(build_search_pattern("a.b").findall("axb a.b"), ["a.b"])
+
+    def test_regex_mode(self):
+        pattern = build_search_pattern(r"^<p>.*", regex=True, dotall=True)
+        self.assertTrue(pattern.flags & re.DOTALL)
+        with self.assertRaises(re.error):
+            build_search_pattern("(", regex=True)
+
+
+class TestSearchMatches(unittest.TestCase):
+    def setUp(self):
+        # 100 000 coincidencias: sin límite de resultados
+        self.matches = SearchMatches((i * 10, i * 10 + 4) for i in range(100_000))
+
+    def test_offsets(self):
+        self.assertEqual(len(self.matches), 100_000)
+        self.assertEqual(self.matches[7], (70, 74))
+        self.assertEqual(list(self.matches)[:2], [(0, 4), (10, 14)])
+
+    def test_index_in_range_is_viewport_sized(self):
+        self.assertEqual(self.matches.index_in_range(500_000, 500_100), (50_000, 50_010))
+        # Una coincidencia que empieza antes del rango pero lo atraviesa
+        self.assertEqual(self.matches.index_in_range(502, 520), (50, 52))
+        self.assertEqual(self.matches.index_in_range(5, 9), (1, 1))
+
+    def test_index_at_or_after(self):
+        self.assertEqual(self.matches.index_at_or_after(11), 2)
+        self.assertEqual(self.matches.index_at_or_after(10_000_000), -1)
+        self.assertFalse(SearchMatches())
+
+
+class TestReplaceAllSplice(unittest.TestCase):
+    def test_fifty_thousand_replacements_match_sub(self):
+        text = "<p>" + " ".join(f"palabra{i % 7}" for i in range(50_000)) + "</p>"
+        pattern = build_search_pattern(r"(?<= )palabra(\d)", regex=True)
+        replace = lambda m: m.expand(r"voz\1")
+        start, end, segment, count = replace_all_splice(text, pattern, replace)
+        self.assertEqual(count, 49_999)  # el primero no tiene espacio delante
+        self.assertEqual(text[:start] + segment + text[end:], pattern.sub(replace, text))
+        self.assertTrue(text[:start].endswith("palabra0 "))
+
+    def test_anchors_use_full_text_context(self):
+        text = "uno\ndos\ntres"
+        pattern = build_search_pattern(r"^\w", regex=True)
+        start, end, segment, count = replace_all_splice(text, pattern, lambda m: "#")
+        self.assertEqual((start, count), (0, 3))
+        self.assertEqual(segment + text[end:], "#no\n#os\n#res")
+        self.assertIsNone(replace_all_splice(text, build_search_pattern("zzz"), lambda m: ""))
+
+
+def _edit(index, text, start, end, new):
+    """Aplica text[start:end] = new y actualiza el índice como lo hace el editor"""
+    result = text[:start] + new + text[end:]
+    delta = len(new) - (end - start)
+    region_start = result.rfind("\n", 0, start) + 1
+    region_end = result.find("\n", start + len(new))
+    region_end = len(result) if region_end == -1 else region_end
+    index.apply_edit(region_start, region_end - delta, result[region_start:region_end])
+    return result
+
+
+class TestElementIdIndex(unittest.TestCase):
+    TEXT = (
+        '<h1 id="titulo">T</h1>\n'
+        "<p id='comillas-simples'>a</p>\n"
+        '<p class="x" ID = sin-comillas>b</p>\n'
+        '<p data-id="no">c</p>\n'
+        '<p\nid="multilinea">d</p>\n'
+        '<p id="titulo">duplicado</p>\n'
+    )
+
+    def test_any_quoting_style(self):
+        index = ElementIdIndex()
+        index.rebuild(self.TEXT)
+        for element_id in ("titulo", "comillas-simples", "sin-comillas", "multilinea"):
+            start, end = index.lookup(element_id)
+            self.assertIn(element_id, self.TEXT[start:end])
+        self.assertIsNone(index.lookup("no"))
+        self.assertEqual(index.lookup("titulo")[0], self.TEXT.index('id="titulo"'))
+
+    def test_incremental_edits_match_rebuild(self):
+        index = ElementIdIndex()
+        index.rebuild(self.TEXT)
+        text = _edit(index, self.TEXT, 0, 0, "<p id='nuevo'>x</p>\n")
+        text = _edit(index, text, text.index("comillas-simples"), text.index("comillas-simples") + 8,
+                     "renombrado")
+        start = text.index('<p data-id')
+        text = _edit(index, text, start, text.index("\n", start) + 1, "")
+        fresh = ElementIdIndex()
+        fresh.rebuild(text)
+        self.assertEqual(len(index), len(fresh))
+        for element_id in ("nuevo", "renombrado-simples", "sin-comillas", "multilinea", "titulo"):
+            self.assertEqual(index.lookup(element_id), fresh.lookup(element_id), element_id)
+        self.assertIsNone(index.lookup("comillas-simples"))
+
+
+class TestBackgroundSearch(unittest.TestCase):
+    def _run(self, search, text, pattern):
+        done = threading.Event()
+        result = {"spans": [], "status": None, "batches": 0}
+
+        def on_batch(generation, spans):
+            result["spans"].extend(spans)
+            result["batches"] += 1
+
+        def on_done(generation, status):
+            result["status"] = status
+            done.set()
+
+        search.start(text, pattern, on_batch, on_done)
+        self.assertTrue(done.wait(10))
+        return result
+
+    def test_streams_batches(self):
+        text = "ab " * 5000
+        result = self._run(BackgroundSearch(), text, build_search_pattern("ab"))
+        self.assertEqual(result["status"], "done")
+        self.assertEqual(len(result["spans"]), 5000)
+        self.assertEqual(result["batches"], 3)
+        self.assertEqual(result["spans"][1], (3, 5))
+
+    def test_new_search_cancels_previous(self):
+        search = BackgroundSearch()
+        release = threading.Event()
+        delivered = []
+
+        def blocking_dispatch(fn, *args):
+            release.wait(5)
+            fn(*args)
+
+        search._dispatch = blocking_dispatch
+        search.start("x" * 5000, build_search_pattern("x"),
+                     lambda g, spans: delivered.append(g), lambda g, status: delivered.append(g))
+        search.cancel()
+        release.set()
+        search._dispatch = lambda fn, *args: fn(*args)
+        result = self._run(search, "yy", build_search_pattern("y"))
+        self.assertEqual(result["spans"], [(0, 1), (1, 2)])
+        # El hilo cancelado entregó a lo sumo el lote en curso y nunca su on_done
+        self.assertLessEqual(len(delivered), 1)
+
+    def test_time_budget(self):
+        search = BackgroundSearch(time_budget=0.0)
+        result = self._run(search, "a" * 10000, build_search_pattern("a"))
+        self.assertEqual(result["status"], "timeout")
+        self.assertLess(len(result["spans"]), 10000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import random
+import unittest
+
+from core.book_stats import chapter_statistics
+from core.word_count import LiveWordCount, count_text
+
+DOC = ('<?xml version="1.0" encoding="utf-8"?>\n<html>\n<head>\n  <title>No cuenta</title>\n'
+       '</head>\n<body class="x">Inicio\n  <h1>Capítulo uno</h1>\n'
+       '  <p>Una pala<em>bra</em> y   otra.</p>\n  <p class="a"\n     id="b">Caf&eacute;<br/>solo</p>\n'
+       '</body>\n</html>')
+
+
+def _edit(count: LiveWordCount, text: str, start: int, end: int, new: str) -> str:
+    """Aplica text[start:end] = new como lo haría el editor (líneas completas)"""
+    first_line = text.count("\n", 0, start)
+    old_lines = text.count("\n", start, end) + 1
+    text = text[:start] + new + text[end:]
+    region_start = text.rfind("\n", 0, start) + 1
+    region_end = text.find("\n", start + len(new))
+    region_end = len(text) if region_end == -1 else region_end
+    count.apply_edit(first_line, old_lines, text[region_start:region_end])
+    return text
+
+
+class TestLiveWordCount(unittest.TestCase):
+    def test_matches_chapter_statistics(self):
+        count = LiveWordCount()
+        count.rebuild(DOC)
+        stats = chapter_statistics("cap.xhtml", DOC)
+        self.assertEqual((count.words, count.characters), (stats.words, stats.characters))
+        self.assertEqual(count_text("pala<em>bra</em> y <p>otra"), (3, 12))
+
+    def test_incremental_edits_equal_full_recount(self):
+        rng = random.Random(7)
+        text = DOC
+        count = LiveWordCount()
+        count.rebuild(text)
+        body = text.index("<h1>")
+        for _ in range(300):
+            start = rng.randrange(body, len(text) - 20)
+            end = start + rng.choice([0, 0, 1, 3, 12])
+            new = rng.choice(["", "x", " nueva palabra ", "\n", "<em>y</em>", "\n  <p>más</p>\n"])
+            text = _edit(count, text, start, end, new)
+            if not count.valid:           # la edición abrió o cerró una etiqueta entre líneas
+                count.rebuild(text)
+            full = LiveWordCount()
+            full.rebuild(text)
+            self.assertEqual((count.words, count.letters), (full.words, full.letters))
+
+    def test_head_edit_invalidates(self):
+        count = LiveWordCount()
+        count.rebuild(DOC)
+        _edit(count, DOC, DOC.index("No cuenta"), DOC.index("No cuenta"), "más ")
+        self.assertFalse(count.valid)
+
+    def test_multiline_constructs_match_chapter_statistics(self):
+        shapes = {
+            "comentario": '<body>\n<p>uno dos</p>\n<!-- nota\n  sin contar\n  nada aquí -->\n<p>tres</p>\n</body>',
+            "imagen": '<body>\n<p>Antes <img\n alt="una imagen"\n src="../Images/a.png"/></p>\n</body>',
+            "style": '<body>\n<style>\np { color: red; }\nem { x: y }\n</style>\n<p>solo</p>\n</body>',
+        }
+        for shape, doc in shapes.items():
+            with self.subTest(shape):
+                count = LiveWordCount()
+                count.rebuild(doc)
+                stats = chapter_statistics("cap.xhtml", doc)
+                self.assertEqual((count.words, count.characters), (stats.words, stats.characters))
+
+    def test_opening_comment_across_lines_invalidates(self):
+        doc = '<body>\n<p>uno</p>\n<p>dos tres</p>\n<p>cuatro</p>\n</body>'
+        count = LiveWordCount()
+        count.rebuild(doc)
+        doc = _edit(count, doc, doc.index("<p>dos"), doc.index("<p>dos"), "<!-- ")
+        self.assertFalse(count.valid)
+        count.rebuild(doc)
+        doc = _edit(count, doc, doc.index("<p>cuatro"), doc.index("<p>cuatro"), " -->")
+        self.assertFalse(count.valid)
+        count.rebuild(doc)
+        self.assertEqual(count.words, chapter_statistics("cap.xhtml", doc).words)
+        self.assertEqual(count.words, 2)
+        doc = _edit(count, doc, doc.index("<!-- "), doc.index("<!-- ") + 5, "")
+        self.assertFalse(count.valid)
+        count.rebuild(doc)
+        self.assertEqual(count.words, chapter_statistics("cap.xhtml", doc).words)
+
+if __name__ == "__main__":
+    unittest.main()